@@ -7,9 +7,11 @@ It also initializes DB and SocketIO when imported by the process.
 """
 import os
 from backend import create_app
-from backend.config import APP_ENV, REDIS_URL, JWT_SECRET, DATABASE_URL
+from backend.config import APP_ENV, REDIS_URL, JWT_SECRET, DATABASE_URL, MULTI_WORKER
 from backend.db import init_db
 from backend.extensions import socketio
+from backend.services.metrics import instrument_socketio
+from backend.utils.hub_watchdog import start_hub_watchdog
 
 # static folder lives next to the repo frontend/dist
 STATIC_FOLDER = os.path.join(os.path.dirname(__file__), 'frontend', 'dist')
@@ -25,10 +27,15 @@ def _create():
     except Exception:
         pass
     # Init socketio with message queue if present
+    if MULTI_WORKER and not REDIS_URL:
+        raise RuntimeError('MULTI_WORKER=true requires REDIS_URL for the Socket.IO message queue')
     if REDIS_URL:
         socketio.init_app(app, cors_allowed_origins="*", message_queue=REDIS_URL)
     else:
         socketio.init_app(app, cors_allowed_origins="*")
+    instrument_socketio(socketio)
+    # log calls that block the eventlet hub; see utils.hub_watchdog
+    start_hub_watchdog(socketio)
     return app
 
 
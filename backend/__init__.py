@@ -2,16 +2,36 @@ from flask import Flask
 from .config import APP_ENV, ALLOWED_ORIGINS
 from .extensions import cors, socketio
 from .config import determine_origins
+from .utils.fastjson import FastJSONProvider
+from .utils.compression import init_compression
+from .services.metrics import init_request_metrics, register_service_stats
+from .utils.static_assets import init_static_assets
+from .utils.proxy_fix import init_proxy_fix
+from .utils.metrics import REGISTRY
+from .utils.profiler import init_profiler
 
 
 def create_app(static_folder=None):
     app = Flask(__name__, static_folder=static_folder)
+    app.json = FastJSONProvider(app)
+    # timing hook first so its after_request runs last and covers compression
+    init_request_metrics(app)
+    register_service_stats()
+    init_compression(app)
+    # opt-in stack sampling of slow requests; see utils.profiler
+    profiler = init_profiler(app)
+    if profiler is not None:
+        REGISTRY.register_stats('profiler', profiler.stats)
+    # trust X-Forwarded-* from PROXY_FIX_HOPS proxies only; see utils.proxy_fix
+    init_proxy_fix(app)
+    # built SPA files bypass Flask entirely; see utils.static_assets
+    init_static_assets(app)
     # Configure CORS based on env
     origins = determine_origins(APP_ENV, ALLOWED_ORIGINS)
     if origins:
-        cors.init_app(app, resources={r"/api/*": {"origins": origins}}, supports_credentials=False, expose_headers=["Content-Type"])
+        cors.init_app(app, resources={r"/api/*": {"origins": origins}}, supports_credentials=False, expose_headers=["Content-Type", "X-Next-Before-Id"])
     else:
-        cors.init_app(app, resources={r"/api/*": {"origins": []}}, supports_credentials=False, expose_headers=["Content-Type"])
+        cors.init_app(app, resources={r"/api/*": {"origins": []}}, supports_credentials=False, expose_headers=["Content-Type", "X-Next-Before-Id"])
 
     # Register blueprints
     # MVP blueprint set: keep only the essential API surface
@@ -20,11 +40,19 @@ def create_app(static_folder=None):
     from .routes.campaigns import bp as campaigns_bp
     from .routes.characters import bp as characters_bp
     from .routes.users import bp as users_bp
+    from .routes.portraits import bp as portraits_bp
+    from .routes.metrics import bp as metrics_bp
+    from .routes.profiles import bp as profiles_bp
+    from .routes.admin import bp as admin_bp
 
     app.register_blueprint(health_bp)
     app.register_blueprint(auth_bp)
     app.register_blueprint(campaigns_bp)
     app.register_blueprint(characters_bp)
     app.register_blueprint(users_bp)
+    app.register_blueprint(portraits_bp)
+    app.register_blueprint(metrics_bp)
+    app.register_blueprint(profiles_bp)
+    app.register_blueprint(admin_bp)
 
     return app
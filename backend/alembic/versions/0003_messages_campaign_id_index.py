@@ -0,0 +1,36 @@
+"""add composite (campaign_id, id) index on messages
+
+Revision ID: 0003_messages_campaign_id_index
+Revises: 0002_add_uuid_columns
+Create Date: 2026-10-17 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0003_messages_campaign_id_index'
+down_revision = '0002_add_uuid_columns'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    # messages is created by create_all at app startup, not by 0001; skip
+    # cleanly on databases where it does not exist yet.
+    insp = sa.inspect(bind)
+    if not insp.has_table('messages'):
+        return
+    # create_all on a newer model may already have built it
+    if any(ix['name'] == 'ix_messages_campaign_id_id' for ix in insp.get_indexes('messages')):
+        return
+    # Keyset pagination of message history filters on campaign_id and
+    # orders/bounds on id, so both live in one index.
+    op.create_index('ix_messages_campaign_id_id', 'messages', ['campaign_id', 'id'], unique=False)
+
+
+def downgrade():
+    bind = op.get_bind()
+    if not sa.inspect(bind).has_table('messages'):
+        return
+    op.drop_index('ix_messages_campaign_id_id', table_name='messages')
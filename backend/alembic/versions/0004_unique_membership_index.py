@@ -0,0 +1,33 @@
+"""unique (user_id, campaign_id) index on memberships
+
+Revision ID: 0004_unique_membership_index
+Revises: 0003_messages_campaign_id_index
+Create Date: 2026-10-17 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0004_unique_membership_index'
+down_revision = '0003_messages_campaign_id_index'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    insp = sa.inspect(bind)
+    if any(ix['name'] == 'uq_memberships_user_campaign' for ix in insp.get_indexes('memberships')):
+        return
+    # Every /join used to insert a fresh row. Keep the oldest membership per
+    # (user, campaign) -- it carries the original role, e.g. 'owner'.
+    bind.execute(sa.text(
+        "DELETE FROM memberships WHERE id NOT IN ("
+        " SELECT keep_id FROM (SELECT MIN(id) AS keep_id FROM memberships GROUP BY user_id, campaign_id) AS keepers"
+        ")"
+    ))
+    op.create_index('uq_memberships_user_campaign', 'memberships', ['user_id', 'campaign_id'], unique=True)
+
+
+def downgrade():
+    op.drop_index('uq_memberships_user_campaign', table_name='memberships')
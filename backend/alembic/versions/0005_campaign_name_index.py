@@ -0,0 +1,27 @@
+"""index campaigns.name
+
+Revision ID: 0005_campaign_name_index
+Revises: 0004_unique_membership_index
+Create Date: 2026-10-17 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0005_campaign_name_index'
+down_revision = '0004_unique_membership_index'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    # Campaigns are routinely addressed by name (e.g. 'Test Campaign'); names
+    # are not unique, so this is a plain lookup index.
+    if any(ix['name'] == 'ix_campaigns_name' for ix in sa.inspect(bind).get_indexes('campaigns')):
+        return
+    op.create_index(op.f('ix_campaigns_name'), 'campaigns', ['name'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_campaigns_name'), table_name='campaigns')
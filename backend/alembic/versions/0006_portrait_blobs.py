@@ -0,0 +1,70 @@
+"""move inline portrait images into a content-addressed blobs table
+
+Revision ID: 0006_portrait_blobs
+Revises: 0005_campaign_name_index
+Create Date: 2026-10-17 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+import base64
+import hashlib
+from urllib.parse import unquote_to_bytes
+
+# revision identifiers, used by Alembic.
+revision = '0006_portrait_blobs'
+down_revision = '0005_campaign_name_index'
+branch_labels = None
+depends_on = None
+
+
+def _decode(value):
+    # data:[<mime>][;base64],<payload>  (kept local so the migration has no app imports)
+    head, _, payload = value[5:].partition(',')
+    parts = head.split(';')
+    mime = parts[0] or 'application/octet-stream'
+    try:
+        raw = base64.b64decode(payload) if 'base64' in parts[1:] else unquote_to_bytes(payload)
+    except Exception:
+        return None
+    return mime, raw
+
+
+def upgrade():
+    bind = op.get_bind()
+    insp = sa.inspect(bind)
+    if not insp.has_table('blobs'):
+        op.create_table('blobs',
+            sa.Column('hash', sa.String(length=64), primary_key=True, nullable=False),
+            sa.Column('content_type', sa.String(), nullable=True),
+            sa.Column('size', sa.Integer(), nullable=True),
+            sa.Column('data', sa.LargeBinary(), nullable=True),
+        )
+    if 'portrait_hash' not in [c['name'] for c in insp.get_columns('characters')]:
+        op.add_column('characters', sa.Column('portrait_hash', sa.String(length=64), nullable=True))
+
+    # Backfill: move every inline data: URL portrait into blobs
+    blobs = sa.table('blobs', sa.column('hash'), sa.column('content_type'), sa.column('size'), sa.column('data', sa.LargeBinary))
+    rows = bind.execute(sa.text("SELECT id, portrait FROM characters WHERE portrait LIKE 'data:%'")).fetchall()
+    for r in rows:
+        decoded = _decode(r.portrait)
+        if decoded is None:
+            continue
+        mime, raw = decoded
+        h = hashlib.sha256(raw).hexdigest()
+        if bind.execute(sa.text("SELECT 1 FROM blobs WHERE hash = :h"), {'h': h}).first() is None:
+            bind.execute(blobs.insert().values(hash=h, content_type=mime, size=len(raw), data=raw))
+        bind.execute(sa.text("UPDATE characters SET portrait = NULL, portrait_hash = :h WHERE id = :id"), {'h': h, 'id': r.id})
+
+
+def downgrade():
+    bind = op.get_bind()
+    # Inline the images again before dropping the store
+    rows = bind.execute(sa.text(
+        "SELECT c.id, b.content_type, b.data FROM characters c JOIN blobs b ON b.hash = c.portrait_hash"
+    )).fetchall()
+    for r in rows:
+        url = f"data:{r.content_type};base64,{base64.b64encode(bytes(r.data)).decode('ascii')}"
+        bind.execute(sa.text("UPDATE characters SET portrait = :p WHERE id = :id"), {'p': url, 'id': r.id})
+    with op.batch_alter_table('characters') as batch:
+        batch.drop_column('portrait_hash')
+    op.drop_table('blobs')
@@ -0,0 +1,27 @@
+"""add characters.revision for delta broadcasts
+
+Revision ID: 0007_character_revision
+Revises: 0006_portrait_blobs
+Create Date: 2026-10-17 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0007_character_revision'
+down_revision = '0006_portrait_blobs'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    if 'revision' in [c['name'] for c in sa.inspect(bind).get_columns('characters')]:
+        return
+    # existing rows start at revision 1; every save bumps it
+    op.add_column('characters', sa.Column('revision', sa.Integer(), nullable=False, server_default='1'))
+
+
+def downgrade():
+    with op.batch_alter_table('characters') as batch:
+        batch.drop_column('revision')
@@ -0,0 +1,37 @@
+"""add the campaign_changes log behind the incremental sync endpoint
+
+Revision ID: 0008_campaign_changes
+Revises: 0007_character_revision
+Create Date: 2026-10-17 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0008_campaign_changes'
+down_revision = '0007_character_revision'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    if sa.inspect(bind).has_table('campaign_changes'):
+        return
+    # no backfill: clients without a revision get a full snapshot anyway
+    op.create_table('campaign_changes',
+        sa.Column('id', sa.Integer(), primary_key=True, nullable=False),
+        sa.Column('campaign_id', sa.Integer(), sa.ForeignKey('campaigns.id'), nullable=False),
+        sa.Column('kind', sa.String(length=16), nullable=False),
+        sa.Column('entity_id', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.Integer(), nullable=True),
+        sqlite_autoincrement=True,
+    )
+    op.create_index('ix_campaign_changes_campaign_id_id', 'campaign_changes', ['campaign_id', 'id'])
+    op.create_index('ix_campaign_changes_entity', 'campaign_changes', ['campaign_id', 'kind', 'entity_id'])
+
+
+def downgrade():
+    op.drop_index('ix_campaign_changes_entity', table_name='campaign_changes')
+    op.drop_index('ix_campaign_changes_campaign_id_id', table_name='campaign_changes')
+    op.drop_table('campaign_changes')
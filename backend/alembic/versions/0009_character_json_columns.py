@@ -0,0 +1,76 @@
+"""store character sheets as JSON and promote attributes/skillScores to columns
+
+Revision ID: 0009_character_json_columns
+Revises: 0008_campaign_changes
+Create Date: 2026-10-17 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+import json
+
+# revision identifiers, used by Alembic.
+revision = '0009_character_json_columns'
+down_revision = '0008_campaign_changes'
+branch_labels = None
+depends_on = None
+
+# sheet key -> column (kept local so the migration has no app imports)
+PROMOTED = {'attributes': 'attributes', 'skillScores': 'skill_scores'}
+
+
+def _loads(text):
+    try:
+        value = json.loads(text) if text else {}
+    except ValueError:
+        return {}
+    return value if isinstance(value, dict) else {}
+
+
+def _column_type(bind, column):
+    for c in sa.inspect(bind).get_columns('characters'):
+        if c['name'] == column:
+            return c['type']
+    return None
+
+
+def upgrade():
+    bind = op.get_bind()
+    pg = bind.dialect.name == 'postgresql'
+    if pg and _column_type(bind, 'data').__class__.__name__ == 'JSONB':
+        return
+    # databases built by migrations alone never got data (create_all adds it)
+    for column in ('data',) + tuple(PROMOTED.values()):
+        if _column_type(bind, column) is None:
+            op.add_column('characters', sa.Column(column, sa.Text(), nullable=True))
+
+    # Backfill while everything is still text: split the promoted fields out
+    # of data and rewrite rows whose data isn't valid JSON as {}
+    rows = bind.execute(sa.text('SELECT id, data FROM characters')).fetchall()
+    for r in rows:
+        sheet = _loads(r.data)
+        params = {'id': r.id}
+        for key, column in PROMOTED.items():
+            params[column] = json.dumps(sheet.pop(key, None) or {})
+        params['data'] = json.dumps(sheet)
+        bind.execute(sa.text('UPDATE characters SET data = :data, attributes = :attributes, skill_scores = :skill_scores WHERE id = :id'), params)
+
+    if pg:
+        for column in ('data',) + tuple(PROMOTED.values()):
+            op.execute(f'ALTER TABLE characters ALTER COLUMN {column} TYPE JSONB USING {column}::jsonb')
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        for column in ('data',) + tuple(PROMOTED.values()):
+            op.execute(f'ALTER TABLE characters ALTER COLUMN {column} TYPE TEXT USING {column}::text')
+    # fold the promoted fields back into the data blob
+    rows = bind.execute(sa.text('SELECT id, data, attributes, skill_scores FROM characters')).fetchall()
+    for r in rows:
+        sheet = _loads(r.data)
+        for key, column in PROMOTED.items():
+            sheet[key] = _loads(getattr(r, column))
+        bind.execute(sa.text('UPDATE characters SET data = :data WHERE id = :id'), {'data': json.dumps(sheet), 'id': r.id})
+    with op.batch_alter_table('characters') as batch:
+        for column in PROMOTED.values():
+            batch.drop_column(column)
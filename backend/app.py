@@ -1,6 +1,6 @@
 import os
 from . import create_app
-from .config import APP_ENV, REDIS_URL, JWT_SECRET, DATABASE_URL
+from .config import APP_ENV, REDIS_URL, JWT_SECRET, DATABASE_URL, MULTI_WORKER
 from .db import init_db
 from .extensions import socketio
 
@@ -16,6 +16,8 @@ def main():
     except Exception:
         pass
     # Init socketio with message queue if present
+    if MULTI_WORKER and not REDIS_URL:
+        raise RuntimeError('MULTI_WORKER=true requires REDIS_URL for the Socket.IO message queue')
     if REDIS_URL:
         socketio.init_app(app, cors_allowed_origins="*", message_queue=REDIS_URL)
     else:
@@ -27,30 +29,67 @@ if __name__ == '__main__':
     app = main()
     # In production, socketio.run will be used by deployment (gunicorn + eventlet recommended)
     socketio.run(app, host='0.0.0.0', port=int(os.environ.get('PORT', 5000)))
-from flask import Flask, jsonify, request, send_from_directory
+from flask import Flask, jsonify, request, send_from_directory, session
 from flask_cors import CORS
-from flask_socketio import SocketIO, join_room, leave_room, emit
+from flask_socketio import SocketIO, emit
 import os
 import datetime
 import jwt
 import redis  # Added import for Redis support
-from werkzeug.security import generate_password_hash, check_password_hash
-from sqlalchemy import create_engine, Column, Integer, String, Text, ForeignKey
-from sqlalchemy.orm import sessionmaker, declarative_base, relationship
+from werkzeug.security import generate_password_hash
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, Index, LargeBinary
+from sqlalchemy.orm import declarative_base, relationship
 from sqlalchemy.exc import OperationalError
+from .models import JSONBlob
 import json
 import time
+from .config import IN_MEMORY_FALLBACK, MULTI_WORKER
+from .services.messages import clamp_page_limit, parse_cursor, get_messages_page, post_message as svc_post_message, messages_revision, db_get_messages_for_campaign as svc_get_messages_for_campaign
+from .services.message_writer import writer as message_writer
+from .services.auth import cached_auth_user, cache_auth_result, invalidate_user_cache
+from .services.passwords import hash_password, verify_password, hashing_stats
+from .services.portraits import apply_portrait
+from .sockets.coalesce import campaign_scheduler, join_campaign_room, leave_campaign_room, supports_batch
+from .sockets.presence import PresenceHub
+from .services.socket_auth import authorize_join, count as socket_auth_count, token_from_handshake, socket_auth_stats
+from .services.characters import characters_revision, character_payload, character_payloads, character_update_event, set_character_sheet, SHEET_CACHE
+from .services.changelog import record_change, CHARACTER as CHANGE_CHARACTER
+from .services.sync import sync_campaign
+from .utils import fastjson
+from .utils.fastjson import FastJSONProvider
+from .utils.compression import init_compression, compression_stats
+from .utils.static_assets import init_static_assets, INDEX_CACHE_CONTROL
+from .utils.proxy_fix import init_proxy_fix
+from .utils.metrics import REGISTRY as METRICS
+from .utils.profiler import init_profiler
+from .utils.hub_watchdog import start_hub_watchdog
+from .services.metrics import init_request_metrics, register_service_stats, instrument_socketio
+from .utils.conditional import revision_etag, not_modified, with_etag
+from .services.campaigns import campaign_list_revision, db_create_membership as svc_create_membership, db_is_member, resolve_campaign, resolve_campaign_id, invalidate_campaign, campaign_to_dict
 
 # Serve static frontend if built into ../frontend/dist
 STATIC_FOLDER = os.path.join(os.path.dirname(__file__), '..', 'frontend', 'dist')
 app = Flask(__name__, static_folder=STATIC_FOLDER, static_url_path='')
+app.json = FastJSONProvider(app)
+# timing hook first so its after_request runs last and covers compression
+init_request_metrics(app)
+register_service_stats()
+init_compression(app)
+# opt-in stack sampling of slow requests, inside the Socket.IO and static
+# asset middleware so only Flask requests are profiled; see utils.profiler
+profiler = init_profiler(app)
+if profiler is not None:
+    METRICS.register_stats('profiler', profiler.stats)
 REDIS_URL = os.environ.get('REDIS_URL') or os.environ.get('REDIS_URI')
+if MULTI_WORKER and not REDIS_URL:
+    # without a shared queue each worker only reaches its own sockets
+    raise RuntimeError('MULTI_WORKER=true requires REDIS_URL for the Socket.IO message queue')
 if REDIS_URL:
     # when REDIS_URL is present, use it as the message_queue so multiple gunicorn
     # workers or instances can share Socket.IO events. Do NOT hardcode credentials
     # in source; provide them via environment variables (Render config or shell).
     try:
-        socketio = SocketIO(app, cors_allowed_origins="*", message_queue=REDIS_URL)
+        socketio = SocketIO(app, cors_allowed_origins="*", message_queue=REDIS_URL, json=fastjson)
         # Safe log (no secrets): show host portion only for debugging
         try:
             host = REDIS_URL.split('@')[-1].split(':')[0]
@@ -58,10 +97,28 @@ if REDIS_URL:
         except Exception:
             print("Using Redis message queue")
     except Exception:
+        if MULTI_WORKER:
+            raise
         # fallback to in-process socketio if message_queue init fails
-        socketio = SocketIO(app, cors_allowed_origins="*")
+        socketio = SocketIO(app, cors_allowed_origins="*", json=fastjson)
 else:
-    socketio = SocketIO(app, cors_allowed_origins="*")
+    socketio = SocketIO(app, cors_allowed_origins="*", json=fastjson)
+# trust X-Forwarded-* from PROXY_FIX_HOPS proxies only; see utils.proxy_fix
+init_proxy_fix(app)
+# built SPA files are answered before Flask (and the Socket.IO middleware)
+# sees the request; see utils.static_assets
+static_assets = init_static_assets(app)
+if static_assets is not None:
+    METRICS.register_stats('static_assets', static_assets.stats)
+# character_updated bursts are coalesced per room; see sockets.coalesce
+emit_scheduler = campaign_scheduler(socketio)
+presence_hub = PresenceHub(socketio, emit_scheduler, lambda cid: f'campaign_{cid}')
+# per-event frame counts and bytes for /api/metrics; see services.metrics
+instrument_socketio(socketio)
+# log calls that block the eventlet hub; see utils.hub_watchdog
+hub_watchdog = start_hub_watchdog(socketio)
+METRICS.register_stats('emit_coalescing', emit_scheduler.stats)
+METRICS.register_stats('presence', presence_hub.stats)
 
 # ----- Environment-aware CORS (safe for prod) -----
 # APP_ENV: "development" or "production" (default: "production")
@@ -77,7 +134,7 @@ if APP_ENV == "development":
         app,
         resources={r"/api/*": {"origins": ["http://localhost:5173"]}},
         supports_credentials=False,  # you're returning JWT in JSON, not cookies
-        expose_headers=["Content-Type"]
+        expose_headers=["Content-Type", "X-Next-Before-Id"]
     )
 elif ALLOWED_ORIGINS:
     # Restrict production to configured origins.
@@ -102,7 +159,7 @@ elif ALLOWED_ORIGINS:
         app,
         resources={r"/api/*": {"origins": origins}},
         supports_credentials=False,
-        expose_headers=["Content-Type"]
+        expose_headers=["Content-Type", "X-Next-Before-Id"]
     )
 # If no ALLOWED_ORIGINS set in prod, CORS is effectively off (same-origin only).
 
@@ -115,6 +172,9 @@ print(
 )
 
 # ----- In-memory stores (demo only) -----
+# Only read or written when IN_MEMORY_FALLBACK is on (development, single
+# process). With it off every route answers from the database or returns
+# 503, so several workers can serve the same users; see docs/scaling.md.
 NPCS = []
 NEXT_ID = 1
 # Lightweight in-memory mirrors used for demo/testing when DB is not used
@@ -162,7 +222,8 @@ def make_token(user):
             username = getattr(user, 'username', None)
     except Exception:
         pass
-    payload = {'sub': uid}
+    # Ensure subject is a string to avoid PyJWT validation errors in newer versions
+    payload = {'sub': str(uid) if uid is not None else None}
     if email is not None:
         try: payload['email'] = email
         except Exception: pass
@@ -207,6 +268,17 @@ def get_user_from_auth():
             pass
     if not token:
         return None
+    return user_from_token(token)
+
+
+def user_from_token(token):
+    # Verify a JWT against the configured secrets and resolve its user
+    if not token:
+        return None
+    # Repeat requests with the same token skip verification and the DB lookup
+    cached = cached_auth_user(token)
+    if cached is not None:
+        return cached
 
     # Attempt to decode/verify using known secrets
     data = None
@@ -260,12 +332,14 @@ def get_user_from_auth():
                     s.close()
 
         if dbu:
-            return {'id': dbu.id, 'email': dbu.email, 'username': dbu.username}
+            resolved = {'id': dbu.id, 'email': dbu.email, 'username': dbu.username}
+            cache_auth_result(token, data, resolved)
+            return dict(resolved)
     except Exception:
         db_error = True
 
-    # If DB lookup failed but we're in development, fall back to in-memory users
-    if APP_ENV == 'development' or not db_error:
+    # In-memory users exist only when the development fallback is on
+    if IN_MEMORY_FALLBACK:
         return next((u for u in USERS if u['id'] == uid), None)
 
     # In production, if the DB errored, don't silently return an in-memory
@@ -274,71 +348,53 @@ def get_user_from_auth():
 
 
 def db_create_membership(campaign_id, user_id, role='player'):
-    s = SessionLocal()
+    # idempotent: rejoining returns the existing membership, see services.campaigns
+    m = svc_create_membership(campaign_id, user_id, role=role)
+    # mirror into in-memory list for demo compatibility
+    if not IN_MEMORY_FALLBACK:
+        return m
     try:
-        import uuid as _uuid
-        m = Membership(campaign_id=campaign_id, user_id=user_id, role=role, uuid=str(_uuid.uuid4()))
-        s.add(m)
-        s.commit()
-        s.refresh(m)
-        # mirror into in-memory list for demo compatibility
-        try:
+        if not any(x for x in MEMBERSHIPS if x['campaign_id'] == m.campaign_id and x['user_id'] == m.user_id):
             MEMBERSHIPS.append({'campaign_id': m.campaign_id, 'user_id': m.user_id, 'role': m.role})
-        except Exception:
-            pass
-        return m
-    finally:
-        s.close()
+    except Exception:
+        pass
+    return m
 
 
 def db_create_message(campaign_id, author, text):
-    s = SessionLocal()
-    try:
-        import uuid as _uuid
-        ts = datetime.datetime.utcnow().isoformat()
-        m = Message(campaign_id=campaign_id, author=author, text=text, timestamp=ts)
-        # attach a runtime-only uuid attribute for compatibility
-        try:
-            m.uuid = str(_uuid.uuid4())
-        except Exception:
-            pass
-        s.add(m)
-        s.commit()
-        s.refresh(m)
-        # mirror into in-memory list for demo compatibility
-        try:
-            MESSAGES.append({'id': m.id, 'campaign_id': m.campaign_id, 'author': m.author, 'text': m.text, 'timestamp': m.timestamp, 'uuid': getattr(m, 'uuid', None)})
-        except Exception:
-            pass
-        return m
-    finally:
-        s.close()
-
-
-def db_get_memberships_for_user(uid):
-    s = SessionLocal()
+    # sync insert or write-behind depending on MESSAGE_WRITE_MODE; returns
+    # (message, payload encoded once for response + broadcast); see services.messages
+    m, payload = svc_post_message(campaign_id, author, text)
+    # mirror into in-memory list for demo compatibility
+    if not IN_MEMORY_FALLBACK:
+        return m, payload
     try:
-        return s.query(Membership).filter(Membership.user_id == uid).all()
-    finally:
-        s.close()
-
+        MESSAGES.append({'id': m.id, 'campaign_id': m.campaign_id, 'author': m.author, 'text': m.text, 'timestamp': m.timestamp})
+    except Exception:
+        pass
+    return m, payload
 
-def db_get_messages_for_campaign(cid):
-    s = SessionLocal()
-    try:
-        return s.query(Message).filter(Message.campaign_id == cid).order_by(Message.id.asc()).all()
-    finally:
-        s.close()
 
-# Database setup (use DATABASE_URL or fallback to local SQLite file)
-DATABASE_URL = os.environ.get('DATABASE_URL')
-if not DATABASE_URL:
-    DATABASE_URL = 'sqlite:///./data.db'
+# keyset pagination over the (campaign_id, id) index, merged with any
+# not-yet-flushed write-behind rows; see services.messages
+db_get_messages_for_campaign = svc_get_messages_for_campaign
 
-engine = create_engine(DATABASE_URL, echo=False, connect_args={'check_same_thread': False} if DATABASE_URL.startswith('sqlite') else {})
-SessionLocal = sessionmaker(bind=engine)
+# Database setup (use DATABASE_URL or fallback to local SQLite file). The
+# engine and its pool come from backend.db so the package blueprints and
+# these legacy routes share one pool per worker; see db.build_engine.
+from .db import engine, SessionLocal, pool_status
 Base = declarative_base()
 
+# Portrait bytes are served by the package blueprint (cacheable, ETag'd)
+from .routes.portraits import bp as portraits_bp
+app.register_blueprint(portraits_bp)
+from .routes.metrics import bp as metrics_bp
+app.register_blueprint(metrics_bp)
+from .routes.profiles import bp as profiles_bp
+app.register_blueprint(profiles_bp)
+from .routes.admin import bp as admin_bp
+app.register_blueprint(admin_bp)
+
 
 # Models
 class User(Base):
@@ -355,7 +411,7 @@ class Campaign(Base):
     __tablename__ = 'campaigns'
     id = Column(Integer, primary_key=True, index=True)
     uuid = Column(String(36), unique=True, index=True, nullable=True)
-    name = Column(String)
+    name = Column(String, index=True)
     owner = Column(Integer)
     invite_code = Column(String)
     characters = relationship('Character', back_populates='campaign')
@@ -363,6 +419,8 @@ class Campaign(Base):
 
 class Membership(Base):
     __tablename__ = 'memberships'
+    # one row per (user, campaign); also serves membership EXISTS checks
+    __table_args__ = (Index('uq_memberships_user_campaign', 'user_id', 'campaign_id', unique=True),)
     id = Column(Integer, primary_key=True, index=True)
     uuid = Column(String(36), unique=True, index=True, nullable=True)
     campaign_id = Column(Integer, ForeignKey('campaigns.id'))
@@ -378,15 +436,24 @@ class Character(Base):
     user_id = Column(Integer, ForeignKey('users.id'))
     name = Column(String)
     maxHp = Column(Integer)
+    # external image URL; uploaded images live in `blobs` under portrait_hash
     portrait = Column(Text)
-    # freeform JSON blob for attributes, skills, inventory, etc.
-    data = Column(Text)
+    portrait_hash = Column(String(64), nullable=True)
+    # JSON sheet (skills, inventory, ...); attributes and skillScores have
+    # their own columns. JSONB on Postgres, see models.JSONBlob
+    data = Column(JSONBlob)
+    attributes = Column(JSONBlob)
+    skill_scores = Column(JSONBlob)
+    # bumped on every change; character_updated patches are relative to it
+    revision = Column(Integer, nullable=False, default=1, server_default='1')
     user = relationship('User', back_populates='character')
     campaign = relationship('Campaign', back_populates='characters')
 
 
 class Message(Base):
     __tablename__ = 'messages'
+    # history is paged by (campaign_id, id) keyset; see 0003 migration
+    __table_args__ = (Index('ix_messages_campaign_id_id', 'campaign_id', 'id'),)
     id = Column(Integer, primary_key=True, index=True)
     campaign_id = Column(Integer, ForeignKey('campaigns.id'))
     author = Column(String)
@@ -394,6 +461,28 @@ class Message(Base):
     timestamp = Column(String)
 
 
+# content-addressed binary store (character portraits); see services.portraits
+class Blob(Base):
+    __tablename__ = 'blobs'
+    hash = Column(String(64), primary_key=True)
+    content_type = Column(String)
+    size = Column(Integer)
+    data = Column(LargeBinary)
+
+
+# per-campaign change log behind GET /api/campaigns/<cid>/sync; see services.changelog
+class CampaignChange(Base):
+    __tablename__ = 'campaign_changes'
+    __table_args__ = (Index('ix_campaign_changes_campaign_id_id', 'campaign_id', 'id'),
+                      Index('ix_campaign_changes_entity', 'campaign_id', 'kind', 'entity_id'),
+                      {'sqlite_autoincrement': True})
+    id = Column(Integer, primary_key=True)
+    campaign_id = Column(Integer, ForeignKey('campaigns.id'), nullable=False)
+    kind = Column(String(16), nullable=False)
+    entity_id = Column(Integer)
+    created_at = Column(Integer)
+
+
 # create tables if missing
 try:
     Base.metadata.create_all(bind=engine)
@@ -439,6 +528,7 @@ def db_create_campaign(name, owner_id, invite_code=None):
         s.add(c)
         s.commit()
         s.refresh(c)
+        invalidate_campaign(c)
         return c
     finally:
         s.close()
@@ -545,6 +635,15 @@ def health():
     except Exception:
         health['redis'] = False
 
+    health['password_hashing'] = hashing_stats()
+    health['message_writer'] = message_writer.stats()
+    health['socket_auth'] = socket_auth_stats()
+    health['emit_coalescing'] = emit_scheduler.stats()
+    health['presence'] = presence_hub.stats()
+    health['character_cache'] = SHEET_CACHE.stats()
+    health['json_backend'] = fastjson.BACKEND
+    health['compression'] = compression_stats()
+    health['db_pool'] = pool_status()
     health['ok'] = health['database']
     if health['ok']:
         return jsonify(health), 200
@@ -654,7 +753,9 @@ def spa(path):
             return send_from_directory(app.static_folder, path)
         index = os.path.join(app.static_folder, 'index.html')
         if os.path.exists(index):
-            return send_from_directory(app.static_folder, 'index.html')
+            resp = send_from_directory(app.static_folder, 'index.html')
+            resp.headers['Cache-Control'] = INDEX_CACHE_CONTROL
+            return resp
     # If no built frontend present, return a helpful message for GET /
     if path == '' or path == 'index.html':
         return jsonify({"message": "Frontend not built. Run `cd frontend && npm run build` and restart backend."}), 200
@@ -663,12 +764,17 @@ def spa(path):
 
 @app.route('/api/npcs', methods=['GET'])
 def list_npcs():
+    # demo store lives in this process only; meaningless across workers
+    if MULTI_WORKER:
+        return jsonify({'message': 'not found'}), 404
     return jsonify(NPCS)
 
 
 @app.route('/api/npcs', methods=['POST'])
 def create_npc():
     global NEXT_ID
+    if MULTI_WORKER:
+        return jsonify({'message': 'not found'}), 404
     data = request.get_json() or {}
     name = data.get('name')
     title = data.get('title')
@@ -702,12 +808,14 @@ def register():
     # create in DB; if DB operations fail, only allow in-memory fallback in dev
     start_time = time.time()
     pwd_hash_start = time.time()
-    pwd_hash = generate_password_hash(password)
+    pwd_hash = hash_password(password)
     pwd_hash_end = time.time()
     try:
         db_start = time.time()
         new_user = db_create_user(email, username, pwd_hash)
         db_end = time.time()
+        # ids can be reused after a delete; never serve a stale cached identity
+        invalidate_user_cache(new_user.id)
         # add a simple in-memory mirror for older endpoints still using USERS (dev friendly)
         mirror = {'id': new_user.id, 'email': new_user.email, 'username': new_user.username, 'password_hash': new_user.password_hash}
         # ensure NEXT_USER_ID stays ahead of DB ids for in-memory mirrors
@@ -718,7 +826,7 @@ def register():
         except Exception:
             pass
         # Only append mirror in development to avoid relying on in-memory state in prod
-        if APP_ENV == 'development':
+        if IN_MEMORY_FALLBACK:
             USERS.append(mirror)
         token = make_token(mirror)
         total_end = time.time()
@@ -733,7 +841,7 @@ def register():
         # DB failed. In development, fall back to the in-memory user store so local
         # testing remains convenient. In production return 503 so callers see the
         # database is unavailable instead of silently using in-memory data.
-        if APP_ENV != 'development':
+        if not IN_MEMORY_FALLBACK:
             return jsonify({'message': 'database unavailable'}), 503
         db_fail_time = time.time()
         if any(u['email'] == email for u in USERS):
@@ -742,7 +850,7 @@ def register():
             'id': NEXT_USER_ID,
             'email': email,
             'username': username,
-            'password_hash': generate_password_hash(password)
+            'password_hash': pwd_hash
         }
         NEXT_USER_ID += 1
         USERS.append(user)
@@ -780,7 +888,7 @@ def login():
         except Exception:
             pass
         pw_start = time.time()
-        ok = check_password_hash(str(dbu.password_hash), password)
+        ok = verify_password(str(dbu.password_hash), password)
         pw_end = time.time()
         if not ok:
             if os.environ.get('DEBUG_AUTH') == 'true':
@@ -797,13 +905,13 @@ def login():
         # return token and user object so client can display user fields immediately
         return jsonify({"token": token, "user": mirror}), 200
     # If DB errored and we're not in development, surface the DB unavailability
-    if db_error and APP_ENV != 'development':
+    if db_error and not IN_MEMORY_FALLBACK:
         return jsonify({'message': 'database unavailable'}), 503
 
     user = next((u for u in USERS if u['email'] == email), None)
-    if not user or not check_password_hash(user['password_hash'], password):
+    if not user or not verify_password(user['password_hash'], password):
         if os.environ.get('DEBUG_AUTH') == 'true':
-            print(f"Auth debug: in-memory user lookup for {email} returned {bool(user)} and password_check={user and check_password_hash(user['password_hash'], password)}")
+            print(f"Auth debug: in-memory user lookup for {email} returned {bool(user)} and password_check={user and verify_password(user['password_hash'], password)}")
         return jsonify({"message": "invalid credentials"}), 401
     token = make_token(user)
     return jsonify({"token": token, "user": user}), 200
@@ -847,6 +955,7 @@ def dev_delete_user():
                 s.commit()
             finally:
                 s.close()
+            invalidate_user_cache(dbu.id)
             return jsonify({'ok': True}), 200
     except Exception:
         pass
@@ -872,7 +981,7 @@ def list_campaigns():
         camps = db_get_campaigns_for_user(user['id'])
         return jsonify([{'id': c.id, 'uuid': getattr(c, 'uuid', None), 'name': c.name, 'owner': c.owner, 'invite_code': c.invite_code} for c in camps])
     except Exception:
-        if APP_ENV != 'development':
+        if not IN_MEMORY_FALLBACK:
             return jsonify({'message': 'database unavailable'}), 503
         member_ids = [m['campaign_id'] for m in MEMBERSHIPS if m['user_id'] == user['id']]
         return jsonify([c for c in CAMPAIGNS if c['id'] in member_ids])
@@ -894,7 +1003,7 @@ def create_campaign():
         db_create_membership(c.id, user['id'], role='owner')
         return jsonify({'id': c.id, 'uuid': getattr(c, 'uuid', None), 'name': c.name, 'owner': c.owner, 'invite_code': c.invite_code}), 201
     except Exception:
-        if APP_ENV != 'development':
+        if not IN_MEMORY_FALLBACK:
             return jsonify({'message': 'database unavailable'}), 503
         camp = { 'id': NEXT_CAMPAIGN_ID, 'name': name, 'owner': user['id'], 'invite_code': f"INV-{NEXT_CAMPAIGN_ID:04d}" }
         NEXT_CAMPAIGN_ID += 1
@@ -917,14 +1026,14 @@ def join_or_create_test_campaign():
     # Find an existing test campaign by canonical name
     test_name = 'Test Campaign'
     try:
-        c = db_get_campaign_by_name(test_name)
+        c = resolve_campaign(test_name)
         if not c:
-            c = db_create_campaign(test_name, user['id'], invite_code=f"TEST-{int(datetime.datetime.utcnow().timestamp()) % 10000:04d}")
+            c = campaign_to_dict(db_create_campaign(test_name, user['id'], invite_code=f"TEST-{int(datetime.datetime.utcnow().timestamp()) % 10000:04d}"))
         # ensure membership
-        db_create_membership(c.id, user['id'], role='player')
-        return jsonify({'id': c.id, 'uuid': getattr(c, 'uuid', None), 'name': c.name, 'owner': c.owner, 'invite_code': c.invite_code})
+        db_create_membership(c['id'], user['id'], role='player')
+        return jsonify(c)
     except Exception:
-        if APP_ENV != 'development':
+        if not IN_MEMORY_FALLBACK:
             return jsonify({'message': 'database unavailable'}), 503
         camp = next((c for c in CAMPAIGNS if c.get('name') == test_name), None)
         if not camp:
@@ -940,13 +1049,19 @@ def join_or_create_test_campaign():
 def public_campaigns():
     # Return all campaigns (public listing). For production, add pagination/filters.
     try:
+        etag = revision_etag('campaigns', *campaign_list_revision())
+        cached = not_modified(etag)
+        if cached is not None:
+            return cached
         s = SessionLocal()
         try:
             camps = s.query(Campaign).all()
-            return jsonify([{'id': c.id, 'uuid': getattr(c, 'uuid', None), 'name': c.name, 'owner': c.owner, 'invite_code': c.invite_code} for c in camps])
+            return with_etag(jsonify([{'id': c.id, 'uuid': getattr(c, 'uuid', None), 'name': c.name, 'owner': c.owner, 'invite_code': c.invite_code} for c in camps]), etag)
         finally:
             s.close()
     except Exception:
+        if not IN_MEMORY_FALLBACK:
+            return jsonify({'message': 'database unavailable'}), 503
         return jsonify(CAMPAIGNS)
 
 
@@ -956,20 +1071,15 @@ def join_campaign_by_id(cid):
     if not user:
         return jsonify({"message": "unauthorized"}), 401
     try:
-        # accept numeric id or uuid
-        if isinstance(cid, int) or (isinstance(cid, str) and cid.isdigit()):
-            c = db_get_campaign_by_id(int(cid))
-        else:
-            s = SessionLocal()
-            try:
-                c = s.query(Campaign).filter(Campaign.uuid == str(cid)).first() or s.query(Campaign).filter(Campaign.name == cid).first()
-            finally:
-                s.close()
+        # accept numeric id, uuid or name
+        c = resolve_campaign(cid)
         if not c:
             return jsonify({"message": "campaign not found"}), 404
-        db_create_membership(c.id, user['id'], role='player')
-        return jsonify({'id': c.id, 'uuid': getattr(c, 'uuid', None), 'name': c.name, 'owner': c.owner, 'invite_code': c.invite_code})
+        db_create_membership(c['id'], user['id'], role='player')
+        return jsonify(c)
     except Exception:
+        if not IN_MEMORY_FALLBACK:
+            return jsonify({'message': 'database unavailable'}), 503
         camp = next((c for c in CAMPAIGNS if c['id'] == cid), None)
         if not camp:
             return jsonify({"message": "campaign not found"}), 404
@@ -1000,6 +1110,8 @@ def join_campaign():
         db_create_membership(c.id, user['id'], role='player')
         return jsonify({'id': c.id, 'uuid': getattr(c, 'uuid', None), 'name': c.name, 'owner': c.owner, 'invite_code': c.invite_code})
     except Exception:
+        if not IN_MEMORY_FALLBACK:
+            return jsonify({'message': 'database unavailable'}), 503
         camp = next((c for c in CAMPAIGNS if c.get('invite_code') == code or str(c.get('id')) == str(code)), None)
         if not camp:
             return jsonify({"message": "invalid code"}), 404
@@ -1013,31 +1125,32 @@ def list_campaign_messages(cid):
     user = get_user_from_auth()
     if not user:
         return jsonify([]), 401
-    # simple membership check
+    # membership check: one indexed EXISTS probe
     try:
-        # check membership via DB
-        mids = db_get_memberships_for_user(user['id'])
         # accept numeric id or uuid/name
-        campaign_id_to_check = None
-        if isinstance(cid, int) or (isinstance(cid, str) and cid.isdigit()):
-            campaign_id_to_check = int(cid)
-        else:
-            s = SessionLocal()
-            try:
-                cb = s.query(Campaign).filter(Campaign.uuid == str(cid)).first() or s.query(Campaign).filter(Campaign.name == cid).first()
-                if cb:
-                    campaign_id_to_check = cb.id
-            finally:
-                s.close()
-        if campaign_id_to_check is None or not any((getattr(m, 'campaign_id', None) == campaign_id_to_check) for m in mids):
+        campaign_id_to_check = resolve_campaign_id(cid)
+        if not db_is_member(campaign_id_to_check, user['id']):
             return jsonify({"message": "forbidden"}), 403
-        msgs = db_get_messages_for_campaign(campaign_id_to_check)
-        return jsonify([{'id': m.id, 'campaign_id': m.campaign_id, 'author': m.author, 'text': m.text, 'timestamp': m.timestamp, 'uuid': getattr(m, 'uuid', None) if hasattr(m, 'uuid') else None} for m in msgs])
+        limit = clamp_page_limit(request.args.get('limit'))
+        # unchanged since the client's copy: 304 without loading the page
+        etag = revision_etag('messages', campaign_id_to_check, *messages_revision(campaign_id_to_check))
+        cached = not_modified(etag)
+        if cached is not None:
+            return cached
+        # newest page may come from the Redis ring buffer; see services.message_cache
+        msgs = get_messages_page(campaign_id_to_check, before_id=parse_cursor(request.args.get('before_id')), after_id=parse_cursor(request.args.get('after_id')), limit=limit)
+        resp = with_etag(jsonify(msgs), etag)
+        # a full page means older history may exist; hand the client its next cursor
+        if len(msgs) == limit:
+            resp.headers['X-Next-Before-Id'] = str(msgs[0]['id'])
+        return resp
     except Exception:
+        if not IN_MEMORY_FALLBACK:
+            return jsonify({'message': 'database unavailable'}), 503
         if not any(m for m in MEMBERSHIPS if m['campaign_id'] == cid and m['user_id'] == user['id']):
             return jsonify({"message": "forbidden"}), 403
         msgs = [m for m in MESSAGES if m['campaign_id'] == cid]
-        return jsonify(msgs)
+        return jsonify(msgs[-clamp_page_limit(request.args.get('limit')):])
 
 
 @app.route('/api/campaigns/<cid>/messages', methods=['POST'])
@@ -1048,26 +1161,18 @@ def post_campaign_message(cid):
         return jsonify({"message": "unauthorized"}), 401
     data = request.get_json() or {}
     body = data.get('text') or data.get('body') or data.get('message') or ''
+    room_id = cid
     try:
-        # ensure membership via DB
-        mids = db_get_memberships_for_user(user['id'])
         # accept numeric id or uuid/name for campaign identification
-        campaign_id_to_check = None
-        if isinstance(cid, int) or (isinstance(cid, str) and cid.isdigit()):
-            campaign_id_to_check = int(cid)
-        else:
-            s = SessionLocal()
-            try:
-                cb = s.query(Campaign).filter(Campaign.uuid == str(cid)).first() or s.query(Campaign).filter(Campaign.name == cid).first()
-                if cb:
-                    campaign_id_to_check = cb.id
-            finally:
-                s.close()
-        if campaign_id_to_check is None or not any((getattr(m, 'campaign_id', None) == campaign_id_to_check) for m in mids):
+        campaign_id_to_check = resolve_campaign_id(cid)
+        if not db_is_member(campaign_id_to_check, user['id']):
             return jsonify({"message": "forbidden"}), 403
-        m = db_create_message(campaign_id_to_check, user['username'], body)
-        msg = {'id': m.id, 'campaign_id': m.campaign_id, 'author': m.author, 'text': m.text, 'timestamp': m.timestamp, 'uuid': getattr(m, 'uuid', None)}
+        # sockets join the canonical id room whatever identifier they used
+        room_id = campaign_id_to_check
+        _m, msg = db_create_message(campaign_id_to_check, user['username'], body)
     except Exception:
+        if not IN_MEMORY_FALLBACK:
+            return jsonify({'message': 'database unavailable'}), 503
         if not any(m for m in MEMBERSHIPS if m['campaign_id'] == cid and m['user_id'] == user['id']):
             return jsonify({"message": "forbidden"}), 403
         msg = {
@@ -1081,29 +1186,106 @@ def post_campaign_message(cid):
         MESSAGES.append(msg)
     # Emit to campaign room via SocketIO so connected clients receive it
     try:
-        # pass room as third positional arg to avoid static linter warnings
-        socketio.emit('campaign_message', msg, f'campaign_{cid}')
+        socketio.emit('campaign_message', msg, to=f'campaign_{room_id}')
     except Exception:
         pass
     return jsonify(msg), 201
 
 
+@app.route('/api/campaigns/<cid>/sync', methods=['GET'])
+def sync_campaign_state(cid):
+    """Messages, characters and members changed since ?since=<revision>
+    (a full snapshot without one); see services.sync."""
+    user = get_user_from_auth()
+    if not user:
+        return jsonify({"message": "unauthorized"}), 401
+    try:
+        campaign_id = resolve_campaign_id(cid)
+        if campaign_id is None:
+            return jsonify({"message": "campaign not found"}), 404
+        if not db_is_member(campaign_id, user['id']):
+            return jsonify({"message": "forbidden"}), 403
+        return jsonify(sync_campaign(campaign_id, parse_cursor(request.args.get('since'))))
+    except Exception:
+        return jsonify({'message': 'database unavailable'}), 503
+
+
+
+@socketio.on('connect')
+def on_connect(auth=None):
+    session['batch'] = supports_batch(auth)
+    # verify the token once per connection; joins reuse the session user
+    token = token_from_handshake(auth, request)
+    if not token:
+        # allowed to connect (e.g. before login) but can't join any room
+        socket_auth_count('connects_anonymous')
+        return
+    user = user_from_token(token)
+    if not user:
+        socket_auth_count('connects_rejected')
+        raise ConnectionRefusedError('unauthorized')
+    session['user'] = user
+    socket_auth_count('connects_authenticated')
+
 
 @socketio.on('join')
 def on_join(data):
-    # data: { campaign: <id>, token?: <jwt> }
+    # data: { campaign: <id|uuid|name>, token?: <jwt> }
+    data = data or {}
     cid = data.get('campaign')
     if not cid: return
-    room = f'campaign_{cid}'
-    join_room(room)
+    user = session.get('user')
+    if not user and data.get('token'):
+        # late authentication for sockets opened before login
+        user = user_from_token(data.get('token'))
+        if user:
+            session['user'] = user
+    try:
+        campaign_id, error = authorize_join(user, cid)
+    except Exception:
+        # database down: only the development fallback may consult the mirrors
+        if not (IN_MEMORY_FALLBACK and user and any(m for m in MEMBERSHIPS if str(m['campaign_id']) == str(cid) and m['user_id'] == user['id'])):
+            return {'ok': False, 'error': 'unavailable'}
+        campaign_id, error = cid, None
+    if error:
+        return {'ok': False, 'error': error}
+    join_campaign_room(f'campaign_{campaign_id}', session.get('batch', False))
+    return {'ok': True, 'campaign_id': campaign_id, 'presence': presence_hub.joined(request.sid, user, campaign_id)}
 
 
 @socketio.on('leave')
 def on_leave(data):
-    cid = data.get('campaign')
+    cid = (data or {}).get('campaign')
     if not cid: return
-    room = f'campaign_{cid}'
-    leave_room(room)
+    try:
+        campaign_id = resolve_campaign_id(cid)
+    except Exception:
+        campaign_id = None
+    leave_campaign_room(f'campaign_{campaign_id if campaign_id is not None else cid}')
+    if campaign_id is not None:
+        presence_hub.left(request.sid, campaign_id)
+
+
+@socketio.on('disconnect')
+def on_disconnect(*_args):
+    presence_hub.disconnected(request.sid)
+
+
+@socketio.on('heartbeat')
+def on_heartbeat(*_args):
+    presence_hub.heartbeat(request.sid)
+
+
+@socketio.on('typing')
+def on_typing(data):
+    # data: { campaign: <id|uuid|name>, typing: bool }; ignored unless this socket joined the room
+    data = data or {}
+    try:
+        campaign_id = resolve_campaign_id(data.get('campaign', data.get('campaign_id')))
+    except Exception:
+        return
+    if campaign_id is not None:
+        presence_hub.typing(request.sid, campaign_id, data.get('typing', True))
 
 
 @app.route('/api/campaigns/<cid>/characters', methods=['GET','POST'])
@@ -1114,65 +1296,42 @@ def campaign_characters(cid):
         return jsonify([]) if request.method == 'GET' else (jsonify({"message": "unauthorized"}), 401)
     if request.method == 'GET':
         try:
+            # resolve campaign id from numeric id, uuid, or name
+            campaign_id = resolve_campaign_id(cid)
+            if campaign_id is None:
+                return jsonify([])
+            etag = revision_etag('characters', campaign_id, characters_revision(campaign_id))
+            cached = not_modified(etag)
+            if cached is not None:
+                return cached
             s = SessionLocal()
             try:
-                # resolve campaign id from numeric id, uuid, or name
-                if isinstance(cid, str) and cid.isdigit():
-                    campaign_id = int(cid)
-                else:
-                    cb = s.query(Campaign).filter(Campaign.uuid == str(cid)).first() or s.query(Campaign).filter(Campaign.name == cid).first()
-                    campaign_id = cb.id if cb else None
-                if campaign_id is None:
-                    return jsonify([])
-                rows = s.query(Character).filter(Character.campaign_id == campaign_id).all()
-                out = []
-                for r in rows:
-                    try:
-                        blob_text = getattr(r, 'data', None)
-                        blob = json.loads(blob_text) if blob_text else {}
-                    except Exception:
-                        blob = {}
-                    obj = {
-                        'id': r.id,
-                        'uuid': getattr(r, 'uuid', None),
-                        'campaign_id': r.campaign_id,
-                        'user_id': r.user_id,
-                        'name': r.name,
-                        'maxHp': r.maxHp,
-                        'portrait': r.portrait,
-                        **(blob if isinstance(blob, dict) else {})
-                    }
-                    out.append(obj)
-                return jsonify(out)
+                # sheets come from the (id, revision) cache; see services.characters
+                out = character_payloads(s, s.query(Character).filter(Character.campaign_id == campaign_id).order_by(Character.id))
+                return with_etag(jsonify(out), etag)
             finally:
                 s.close()
         except Exception:
+            if not IN_MEMORY_FALLBACK:
+                return jsonify({'message': 'database unavailable'}), 503
             chars = [c for c in CHARACTERS if c.get('campaign_id') == cid]
             return jsonify(chars)
     # POST flow
     if request.method == 'POST':
         global NEXT_CHARACTER_ID
         try:
-            # resolve campaign id
-            if isinstance(cid, str) and cid.isdigit():
-                campaign_id_to_check = int(cid)
-            else:
-                s = SessionLocal()
-                try:
-                    cb = s.query(Campaign).filter(Campaign.uuid == str(cid)).first() or s.query(Campaign).filter(Campaign.name == cid).first()
-                    campaign_id_to_check = cb.id if cb else None
-                finally:
-                    s.close()
+            campaign_id_to_check = resolve_campaign_id(cid)
         except Exception:
             campaign_id_to_check = None
         # membership check: prefer DB-backed memberships when possible
         try:
-            mids = db_get_memberships_for_user(user['id'])
-            if campaign_id_to_check is None or not any((getattr(m, 'campaign_id', None) == campaign_id_to_check) for m in mids):
+            if not db_is_member(campaign_id_to_check, user['id']):
                 # fallback to in-memory memberships mirror
-                if not any(m for m in MEMBERSHIPS if m['campaign_id'] == campaign_id_to_check and m['user_id'] == user['id']):
+                if not IN_MEMORY_FALLBACK or not any(m for m in MEMBERSHIPS if m['campaign_id'] == campaign_id_to_check and m['user_id'] == user['id']):
                     return jsonify({"message": "forbidden"}), 403
         except Exception:
+            if not IN_MEMORY_FALLBACK:
+                return jsonify({'message': 'database unavailable'}), 503
             if not any(m for m in MEMBERSHIPS if m['campaign_id'] == campaign_id_to_check and m['user_id'] == user['id']):
                 return jsonify({"message": "forbidden"}), 403
         data = request.get_json() or {}
@@ -1193,12 +1352,17 @@ def campaign_characters(cid):
             s = SessionLocal()
             try:
                 import uuid as _uuid
-                c = Character(campaign_id=campaign_id_to_check, user_id=user['id'], name=name, maxHp=maxHp, portrait=portrait, data=json.dumps(blob), uuid=str(_uuid.uuid4()))
+                c = Character(campaign_id=campaign_id_to_check, user_id=user['id'], name=name, maxHp=maxHp, portrait='', uuid=str(_uuid.uuid4()), revision=1)
+                set_character_sheet(c, blob)
+                apply_portrait(s, c, portrait)
                 s.add(c)
+                s.flush()
+                record_change(s, campaign_id_to_check, CHANGE_CHARACTER, c.id)
                 s.commit()
                 s.refresh(c)
-                res = {'id': c.id, 'uuid': getattr(c, 'uuid', None), 'campaign_id': c.campaign_id, 'user_id': c.user_id, 'name': c.name, 'maxHp': c.maxHp, 'portrait': c.portrait, **blob}
-                CHARACTERS.append(res)
+                res = character_payload(c)
+                if IN_MEMORY_FALLBACK:
+                    CHARACTERS.append(res)
                 try:
                     cid_val = getattr(c, 'id', None)
                     if cid_val is not None:
@@ -1207,13 +1371,15 @@ def campaign_characters(cid):
                     pass
                 try:
                     room = f'campaign_{c.campaign_id}'
-                    socketio.emit('character_updated', {'campaign_id': c.campaign_id, 'user_id': c.user_id, 'character_id': c.id, 'character': res}, room)
+                    emit_scheduler.emit('character_updated', character_update_event(None, res), room)
                 except Exception:
                     pass
                 return jsonify(res), 201
             finally:
                 s.close()
         except Exception:
+            if not IN_MEMORY_FALLBACK:
+                return jsonify({'message': 'database unavailable'}), 503
             char = {
                 'id': NEXT_CHARACTER_ID,
                 'campaign_id': campaign_id_to_check,
@@ -1227,7 +1393,7 @@ def campaign_characters(cid):
             CHARACTERS.append(char)
             try:
                 room = f'campaign_{campaign_id_to_check}'
-                socketio.emit('character_updated', {'campaign_id': campaign_id_to_check, 'user_id': user['id'], 'character_id': char.get('id'), 'character': char}, room)
+                emit_scheduler.emit('character_updated', {'campaign_id': campaign_id_to_check, 'user_id': user['id'], 'character_id': char.get('id'), 'character': char}, room)
             except Exception:
                 pass
             return jsonify(char), 201
@@ -1236,6 +1402,31 @@ def campaign_characters(cid):
 
 
 
+@app.route('/api/campaigns/<cid>/characters/<int:char_id>', methods=['GET'])
+def campaign_character(cid, char_id):
+    """Full current sheet; clients refetch here when a character_updated
+    patch's base_revision doesn't match the revision they hold."""
+    user = get_user_from_auth()
+    if not user:
+        return jsonify({"message": "unauthorized"}), 401
+    try:
+        campaign_id = resolve_campaign_id(cid)
+        if campaign_id is None:
+            return jsonify({"message": "campaign not found"}), 404
+        if not db_is_member(campaign_id, user['id']):
+            return jsonify({"message": "forbidden"}), 403
+        s = SessionLocal()
+        try:
+            found = character_payloads(s, s.query(Character).filter(Character.id == char_id, Character.campaign_id == campaign_id))
+            if not found:
+                return jsonify({"message": "character not found"}), 404
+            return jsonify(found[0])
+        finally:
+            s.close()
+    except Exception:
+        return jsonify({'message': 'database unavailable'}), 503
+
+
 @app.route('/api/users/me/active-campaign', methods=['PUT'])
 def set_active_campaign():
     user = get_user_from_auth()
@@ -1246,26 +1437,15 @@ def set_active_campaign():
     # accept campaign id or name
     camp = None
     db_error = False
-    if isinstance(cid, int) or (isinstance(cid, str) and cid.isdigit()):
-        # try DB first
-        try:
-            db_c = db_get_campaign_by_id(int(cid))
-            if db_c:
-                camp = {'id': db_c.id, 'name': db_c.name, 'owner': db_c.owner, 'invite_code': db_c.invite_code}
-        except Exception:
-            db_error = True
-            camp = None
-            if APP_ENV == 'development':
+    try:
+        camp = resolve_campaign(cid)
+    except Exception:
+        db_error = True
+        camp = None
+        if IN_MEMORY_FALLBACK:
+            if isinstance(cid, int) or (isinstance(cid, str) and cid.isdigit()):
                 camp = next((c for c in CAMPAIGNS if c['id'] == int(cid)), None)
-    else:
-        try:
-            db_c = db_get_campaign_by_name(cid) if cid is not None else None
-            if db_c:
-                camp = {'id': db_c.id, 'name': db_c.name, 'owner': db_c.owner, 'invite_code': db_c.invite_code}
-        except Exception:
-            db_error = True
-            camp = None
-            if APP_ENV == 'development':
+            else:
                 camp = next((c for c in CAMPAIGNS if c['name'] == cid), None)
     if not camp and cid is not None:
         return jsonify({"message": "campaign not found"}), 404
@@ -1285,7 +1465,7 @@ def set_active_campaign():
 
     # DB did not provide a user. If the DB errored and we're in production,
     # surface the failure so clients know the DB is unavailable.
-    if db_error and APP_ENV != 'development':
+    if db_error and not IN_MEMORY_FALLBACK:
         return jsonify({'message': 'database unavailable'}), 503
 
     # Otherwise (development), update the in-memory user mirror and return
@@ -1308,20 +1488,14 @@ def get_my_character():
     try:
         s = SessionLocal()
         try:
-            ch = s.query(Character).filter(Character.user_id == user['id']).first()
-            if ch:
-                try:
-                    blob_text = getattr(ch, 'data', None)
-                    blob = json.loads(blob_text) if blob_text else {}
-                except Exception:
-                    blob = {}
-                res = {'id': ch.id, 'campaign_id': ch.campaign_id, 'user_id': ch.user_id, 'name': ch.name, 'maxHp': ch.maxHp, 'portrait': ch.portrait, **(blob if isinstance(blob, dict) else {})}
-                return jsonify(res), 200
+            found = character_payloads(s, s.query(Character).filter(Character.user_id == user['id']).order_by(Character.id).limit(1))
+            if found:
+                return jsonify(found[0]), 200
         finally:
             s.close()
     except Exception:
         # If DB is unavailable, in production surface the error; in dev fall back
-        if APP_ENV != 'development':
+        if not IN_MEMORY_FALLBACK:
             return jsonify({'message': 'database unavailable'}), 503
     # Fallback to in-memory mirror on user or global CHARACTERS (dev only)
     ch = user.get('character') or next((c for c in CHARACTERS if c.get('user_id') == user['id']), None)
@@ -1353,52 +1527,52 @@ def set_my_character():
         s = SessionLocal()
         try:
             existing = s.query(Character).filter(Character.user_id == user['id']).first()
+            blob = {'attributes': attributes, 'skills': skills, 'skillScores': skillScores, 'inventory': inventory}
             if existing:
+                prev = character_payload(existing)
                 setattr(existing, 'name', name or getattr(existing, 'name'))
                 setattr(existing, 'maxHp', maxHp)
-                setattr(existing, 'portrait', portrait or getattr(existing, 'portrait'))
-                # update blob
-                blob = {'attributes': attributes, 'skills': skills, 'skillScores': skillScores, 'inventory': inventory}
-                try:
-                    setattr(existing, 'data', json.dumps(blob))
-                except Exception:
-                    pass
+                apply_portrait(s, existing, portrait)
+                set_character_sheet(existing, blob)
+                # autosaves often resend an unchanged sheet: skip the write and the broadcast
+                if character_payload(existing) == prev:
+                    s.rollback()
+                    return jsonify(prev), 200
+                # bump in SQL so concurrent saves never share a revision
+                existing.revision = Character.revision + 1
                 s.add(existing)
+                record_change(s, existing.campaign_id, CHANGE_CHARACTER, existing.id)
                 s.commit()
                 s.refresh(existing)
                 ch = existing
             else:
+                prev = None
                 campaign_id = data.get('campaign_id')
-                blob = {'attributes': attributes, 'skills': skills, 'skillScores': skillScores, 'inventory': inventory}
-                ch = Character(campaign_id=campaign_id, user_id=user['id'], name=name or '', maxHp=maxHp, portrait=portrait or '', data=json.dumps(blob))
+                ch = Character(campaign_id=campaign_id, user_id=user['id'], name=name or '', maxHp=maxHp, portrait='', revision=1)
+                set_character_sheet(ch, blob)
+                apply_portrait(s, ch, portrait)
                 s.add(ch)
+                s.flush()
+                record_change(s, campaign_id, CHANGE_CHARACTER, ch.id)
                 s.commit()
                 s.refresh(ch)
-            res = {'id': ch.id, 'campaign_id': ch.campaign_id, 'user_id': ch.user_id, 'name': ch.name, 'maxHp': ch.maxHp, 'portrait': ch.portrait}
-            # attach blob if present
-            try:
-                blob_text = getattr(ch, 'data', None)
-                blob = json.loads(blob_text) if blob_text else {}
-            except Exception:
-                blob = {}
-            if isinstance(blob, dict):
-                res.update(blob)
-            # emit socket event for campaign room if campaign_id present
+            res = character_payload(ch)
+            # emit socket event for campaign room if campaign_id present: a
+            # JSON patch against the previous revision, or the full sheet if new
             try:
                 room = f'campaign_{res.get("campaign_id")}'
-                socketio.emit('character_updated', {'campaign_id': res.get('campaign_id'), 'user_id': res.get('user_id'), 'character_id': res.get('id'), 'character': res}, room)
+                emit_scheduler.emit('character_updated', character_update_event(prev, res), room)
             except Exception:
                 pass
             # mirror into in-memory list for demo compatibility
-            existing_mem = next((c for c in CHARACTERS if c.get('id') == res['id']), None)
-            if not existing_mem:
+            if IN_MEMORY_FALLBACK and not any(c for c in CHARACTERS if c.get('id') == res['id']):
                 CHARACTERS.append(res)
             return jsonify(res), 200
         finally:
             s.close()
     except Exception:
         # In case of DB failure, only fall back to in-memory in development.
-        if APP_ENV != 'development':
+        if not IN_MEMORY_FALLBACK:
             return jsonify({'message': 'database unavailable'}), 503
         # fallback to in-memory
         existing = next((c for c in CHARACTERS if c.get('user_id') == user['id']), None)
@@ -1412,7 +1586,7 @@ def set_my_character():
             existing['inventory'] = inventory
             try:
                 room = f'campaign_{existing.get("campaign_id")}'
-                socketio.emit('character_updated', {'campaign_id': existing.get('campaign_id'), 'user_id': existing.get('user_id'), 'character_id': existing.get('id'), 'character': existing}, room)
+                emit_scheduler.emit('character_updated', {'campaign_id': existing.get('campaign_id'), 'user_id': existing.get('user_id'), 'character_id': existing.get('id'), 'character': existing}, room)
             except Exception:
                 pass
             return jsonify(existing), 200
@@ -1422,7 +1596,7 @@ def set_my_character():
         CHARACTERS.append(ch)
         try:
             room = f'campaign_{ch.get("campaign_id")}'
-            socketio.emit('character_updated', {'campaign_id': ch.get('campaign_id'), 'user_id': ch.get('user_id'), 'character_id': ch.get('id'), 'character': ch}, room)
+            emit_scheduler.emit('character_updated', {'campaign_id': ch.get('campaign_id'), 'user_id': ch.get('user_id'), 'character_id': ch.get('id'), 'character': ch}, room)
         except Exception:
             pass
         return jsonify(ch), 201
@@ -3,9 +3,121 @@ import os
 # Environment configuration helpers
 APP_ENV = os.environ.get("APP_ENV", os.environ.get("FLASK_ENV", "production")).lower()
 DATABASE_URL = os.environ.get('DATABASE_URL') or 'sqlite:///./data.db'
+# SQLAlchemy engine / pool tuning (see db.build_engine)
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', '5'))
+DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', '10'))
+DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', '30'))
+DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', '1800'))
+DB_POOL_PRE_PING = os.environ.get('DB_POOL_PRE_PING', 'true').lower() in ('1', 'true', 'yes')
+# Postgres only; 0 leaves the server default in place
+DB_STATEMENT_TIMEOUT_MS = int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', '0'))
+# Opt-in SQLite production tuning: WAL + pragmas applied on every connection
+SQLITE_TUNING = os.environ.get('SQLITE_TUNING', 'false').lower() in ('1', 'true', 'yes')
+SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL').upper()
+SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)))
+# negative values are KiB, positive values are pages (SQLite convention)
+SQLITE_CACHE_SIZE = int(os.environ.get('SQLITE_CACHE_SIZE', '-20000'))
+SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', '5000'))
+# Serialize write transactions in-process; defaults to on whenever tuning is on
+SQLITE_SERIALIZE_WRITES = os.environ.get('SQLITE_SERIALIZE_WRITES', 'true' if SQLITE_TUNING else 'false').lower() in ('1', 'true', 'yes')
 REDIS_URL = os.environ.get('REDIS_URL') or os.environ.get('REDIS_URI')
+# Supported multi-process mode: several workers/instances behind a sticky
+# load balancer, fanning Socket.IO events out through REDIS_URL (docs/scaling.md)
+MULTI_WORKER = os.environ.get('MULTI_WORKER', 'false').lower() in ('1', 'true', 'yes')
+# Demo in-memory stores used when the database is unavailable. Development
+# only, and never in multi-worker mode where each process would disagree.
+IN_MEMORY_FALLBACK = (not MULTI_WORKER) and os.environ.get('IN_MEMORY_FALLBACK', 'true' if APP_ENV == 'development' else 'false').lower() in ('1', 'true', 'yes')
+# Timeout for cache calls to Redis; on failure the app falls back to the database
+REDIS_SOCKET_TIMEOUT = float(os.environ.get('REDIS_SOCKET_TIMEOUT', '0.5'))
 JWT_SECRET = os.environ.get('JWT_SECRET', 'devsecret')
 ALLOWED_ORIGINS = os.environ.get('ALLOWED_ORIGINS', '')
+# Public origin of this API (e.g. https://api.example.com); used to build
+# absolute asset URLs such as portraits. Empty derives it from the request
+# when PROXY_FIX_HOPS is set, otherwise those URLs stay relative.
+PUBLIC_API_BASE = os.environ.get('PUBLIC_API_BASE', '')
+# Reverse proxies in front of the app whose X-Forwarded-For/-Proto/-Host/-Port
+# are trusted (werkzeug ProxyFix, see utils.proxy_fix); 0 trusts none
+PROXY_FIX_HOPS = int(os.environ.get('PROXY_FIX_HOPS', '0'))
+# Message history paging: default page size and the hard server-side cap
+MESSAGE_PAGE_DEFAULT = int(os.environ.get('MESSAGE_PAGE_DEFAULT', '50'))
+MESSAGE_PAGE_MAX = int(os.environ.get('MESSAGE_PAGE_MAX', '200'))
+# Redis ring buffer of the newest messages per campaign (needs REDIS_URL); 0 disables
+MESSAGE_CACHE_SIZE = int(os.environ.get('MESSAGE_CACHE_SIZE', '200'))
+MESSAGE_CACHE_TTL = int(os.environ.get('MESSAGE_CACHE_TTL', str(7 * 24 * 3600)))
+# Chat message persistence: 'sync' commits each message, 'group' batches
+# commits but still waits for them, 'async' is write-behind (see services.message_writer)
+MESSAGE_WRITE_MODE = os.environ.get('MESSAGE_WRITE_MODE', 'sync').lower()
+MESSAGE_BATCH_SIZE = int(os.environ.get('MESSAGE_BATCH_SIZE', '100'))
+MESSAGE_BATCH_INTERVAL_MS = int(os.environ.get('MESSAGE_BATCH_INTERVAL_MS', '20'))
+MESSAGE_QUEUE_MAX = int(os.environ.get('MESSAGE_QUEUE_MAX', '10000'))
+# Authenticated-user cache (token digest -> claims + user); 0 disables
+AUTH_CACHE_TTL = float(os.environ.get('AUTH_CACHE_TTL', '60'))
+AUTH_CACHE_SIZE = int(os.environ.get('AUTH_CACHE_SIZE', '2048'))
+# Password hashing: 'auto' uses eventlet's tpool when monkey-patched, 'inline' never does
+PASSWORD_HASH_BACKEND = os.environ.get('PASSWORD_HASH_BACKEND', 'auto').lower()
+PASSWORD_HASH_CONCURRENCY = int(os.environ.get('PASSWORD_HASH_CONCURRENCY', '2'))
+# Campaign id/uuid/name -> campaign lookups; 0 disables
+CAMPAIGN_CACHE_TTL = float(os.environ.get('CAMPAIGN_CACHE_TTL', '300'))
+CAMPAIGN_CACHE_SIZE = int(os.environ.get('CAMPAIGN_CACHE_SIZE', '1024'))
+# Window for coalescing per-room character_updated bursts; 0 sends every event at once
+EMIT_COALESCE_MS = int(os.environ.get('EMIT_COALESCE_MS', '50'))
+# Presence: clients heartbeat every PRESENCE_HEARTBEAT_S and are dropped from the
+# room list after PRESENCE_TTL_S of silence; presence pushes go out at most once
+# per PRESENCE_THROTTLE_MS per room
+PRESENCE_HEARTBEAT_S = float(os.environ.get('PRESENCE_HEARTBEAT_S', '15'))
+PRESENCE_TTL_S = float(os.environ.get('PRESENCE_TTL_S', '45'))
+PRESENCE_THROTTLE_MS = int(os.environ.get('PRESENCE_THROTTLE_MS', '1000'))
+# Repeated "typing" from one socket is forwarded at most every TYPING_THROTTLE_S;
+# it is cleared after TYPING_TIMEOUT_S without a refresh
+TYPING_THROTTLE_S = float(os.environ.get('TYPING_THROTTLE_S', '2'))
+TYPING_TIMEOUT_S = float(os.environ.get('TYPING_TIMEOUT_S', '6'))
+# Incremental sync (GET /api/campaigns/<cid>/sync): more changed entities than
+# this and the client gets a full snapshot; tools/compact_changelog.py drops
+# message log rows older than CHANGELOG_RETENTION_DAYS
+SYNC_MAX_CHANGES = int(os.environ.get('SYNC_MAX_CHANGES', '1000'))
+CHANGELOG_RETENTION_DAYS = float(os.environ.get('CHANGELOG_RETENTION_DAYS', '30'))
+# Parsed character sheets keyed by (id, revision); 0 disables
+CHARACTER_CACHE_TTL = float(os.environ.get('CHARACTER_CACHE_TTL', '600'))
+CHARACTER_CACHE_SIZE = int(os.environ.get('CHARACTER_CACHE_SIZE', '4096'))
+# JSON encoder for responses and socket packets: auto (orjson when installed)
+# or stdlib
+JSON_BACKEND = os.environ.get('JSON_BACKEND', 'auto').lower()
+# gzip (brotli when installed) for JSON/text responses of at least
+# COMPRESS_MIN_BYTES; COMPRESS_LEVEL is the gzip level, 0 disables
+COMPRESS_MIN_BYTES = int(os.environ.get('COMPRESS_MIN_BYTES', '1024'))
+COMPRESS_LEVEL = int(os.environ.get('COMPRESS_LEVEL', '6'))
+# Built SPA served by utils.static_assets ahead of Flask (wsgi) or by Flask's
+# routes (flask); unhashed files such as index.html are cached STATIC_MAX_AGE s
+STATIC_ASSET_MODE = os.environ.get('STATIC_ASSET_MODE', 'wsgi').lower()
+STATIC_MAX_AGE = int(os.environ.get('STATIC_MAX_AGE', '60'))
+# Bearer token required by GET /api/metrics; empty serves it only outside
+# production
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+# Request profiler (utils.profiler), off unless one of the first two is set:
+# keep stack samples of PROFILE_SAMPLE_RATE of requests (0..1) and of every
+# request slower than PROFILE_SLOW_MS; at most PROFILE_MAX_FILES in
+# PROFILE_DIR (default: <tmp>/npc-profiles). PROFILE_TOKEN guards the
+# /api/_debug/profiles endpoints (without it they only exist outside production)
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', '0'))
+PROFILE_SLOW_MS = float(os.environ.get('PROFILE_SLOW_MS', '0'))
+PROFILE_INTERVAL_MS = float(os.environ.get('PROFILE_INTERVAL_MS', '5'))
+PROFILE_DIR = os.environ.get('PROFILE_DIR', '')
+PROFILE_MAX_FILES = int(os.environ.get('PROFILE_MAX_FILES', '50'))
+PROFILE_TOKEN = os.environ.get('PROFILE_TOKEN', '')
+# Hub watchdog (utils.hub_watchdog, eventlet only): a green thread wakes every
+# HUB_LAG_INTERVAL_MS and any wake-up later than HUB_LAG_THRESHOLD_MS is logged
+# with the stack of the greenlet that held the hub. 0 disables it
+HUB_LAG_THRESHOLD_MS = float(os.environ.get('HUB_LAG_THRESHOLD_MS', '100'))
+HUB_LAG_INTERVAL_MS = float(os.environ.get('HUB_LAG_INTERVAL_MS', '50'))
+# Bulk user provisioning (POST /api/admin/users/bulk, routes.admin): disabled
+# unless ADMIN_TOKEN is set; at most BULK_REGISTER_MAX users per request,
+# inserted BULK_REGISTER_BATCH per transaction
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN', '')
+BULK_REGISTER_MAX = int(os.environ.get('BULK_REGISTER_MAX', '1000'))
+BULK_REGISTER_BATCH = int(os.environ.get('BULK_REGISTER_BATCH', '200'))
+# Per-user membership sets used to authorize socket room joins; 0 disables
+MEMBERSHIP_CACHE_TTL = float(os.environ.get('MEMBERSHIP_CACHE_TTL', '300'))
+MEMBERSHIP_CACHE_SIZE = int(os.environ.get('MEMBERSHIP_CACHE_SIZE', '4096'))
 
 
 def determine_origins(app_env, allowed_origins_env):
@@ -1,11 +1,123 @@
-from sqlalchemy import create_engine
+import threading
+import time
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker, declarative_base
-from .config import DATABASE_URL
+from sqlalchemy.pool import QueuePool
+from .config import (DATABASE_URL, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE,
+                     DB_POOL_PRE_PING, DB_STATEMENT_TIMEOUT_MS, SQLITE_TUNING, SQLITE_SYNCHRONOUS,
+                     SQLITE_MMAP_SIZE, SQLITE_CACHE_SIZE, SQLITE_BUSY_TIMEOUT_MS, SQLITE_SERIALIZE_WRITES)
 
-engine = create_engine(DATABASE_URL, echo=False, connect_args={'check_same_thread': False} if DATABASE_URL.startswith('sqlite') else {})
+
+def build_engine(url=DATABASE_URL):
+    """Create the process-wide engine from env config.
+
+    Both the app factory and the legacy monolith import `engine` from here,
+    so a worker holds exactly one pool.
+    """
+    kwargs = {'echo': False, 'pool_pre_ping': DB_POOL_PRE_PING}
+    connect_args = {}
+    if url.startswith('sqlite'):
+        connect_args['check_same_thread'] = False
+        # in-memory databases use a single shared connection; leave pooling alone
+        if ':memory:' not in url and url not in ('sqlite://', 'sqlite:///'):
+            kwargs.update(poolclass=QueuePool, pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW, pool_timeout=DB_POOL_TIMEOUT)
+    else:
+        kwargs.update(pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW, pool_timeout=DB_POOL_TIMEOUT, pool_recycle=DB_POOL_RECYCLE)
+        if DB_STATEMENT_TIMEOUT_MS > 0 and url.startswith('postgres'):
+            connect_args['options'] = f'-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}'
+    eng = create_engine(url, connect_args=connect_args, **kwargs)
+    if url.startswith('sqlite') and SQLITE_TUNING:
+        apply_sqlite_pragmas(eng)
+    return eng
+
+
+def apply_sqlite_pragmas(eng):
+    """Run the production pragmas on every new DBAPI connection.
+
+    WAL lets readers proceed while a write is in progress, and busy_timeout
+    makes a blocked writer wait instead of failing with 'database is locked'.
+    """
+    @event.listens_for(eng, 'connect')
+    def _on_connect(dbapi_conn, _record):
+        cur = dbapi_conn.cursor()
+        try:
+            cur.execute('PRAGMA journal_mode=WAL')
+            cur.execute(f'PRAGMA synchronous={SQLITE_SYNCHRONOUS}')
+            cur.execute(f'PRAGMA busy_timeout={int(SQLITE_BUSY_TIMEOUT_MS)}')
+            cur.execute(f'PRAGMA mmap_size={int(SQLITE_MMAP_SIZE)}')
+            cur.execute(f'PRAGMA cache_size={int(SQLITE_CACHE_SIZE)}')
+        finally:
+            cur.close()
+
+
+class SQLiteWriteSerializer:
+    """Single-writer queue for sessions on a SQLite engine.
+
+    SQLite allows one writer at a time; concurrent writers otherwise race for
+    the lock and one of them eventually gets SQLITE_BUSY. A session takes the
+    process-wide writer lock at its first flush and gives it back when its
+    outermost transaction ends, so writes line up behind each other instead
+    of failing. Under eventlet the lock is green, so waiting yields the hub.
+    """
+
+    def __init__(self):
+        # reentrant so a greenlet that already writes through one session
+        # can't deadlock itself by flushing a second one
+        self._lock = threading.RLock()
+        self.waiting = 0
+        self.acquired = 0
+        self.wait_seconds = 0.0
+
+    def install(self, session_factory):
+        event.listen(session_factory, 'before_flush', self._before_flush)
+        event.listen(session_factory, 'after_transaction_end', self._after_transaction_end)
+
+    def _before_flush(self, session, _flush_context, _instances):
+        if session.info.get('sqlite_writer'):
+            return
+        started = time.perf_counter()
+        self.waiting += 1
+        try:
+            self._lock.acquire()
+        finally:
+            self.waiting -= 1
+        self.acquired += 1
+        self.wait_seconds += time.perf_counter() - started
+        session.info['sqlite_writer'] = True
+
+    def _after_transaction_end(self, session, transaction):
+        if transaction.parent is None and session.info.pop('sqlite_writer', False):
+            self._lock.release()
+
+    def stats(self):
+        return {'waiting': self.waiting, 'acquired': self.acquired, 'wait_seconds': self.wait_seconds}
+
+
+def pool_status(eng=None):
+    """Snapshot of the connection pool for health/metrics endpoints."""
+    pool = (eng or engine).pool
+    out = {'class': type(pool).__name__}
+    for name in ('size', 'checkedout', 'overflow', 'checkedin'):
+        fn = getattr(pool, name, None)
+        if callable(fn):
+            try:
+                out[name] = fn()
+            except Exception:
+                pass
+    if write_serializer is not None and eng is None:
+        out['sqlite_writer'] = write_serializer.stats()
+    return out
+
+
+engine = build_engine()
 SessionLocal = sessionmaker(bind=engine)
 Base = declarative_base()
 
+write_serializer = None
+if DATABASE_URL.startswith('sqlite') and SQLITE_SERIALIZE_WRITES:
+    write_serializer = SQLiteWriteSerializer()
+    write_serializer.install(SessionLocal)
+
 
 def init_db():
     try:
@@ -1,6 +1,7 @@
 from flask_cors import CORS
 from flask_socketio import SocketIO
+from .utils import fastjson
 
 # Create unbound extension objects to be initialized by the app factory
 cors = CORS()
-socketio = SocketIO(cors_allowed_origins="*")
+socketio = SocketIO(cors_allowed_origins="*", json=fastjson)
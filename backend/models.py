@@ -1,8 +1,45 @@
-from sqlalchemy import Column, Integer, String, Text, ForeignKey
+import json
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, Index, LargeBinary
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
+from sqlalchemy.types import TypeDecorator
 from .db import Base
 
 
+class JSONBlob(TypeDecorator):
+    """JSONB on Postgres, JSON text elsewhere.
+
+    Values are dicts/lists on both sides. Reads on SQLite tolerate text that
+    isn't valid JSON (rows written before the column was JSON) and give {}.
+    """
+    impl = Text
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == 'postgresql':
+            return dialect.type_descriptor(JSONB())
+        return dialect.type_descriptor(Text())
+
+    def process_bind_param(self, value, dialect):
+        if isinstance(value, str):
+            # callers that still pass serialized JSON
+            try:
+                value = json.loads(value)
+            except ValueError:
+                value = {}
+        if dialect.name == 'postgresql' or value is None:
+            return value
+        return json.dumps(value)
+
+    def process_result_value(self, value, dialect):
+        if isinstance(value, str):
+            try:
+                return json.loads(value) if value else {}
+            except ValueError:
+                return {}
+        return value
+
+
 class User(Base):
     __tablename__ = 'users'
     id = Column(Integer, primary_key=True, index=True)
@@ -17,7 +54,7 @@ class Campaign(Base):
     __tablename__ = 'campaigns'
     id = Column(Integer, primary_key=True, index=True)
     uuid = Column(String(36), unique=True, index=True, nullable=True)
-    name = Column(String)
+    name = Column(String, index=True)
     owner = Column(Integer)
     invite_code = Column(String)
     characters = relationship('Character', back_populates='campaign')
@@ -25,6 +62,7 @@ class Campaign(Base):
 
 class Membership(Base):
     __tablename__ = 'memberships'
+    __table_args__ = (Index('uq_memberships_user_campaign', 'user_id', 'campaign_id', unique=True),)
     id = Column(Integer, primary_key=True, index=True)
     uuid = Column(String(36), unique=True, index=True, nullable=True)
     campaign_id = Column(Integer, ForeignKey('campaigns.id'))
@@ -41,15 +79,43 @@ class Character(Base):
     name = Column(String)
     maxHp = Column(Integer)
     portrait = Column(Text)
-    data = Column(Text)
+    portrait_hash = Column(String(64), nullable=True)
+    # sheet fields other than the promoted ones below; see services.characters
+    data = Column(JSONBlob)
+    attributes = Column(JSONBlob)
+    skill_scores = Column(JSONBlob)
+    revision = Column(Integer, nullable=False, default=1, server_default='1')
     user = relationship('User', back_populates='character')
     campaign = relationship('Campaign', back_populates='characters')
 
 
 class Message(Base):
     __tablename__ = 'messages'
+    __table_args__ = (Index('ix_messages_campaign_id_id', 'campaign_id', 'id'),)
     id = Column(Integer, primary_key=True, index=True)
     campaign_id = Column(Integer, ForeignKey('campaigns.id'))
     author = Column(String)
     text = Column(Text)
     timestamp = Column(String)
+
+
+class CampaignChange(Base):
+    """Per-campaign change log; the row id is the revision (services.changelog)."""
+    __tablename__ = 'campaign_changes'
+    # AUTOINCREMENT: SQLite must never hand out a deleted id again
+    __table_args__ = (Index('ix_campaign_changes_campaign_id_id', 'campaign_id', 'id'),
+                      Index('ix_campaign_changes_entity', 'campaign_id', 'kind', 'entity_id'),
+                      {'sqlite_autoincrement': True})
+    id = Column(Integer, primary_key=True)
+    campaign_id = Column(Integer, ForeignKey('campaigns.id'), nullable=False)
+    kind = Column(String(16), nullable=False)
+    entity_id = Column(Integer)
+    created_at = Column(Integer)
+
+
+class Blob(Base):
+    __tablename__ = 'blobs'
+    hash = Column(String(64), primary_key=True)
+    content_type = Column(String)
+    size = Column(Integer)
+    data = Column(LargeBinary)
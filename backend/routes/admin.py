@@ -0,0 +1,76 @@
+import hmac
+import datetime
+from flask import Blueprint, jsonify, request
+from sqlalchemy.exc import SQLAlchemyError
+from ..config import ADMIN_TOKEN, BULK_REGISTER_MAX
+from ..services.campaigns import db_create_campaign, resolve_campaign, campaign_to_dict
+from ..services.provisioning import bulk_register, CREATED, EXISTS
+
+bp = Blueprint('admin', __name__)
+
+TEST_CAMPAIGN = 'Test Campaign'
+
+
+def _malformed(data):
+    """Why the request body can't be processed at all, or None."""
+    if not isinstance(data, dict):
+        return 'body must be a JSON object'
+    users = data.get('users')
+    if not isinstance(users, list) or not users:
+        return 'users must be a non-empty list'
+    if not all(isinstance(u, dict) for u in users):
+        return 'each user must be an object'
+    for flag in ('join_test_campaign', 'tokens'):
+        if data.get(flag) is not None and not isinstance(data[flag], bool):
+            return f'{flag} must be a boolean'
+    campaign = data.get('campaign')
+    if campaign is not None and (isinstance(campaign, bool) or not isinstance(campaign, (int, str))):
+        return 'campaign must be an id, uuid or name'
+    return None
+
+
+@bp.route('/api/admin/users/bulk', methods=['POST'])
+def bulk_register_users():
+    """Create many users in batched transactions (see services.provisioning).
+
+    Body: {"users": [{"email", "username", "password"}, ...],
+           "campaign": <id|uuid|name>? , "join_test_campaign": bool?, "tokens": bool?}
+    Requires `Authorization: Bearer $ADMIN_TOKEN`; 404 while ADMIN_TOKEN is unset.
+    Only users created by this call get a token and the membership; entries
+    whose fields aren't non-empty strings are reported as invalid.
+    """
+    if not ADMIN_TOKEN:
+        return jsonify({'message': 'not found'}), 404
+    if not hmac.compare_digest(request.headers.get('Authorization', '').encode(), f'Bearer {ADMIN_TOKEN}'.encode()):
+        return jsonify({'message': 'unauthorized'}), 401
+    data = request.get_json(silent=True)
+    error = _malformed(data)
+    if error:
+        return jsonify({'message': error}), 400
+    users = data['users']
+    if len(users) > BULK_REGISTER_MAX:
+        return jsonify({'message': f'at most {BULK_REGISTER_MAX} users per request'}), 400
+    campaign_id = None
+    try:
+        if data.get('campaign') is not None:
+            camp = resolve_campaign(data.get('campaign'))
+            if not camp:
+                return jsonify({'message': 'campaign not found'}), 404
+            campaign_id = camp['id']
+        elif data.get('join_test_campaign'):
+            camp = resolve_campaign(TEST_CAMPAIGN)
+            if not camp:
+                # same shape as POST /api/campaigns/test/join, without an owner
+                camp = campaign_to_dict(db_create_campaign(TEST_CAMPAIGN, None, invite_code=f"TEST-{int(datetime.datetime.utcnow().timestamp()) % 10000:04d}"))
+            campaign_id = camp['id']
+        results = bulk_register(users, campaign_id, with_tokens=data.get('tokens') is not False)
+    except SQLAlchemyError:
+        return jsonify({'message': 'database unavailable'}), 503
+    statuses = [r['status'] for r in results]
+    return jsonify({
+        'campaign_id': campaign_id,
+        'created': statuses.count(CREATED),
+        'existing': statuses.count(EXISTS),
+        'rejected': len(statuses) - statuses.count(CREATED) - statuses.count(EXISTS),
+        'users': results,
+    }), 200
@@ -1,10 +1,10 @@
 from flask import Blueprint, jsonify, request
-from ..services.auth import make_token, get_user_from_auth
+from ..services.auth import make_token, get_user_from_auth, invalidate_user_cache
 from ..services.campaigns import db_create_campaign
 from ..db import SessionLocal
 from ..models import User
-from ..config import APP_ENV
-from werkzeug.security import generate_password_hash, check_password_hash
+from ..config import IN_MEMORY_FALLBACK
+from ..services.passwords import hash_password, verify_password
 
 bp = Blueprint('auth', __name__)
 
@@ -35,7 +35,7 @@ def register():
     if existing:
         return jsonify({"message": "email already exists"}), 400
     start_time = __import__('time').time()
-    pwd_hash = generate_password_hash(password)
+    pwd_hash = hash_password(password)
     try:
         new_user = None
         try:
@@ -47,15 +47,17 @@ def register():
             s.refresh(u)
             new_user = u
             s.close()
+            # ids can be reused after a delete; never serve a stale cached identity
+            invalidate_user_cache(new_user.id)
         except Exception:
             raise
         mirror = {'id': new_user.id, 'email': new_user.email, 'username': new_user.username, 'password_hash': new_user.password_hash}
-        if APP_ENV == 'development':
+        if IN_MEMORY_FALLBACK:
             USERS.append(mirror)
         token = make_token(mirror)
         return jsonify({"token": token, "user": mirror}), 201
     except Exception:
-        if APP_ENV != 'development':
+        if not IN_MEMORY_FALLBACK:
             return jsonify({'message': 'database unavailable'}), 503
         if any(u['email'] == email for u in USERS):
             return jsonify({"message": "email already exists"}), 400
@@ -63,7 +65,7 @@ def register():
             'id': NEXT_USER_ID,
             'email': email,
             'username': username,
-            'password_hash': generate_password_hash(password)
+            'password_hash': pwd_hash
         }
         NEXT_USER_ID += 1
         USERS.append(user)
@@ -89,20 +91,20 @@ def login():
         db_error = True
     if dbu:
         try:
-            if not check_password_hash(str(dbu.password_hash), password):
+            if not verify_password(str(dbu.password_hash), password):
                 return jsonify({'message': 'invalid credentials'}), 401
         except Exception:
             return jsonify({'message': 'invalid credentials'}), 401
         user = {'id': dbu.id, 'email': dbu.email, 'username': dbu.username}
         token = make_token(user)
         return jsonify({'token': token, 'user': user}), 200
-    if db_error and APP_ENV != 'development':
+    if db_error and not IN_MEMORY_FALLBACK:
         return jsonify({'message': 'database unavailable'}), 503
     user = next((u for u in USERS if u['email'] == email), None)
     if not user:
         return jsonify({'message': 'invalid credentials'}), 401
     try:
-        if not check_password_hash(user.get('password_hash', ''), password):
+        if not verify_password(user.get('password_hash', ''), password):
             return jsonify({'message': 'invalid credentials'}), 401
     except Exception:
         return jsonify({'message': 'invalid credentials'}), 401
@@ -1,6 +1,8 @@
 from flask import Blueprint, jsonify, request
-from ..services.campaigns import db_get_campaigns_for_user, db_create_campaign, resolve_campaign_id
+from ..services.campaigns import db_get_campaigns_for_user, db_create_campaign, resolve_campaign_id, db_is_member
 from ..services.auth import get_user_from_auth
+from ..services.messages import parse_cursor
+from ..services.sync import sync_campaign
 
 bp = Blueprint('campaigns', __name__)
 
@@ -14,8 +16,8 @@ def list_campaigns():
         camps = db_get_campaigns_for_user(user['id'])
         return jsonify([{'id': c.id, 'uuid': getattr(c, 'uuid', None), 'name': c.name, 'owner': c.owner, 'invite_code': c.invite_code} for c in camps])
     except Exception:
-        from ..config import APP_ENV
-        if APP_ENV != 'development':
+        from ..config import IN_MEMORY_FALLBACK
+        if not IN_MEMORY_FALLBACK:
             return jsonify({'message': 'database unavailable'}), 503
         # Development fallback: return in-memory campaigns if DB unavailable
         member_ids = [m['campaign_id'] for m in [] if m.get('user_id') == user['id']]
@@ -36,3 +38,21 @@ def create_campaign():
         return jsonify({'id': c.id, 'uuid': getattr(c, 'uuid', None), 'name': c.name, 'owner': c.owner, 'invite_code': c.invite_code}), 201
     except Exception:
         return jsonify({'message': 'database unavailable'}), 503
+
+
+@bp.route('/api/campaigns/<cid>/sync', methods=['GET'])
+def sync(cid):
+    """Messages, characters and members changed since ?since=<revision>
+    (a full snapshot without one); see services.sync."""
+    user = get_user_from_auth()
+    if not user:
+        return jsonify({'message': 'unauthorized'}), 401
+    try:
+        mid = resolve_campaign_id(cid)
+        if mid is None:
+            return jsonify({'message': 'campaign not found'}), 404
+        if not db_is_member(mid, user['id']):
+            return jsonify({'message': 'forbidden'}), 403
+        return jsonify(sync_campaign(mid, parse_cursor(request.args.get('since'))))
+    except Exception:
+        return jsonify({'message': 'database unavailable'}), 503
@@ -1,6 +1,8 @@
 from flask import Blueprint, jsonify, request
-from ..services.characters import db_get_characters_for_campaign, db_create_character, pack_character_data, unpack_character_data
+from ..services.characters import characters_revision, db_get_characters_for_campaign, db_get_character, db_create_character, sheet_from_payload
 from ..services.auth import get_user_from_auth
+from ..services.campaigns import resolve_campaign_id, db_is_member
+from ..utils.conditional import revision_etag, not_modified, with_etag
 
 bp = Blueprint('characters', __name__)
 
@@ -11,19 +13,42 @@ def list_characters(cid):
     if not user:
         return jsonify({'message': 'unauthorized'}), 401
     try:
-        mid = int(cid) if cid.isdigit() else cid
-    except Exception:
-        mid = cid
-    try:
+        mid = resolve_campaign_id(cid)
+        if mid is None:
+            return jsonify({'message': 'campaign not found'}), 404
+        etag = revision_etag('characters', mid, characters_revision(mid))
+        cached = not_modified(etag)
+        if cached is not None:
+            return cached
         chars = db_get_characters_for_campaign(mid)
-        return jsonify([{'id': c.id, 'name': c.name, 'user_id': c.user_id, 'data': unpack_character_data(c.data)} for c in chars])
+        return with_etag(jsonify([{'id': c['id'], 'name': c['name'], 'user_id': c['user_id'], 'data': sheet_from_payload(c)} for c in chars]), etag)
     except Exception:
-        from ..config import APP_ENV
-        if APP_ENV != 'development':
+        from ..config import IN_MEMORY_FALLBACK
+        if not IN_MEMORY_FALLBACK:
             return jsonify({'message': 'database unavailable'}), 503
         return jsonify([])
 
 
+@bp.route('/api/campaigns/<cid>/characters/<int:char_id>', methods=['GET'])
+def get_character(cid, char_id):
+    """Full current sheet for clients resyncing after a revision gap."""
+    user = get_user_from_auth()
+    if not user:
+        return jsonify({'message': 'unauthorized'}), 401
+    try:
+        mid = resolve_campaign_id(cid)
+        if mid is None:
+            return jsonify({'message': 'campaign not found'}), 404
+        if not db_is_member(mid, user['id']):
+            return jsonify({'message': 'forbidden'}), 403
+        ch = db_get_character(mid, char_id)
+        if not ch:
+            return jsonify({'message': 'character not found'}), 404
+        return jsonify(ch)
+    except Exception:
+        return jsonify({'message': 'database unavailable'}), 503
+
+
 @bp.route('/api/campaigns/<cid>/characters', methods=['POST'])
 def create_character(cid):
     user = get_user_from_auth()
@@ -35,11 +60,10 @@ def create_character(cid):
     if not name:
         return jsonify({'message': 'name required'}), 400
     try:
-        mid = int(cid) if cid.isdigit() else cid
-    except Exception:
-        mid = cid
-    try:
-        c = db_create_character(mid, user.get('id'), name, pack_character_data(blob))
-        return jsonify({'id': c.id, 'name': c.name, 'user_id': c.user_id, 'data': unpack_character_data(c.data)}), 201
+        mid = resolve_campaign_id(cid)
+        if mid is None:
+            return jsonify({'message': 'campaign not found'}), 404
+        c = db_create_character(mid, user.get('id'), name, blob)
+        return jsonify({'id': c['id'], 'name': c['name'], 'user_id': c['user_id'], 'data': sheet_from_payload(c)}), 201
     except Exception:
         return jsonify({'message': 'database unavailable'}), 503
@@ -1,6 +1,12 @@
 from flask import Blueprint, jsonify, request
 import redis
 from ..config import REDIS_URL, APP_ENV
+from ..services.passwords import hashing_stats
+from ..services.message_writer import writer as message_writer
+from ..services.socket_auth import socket_auth_stats
+from ..services.characters import SHEET_CACHE
+from ..utils import fastjson
+from ..utils.compression import compression_stats
 
 bp = Blueprint('health', __name__)
 
@@ -52,6 +58,24 @@ def health():
     # Always return 200 with a best-effort snapshot of database/redis availability.
     # This prevents external monitors from treating optional infra (like Redis)
     # as a hard service outage while keeping visibility into issues.
+    health['password_hashing'] = hashing_stats()
+    health['message_writer'] = message_writer.stats()
+    health['socket_auth'] = socket_auth_stats()
+    health['character_cache'] = SHEET_CACHE.stats()
+    health['json_backend'] = fastjson.BACKEND
+    health['compression'] = compression_stats()
+    try:
+        from ..sockets.campaigns import emit_scheduler, presence
+        health['emit_coalescing'] = emit_scheduler.stats()
+        health['presence'] = presence.stats()
+    except Exception:
+        health['emit_coalescing'] = None
+        health['presence'] = None
+    try:
+        from ..db import pool_status
+        health['db_pool'] = pool_status()
+    except Exception:
+        health['db_pool'] = None
     health['ok'] = health['database']
     return jsonify(health), 200
 
@@ -1,6 +1,8 @@
 from flask import Blueprint, jsonify, request
-from ..services.messages import db_get_messages_for_campaign, db_create_message
+from ..services.messages import messages_revision, get_messages_page, db_create_message, clamp_page_limit, parse_cursor
 from ..services.auth import get_user_from_auth
+from ..services.campaigns import resolve_campaign_id
+from ..utils.conditional import revision_etag, not_modified, with_etag
 
 bp = Blueprint('messages', __name__)
 
@@ -10,16 +12,24 @@ def list_messages(cid):
     user = get_user_from_auth()
     if not user:
         return jsonify({'message': 'unauthorized'}), 401
+    limit = clamp_page_limit(request.args.get('limit'))
     try:
-        mid = int(cid) if cid.isdigit() else cid
+        mid = resolve_campaign_id(cid)
+        if mid is None:
+            return jsonify({'message': 'campaign not found'}), 404
+        etag = revision_etag('messages', mid, *messages_revision(mid))
+        cached = not_modified(etag)
+        if cached is not None:
+            return cached
+        msgs = get_messages_page(mid, before_id=parse_cursor(request.args.get('before_id')), after_id=parse_cursor(request.args.get('after_id')), limit=limit)
+        resp = with_etag(jsonify(msgs), etag)
+        # A full page means older history may exist; hand the client its next cursor
+        if len(msgs) == limit:
+            resp.headers['X-Next-Before-Id'] = str(msgs[0]['id'])
+        return resp
     except Exception:
-        mid = cid
-    try:
-        msgs = db_get_messages_for_campaign(mid)
-        return jsonify([{'id': m.id, 'campaign_id': m.campaign_id, 'author': m.author, 'text': m.text, 'timestamp': m.timestamp} for m in msgs])
-    except Exception:
-        from ..config import APP_ENV
-        if APP_ENV != 'development':
+        from ..config import IN_MEMORY_FALLBACK
+        if not IN_MEMORY_FALLBACK:
             return jsonify({'message': 'database unavailable'}), 503
         return jsonify([])
 
@@ -34,10 +44,9 @@ def post_message(cid):
     if not text:
         return jsonify({'message': 'text required'}), 400
     try:
-        mid = int(cid) if cid.isdigit() else cid
-    except Exception:
-        mid = cid
-    try:
+        mid = resolve_campaign_id(cid)
+        if mid is None:
+            return jsonify({'message': 'campaign not found'}), 404
         m = db_create_message(mid, user.get('username') or user.get('email'), text)
         return jsonify({'id': m.id, 'campaign_id': m.campaign_id, 'author': m.author, 'text': m.text, 'timestamp': m.timestamp}), 201
     except Exception:
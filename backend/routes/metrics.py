@@ -0,0 +1,26 @@
+import hmac
+from flask import Blueprint, request, jsonify
+from ..config import APP_ENV, METRICS_TOKEN
+from ..utils.metrics import REGISTRY
+
+bp = Blueprint('metrics', __name__)
+
+# Prometheus text exposition format
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _allowed():
+    # with a token configured it is required; without one, never in production
+    if METRICS_TOKEN:
+        return hmac.compare_digest(request.headers.get('Authorization', '').encode(), f'Bearer {METRICS_TOKEN}'.encode())
+    return APP_ENV != 'production'
+
+
+@bp.route('/api/metrics', methods=['GET'])
+def metrics():
+    """This worker's counters, histograms and stats gauges; see
+    services.metrics. With METRICS_TOKEN set, scrapers must send it as a
+    bearer token; without one the endpoint only exists outside production."""
+    if not _allowed():
+        return jsonify({'message': 'not found'}), 404
+    return REGISTRY.render(), 200, {'Content-Type': CONTENT_TYPE, 'Cache-Control': 'no-store'}
@@ -0,0 +1,33 @@
+from flask import Blueprint, jsonify, request, make_response
+from ..db import SessionLocal
+from ..models import Blob
+
+bp = Blueprint('portraits', __name__)
+
+# Content never changes for a given hash, so clients and CDNs may keep it forever
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+
+@bp.route('/api/portraits/<h>', methods=['GET'])
+def get_portrait(h):
+    etag = f'"{h}"'
+    if etag in [t.strip() for t in (request.headers.get('If-None-Match') or '').split(',')]:
+        resp = make_response('', 304)
+        resp.headers['ETag'] = etag
+        resp.headers['Cache-Control'] = IMMUTABLE
+        return resp
+    try:
+        s = SessionLocal()
+        try:
+            b = s.get(Blob, h)
+            if b is None:
+                return jsonify({'message': 'not found'}), 404
+            resp = make_response(bytes(b.data or b''))
+            resp.headers['Content-Type'] = b.content_type or 'application/octet-stream'
+        finally:
+            s.close()
+    except Exception:
+        return jsonify({'message': 'database unavailable'}), 503
+    resp.headers['ETag'] = etag
+    resp.headers['Cache-Control'] = IMMUTABLE
+    return resp
@@ -0,0 +1,32 @@
+import os
+import hmac
+from flask import Blueprint, jsonify, request, send_from_directory
+from ..config import APP_ENV, PROFILE_TOKEN
+from ..utils.profiler import list_profiles, profile_dir
+
+bp = Blueprint('profiles', __name__)
+
+
+def _allowed():
+    # with a token configured it is required; without one, never in production
+    if PROFILE_TOKEN:
+        return hmac.compare_digest(request.headers.get('Authorization', '').encode(), f'Bearer {PROFILE_TOKEN}'.encode())
+    return APP_ENV != 'production'
+
+
+@bp.route('/api/_debug/profiles', methods=['GET'])
+def profiles():
+    """Captured request profiles on this worker, newest first; see utils.profiler."""
+    if not _allowed():
+        return jsonify({'message': 'not found'}), 404
+    return jsonify({'directory': profile_dir(), 'profiles': list_profiles()})
+
+
+@bp.route('/api/_debug/profiles/<name>', methods=['GET'])
+def download_profile(name):
+    if not _allowed():
+        return jsonify({'message': 'not found'}), 404
+    # only names the listing would show; no paths
+    if name != os.path.basename(name) or name not in {p['name'] for p in list_profiles()}:
+        return jsonify({'message': 'not found'}), 404
+    return send_from_directory(profile_dir(), name, mimetype='text/plain', as_attachment=True)
@@ -1,5 +1,6 @@
 from flask import Blueprint, current_app, send_from_directory, jsonify
 import os
+from ..utils.static_assets import INDEX_CACHE_CONTROL
 
 bp = Blueprint('spa', __name__)
 
@@ -13,7 +14,9 @@ def spa(path):
             return send_from_directory(static_folder, path)
         index = os.path.join(static_folder, 'index.html')
         if os.path.exists(index):
-            return send_from_directory(static_folder, 'index.html')
+            resp = send_from_directory(static_folder, 'index.html')
+            resp.headers['Cache-Control'] = INDEX_CACHE_CONTROL
+            return resp
     if path == '' or path == 'index.html':
         return jsonify({"message": "Frontend not built. Run `cd frontend && npm run build` and restart backend."}), 200
     return jsonify({"message": "Not found"}), 404
@@ -1,11 +1,14 @@
 from flask import Blueprint, jsonify, request
-import json
 
 from ..services.auth import get_user_from_auth, make_token
-from ..services.campaigns import db_get_campaign_by_id, db_get_campaign_by_name
+from ..services.campaigns import resolve_campaign
+from ..services.portraits import apply_portrait
+from ..services.characters import character_payload, character_payloads, character_update_event, set_character_sheet
+from ..services.changelog import record_change, CHARACTER
+from ..sockets.campaigns import emit_to_campaign
 from ..db import SessionLocal
 from ..models import User, Character
-from ..config import APP_ENV
+from ..config import IN_MEMORY_FALLBACK
 
 bp = Blueprint('users', __name__)
 
@@ -20,21 +23,11 @@ def set_active_campaign():
     camp = None
     db_error = False
 
-    # look up campaign by id or name
-    if isinstance(cid, int) or (isinstance(cid, str) and cid.isdigit()):
-        try:
-            db_c = db_get_campaign_by_id(int(cid))
-            if db_c:
-                camp = {'id': db_c.id, 'name': db_c.name, 'owner': db_c.owner, 'invite_code': db_c.invite_code}
-        except Exception:
-            db_error = True
-    else:
-        try:
-            db_c = db_get_campaign_by_name(cid) if cid is not None else None
-            if db_c:
-                camp = {'id': db_c.id, 'name': db_c.name, 'owner': db_c.owner, 'invite_code': db_c.invite_code}
-        except Exception:
-            db_error = True
+    # look up campaign by id, uuid or name
+    try:
+        camp = resolve_campaign(cid)
+    except Exception:
+        db_error = True
 
     if not camp and cid is not None:
         return jsonify({"message": "campaign not found"}), 404
@@ -56,7 +49,7 @@ def set_active_campaign():
         token = make_token(mirror)
         return jsonify({'token': token, 'user': mirror}), 200
 
-    if db_error and APP_ENV != 'development':
+    if db_error and not IN_MEMORY_FALLBACK:
         return jsonify({'message': 'database unavailable'}), 503
 
     # Development fallback: return token with updated claim
@@ -75,19 +68,13 @@ def get_my_character():
     try:
         s = SessionLocal()
         try:
-            ch = s.query(Character).filter(Character.user_id == user['id']).first()
-            if ch:
-                try:
-                    blob_text = getattr(ch, 'data', None)
-                    blob = json.loads(blob_text) if blob_text else {}
-                except Exception:
-                    blob = {}
-                res = {'id': ch.id, 'campaign_id': ch.campaign_id, 'user_id': ch.user_id, 'name': ch.name, 'maxHp': ch.maxHp, 'portrait': ch.portrait, **(blob if isinstance(blob, dict) else {})}
-                return jsonify(res), 200
+            found = character_payloads(s, s.query(Character).filter(Character.user_id == user['id']).order_by(Character.id).limit(1))
+            if found:
+                return jsonify(found[0]), 200
         finally:
             s.close()
     except Exception:
-        if APP_ENV != 'development':
+        if not IN_MEMORY_FALLBACK:
             return jsonify({'message': 'database unavailable'}), 503
 
     return jsonify({}), 404
@@ -114,38 +101,43 @@ def set_my_character():
         s = SessionLocal()
         try:
             existing = s.query(Character).filter(Character.user_id == user['id']).first()
+            blob = {'attributes': attributes, 'skills': skills, 'skillScores': skillScores, 'inventory': inventory}
             if existing:
+                prev = character_payload(existing)
                 setattr(existing, 'name', name or getattr(existing, 'name'))
                 setattr(existing, 'maxHp', maxHp)
-                setattr(existing, 'portrait', portrait or getattr(existing, 'portrait'))
-                blob = {'attributes': attributes, 'skills': skills, 'skillScores': skillScores, 'inventory': inventory}
-                try:
-                    setattr(existing, 'data', json.dumps(blob))
-                except Exception:
-                    pass
+                apply_portrait(s, existing, portrait)
+                set_character_sheet(existing, blob)
+                # unchanged autosave: no write, no broadcast
+                if character_payload(existing) == prev:
+                    s.rollback()
+                    return jsonify(prev), 200
+                existing.revision = Character.revision + 1
                 s.add(existing)
+                record_change(s, existing.campaign_id, CHARACTER, existing.id)
                 s.commit()
                 s.refresh(existing)
                 ch = existing
             else:
+                prev = None
                 campaign_id = data.get('campaign_id')
-                blob = {'attributes': attributes, 'skills': skills, 'skillScores': skillScores, 'inventory': inventory}
-                ch = Character(campaign_id=campaign_id, user_id=user['id'], name=name or '', maxHp=maxHp, portrait=portrait or '', data=json.dumps(blob))
+                ch = Character(campaign_id=campaign_id, user_id=user['id'], name=name or '', maxHp=maxHp, portrait='', revision=1)
+                set_character_sheet(ch, blob)
+                apply_portrait(s, ch, portrait)
                 s.add(ch)
+                s.flush()
+                record_change(s, campaign_id, CHARACTER, ch.id)
                 s.commit()
                 s.refresh(ch)
-            res = {'id': ch.id, 'campaign_id': ch.campaign_id, 'user_id': ch.user_id, 'name': ch.name, 'maxHp': ch.maxHp, 'portrait': ch.portrait}
+            res = character_payload(ch)
             try:
-                blob_text = getattr(ch, 'data', None)
-                blob = json.loads(blob_text) if blob_text else {}
+                emit_to_campaign('character_updated', character_update_event(prev, res), res.get('campaign_id'))
             except Exception:
-                blob = {}
-            if isinstance(blob, dict):
-                res.update(blob)
+                pass
             return jsonify(res), 200
         finally:
             s.close()
     except Exception:
-        if APP_ENV != 'development':
+        if not IN_MEMORY_FALLBACK:
             return jsonify({'message': 'database unavailable'}), 503
         return jsonify({'message': 'database unavailable'}), 503
\ No newline at end of file
@@ -1,8 +1,44 @@
+import hashlib
+import time
 import jwt
 from flask import request
 from ..db import SessionLocal
-from ..config import JWT_SECRET, APP_ENV
+from ..config import JWT_SECRET, IN_MEMORY_FALLBACK, AUTH_CACHE_TTL, AUTH_CACHE_SIZE
 from ..models import User
+from ..utils.cache import TTLCache
+
+# token digest -> {'claims': ..., 'user': ...}; only DB-resolved users are cached
+AUTH_CACHE = TTLCache(AUTH_CACHE_SIZE, AUTH_CACHE_TTL)
+
+
+def token_cache_key(token):
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+
+def cache_auth_result(token, claims, user):
+    AUTH_CACHE.set(token_cache_key(token), {'claims': claims, 'user': user})
+
+
+def cached_auth_user(token):
+    """Return a copy of the cached user for this token, or None on a miss."""
+    key = token_cache_key(token)
+    entry = AUTH_CACHE.get(key)
+    if entry is None:
+        return None
+    exp = entry['claims'].get('exp') if isinstance(entry['claims'], dict) else None
+    if exp is not None and exp <= time.time():
+        AUTH_CACHE.pop(key)
+        return None
+    return dict(entry['user'])
+
+
+def invalidate_user_cache(uid=None):
+    """Forget cached auth results for one user (or everyone when uid is None).
+    Call whenever a user row is changed or deleted."""
+    if uid is None:
+        AUTH_CACHE.clear()
+        return
+    AUTH_CACHE.discard_where(lambda e: e['user'].get('id') == uid)
 
 
 def make_token(user):
@@ -65,6 +101,16 @@ def get_user_from_auth(req=None, in_memory_users=None):
             pass
     if not token:
         return None
+    return user_from_token(token, in_memory_users)
+
+
+def user_from_token(token, in_memory_users=None):
+    """Verify a JWT and return the user dict it names, or None."""
+    if not token:
+        return None
+    cached = cached_auth_user(token)
+    if cached is not None:
+        return cached
     try:
         data = jwt.decode(token, JWT_SECRET, algorithms=['HS256'])
         uid = data.get('sub')
@@ -79,10 +125,12 @@ def get_user_from_auth(req=None, in_memory_users=None):
             dbu = s.query(User).filter(User.id == uid).first()
             s.close()
             if dbu:
-                return {'id': dbu.id, 'email': dbu.email, 'username': dbu.username}
+                user = {'id': dbu.id, 'email': dbu.email, 'username': dbu.username}
+                cache_auth_result(token, data, user)
+                return dict(user)
         except Exception:
             db_error = True
-        if APP_ENV == 'development' or not db_error:
+        if IN_MEMORY_FALLBACK:
             if in_memory_users:
                 return next((u for u in in_memory_users if u.get('id') == uid), None)
         return None
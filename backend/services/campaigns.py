@@ -1,8 +1,22 @@
 import datetime
 import uuid as _uuid
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
 from ..db import SessionLocal
 from ..models import Campaign, Membership
+from ..config import CAMPAIGN_CACHE_TTL, CAMPAIGN_CACHE_SIZE, MEMBERSHIP_CACHE_TTL, MEMBERSHIP_CACHE_SIZE
 from ..utils.ids import is_int_like
+from ..utils.cache import TTLCache
+from . import changelog
+
+# ('id'|'uuid'|'name', value) -> campaign dict; see resolve_campaign
+CAMPAIGN_CACHE = TTLCache(CAMPAIGN_CACHE_SIZE, CAMPAIGN_CACHE_TTL)
+# user id -> frozenset of campaign ids; see user_campaign_ids
+MEMBERSHIP_CACHE = TTLCache(MEMBERSHIP_CACHE_SIZE, MEMBERSHIP_CACHE_TTL)
+
+
+def campaign_to_dict(c):
+    return {'id': c.id, 'uuid': getattr(c, 'uuid', None), 'name': c.name, 'owner': c.owner, 'invite_code': c.invite_code}
 
 
 def db_create_campaign(name, owner_id, invite_code=None):
@@ -13,6 +27,7 @@ def db_create_campaign(name, owner_id, invite_code=None):
         s.add(c)
         s.commit()
         s.refresh(c)
+        invalidate_campaign(c)
         return c
     finally:
         s.close()
@@ -47,20 +62,151 @@ def db_get_campaigns_for_user(uid):
         s.close()
 
 
+def campaign_list_revision():
+    """(count, newest id) of all campaigns. Campaigns are only ever created,
+    so this changes exactly when the public listing does."""
+    s = SessionLocal()
+    try:
+        count, newest = s.query(func.count(Campaign.id), func.max(Campaign.id)).one()
+        return count, newest or 0
+    finally:
+        s.close()
+
+
 def db_create_membership(campaign_id, user_id, role='player'):
+    """Add user_id to campaign_id. Idempotent: an existing membership is
+    returned unchanged (including its role) instead of inserting a duplicate."""
     s = SessionLocal()
     try:
+        existing = s.query(Membership).filter(Membership.user_id == user_id, Membership.campaign_id == campaign_id).first()
+        if existing:
+            return existing
         m = Membership(campaign_id=campaign_id, user_id=user_id, role=role, uuid=str(_uuid.uuid4()))
         s.add(m)
-        s.commit()
+        try:
+            s.flush()
+            changelog.record_change(s, campaign_id, changelog.MEMBER, user_id)
+            s.commit()
+        except IntegrityError:
+            # lost a race with a concurrent join; the unique index kept one row
+            s.rollback()
+            return s.query(Membership).filter(Membership.user_id == user_id, Membership.campaign_id == campaign_id).first()
         s.refresh(m)
+        invalidate_memberships(user_id)
         return m
     finally:
         s.close()
 
 
-def resolve_campaign_id(val):
-    # Accept integer ids as ints, otherwise return as-is for UUID or name
+def db_is_member(campaign_id, user_id):
+    """Single indexed EXISTS probe on (user_id, campaign_id)."""
+    if campaign_id is None or user_id is None:
+        return False
+    s = SessionLocal()
+    try:
+        q = s.query(Membership.id).filter(Membership.user_id == user_id, Membership.campaign_id == campaign_id)
+        return bool(s.query(q.exists()).scalar())
+    finally:
+        s.close()
+
+
+def user_campaign_ids(user_id):
+    """Campaign ids the user belongs to, cached per user so socket joins in
+    a reconnect storm cost one query per user rather than one per join."""
+    ids = MEMBERSHIP_CACHE.get(user_id)
+    if ids is not None:
+        return ids
+    s = SessionLocal()
+    try:
+        ids = frozenset(cid for (cid,) in s.query(Membership.campaign_id).filter(Membership.user_id == user_id) if cid is not None)
+    finally:
+        s.close()
+    MEMBERSHIP_CACHE.set(user_id, ids)
+    return ids
+
+
+def can_access_campaign(user_id, campaign_id):
+    """Membership check against the cached set. A miss is re-checked in the
+    database before refusing, so a membership created on another worker
+    (whose invalidation we never saw) is never rejected."""
+    if campaign_id is None or user_id is None:
+        return False
+    if campaign_id in user_campaign_ids(user_id):
+        return True
+    if db_is_member(campaign_id, user_id):
+        invalidate_memberships(user_id)
+        return True
+    return False
+
+
+def invalidate_memberships(user_id=None):
+    if user_id is None:
+        MEMBERSHIP_CACHE.clear()
+    else:
+        MEMBERSHIP_CACHE.pop(user_id)
+
+
+def _cache_campaign(camp, by_name=False):
+    # names are not unique, so only remember a name that actually resolved
+    keys = [('id', camp['id']), ('uuid', camp['uuid'])]
+    if by_name:
+        keys.append(('name', camp['name']))
+    for key in keys:
+        if key[1] is not None:
+            CAMPAIGN_CACHE.set(key, camp)
+
+
+def invalidate_campaign(camp=None):
+    """Drop cached lookups for a campaign (ORM row or dict) after it is
+    created or renamed; with no argument the whole cache is cleared."""
+    if camp is None:
+        CAMPAIGN_CACHE.clear()
+        return
+    if not isinstance(camp, dict):
+        camp = campaign_to_dict(camp)
+    # also catch entries cached under the campaign's previous name
+    CAMPAIGN_CACHE.discard_where(lambda v: v['id'] == camp['id'])
+    if camp.get('name') is not None:
+        CAMPAIGN_CACHE.pop(('name', camp['name']))
+
+
+def resolve_campaign(val):
+    """Resolve a numeric id, uuid or name into a campaign dict (or None).
+
+    Hits are served from an in-process LRU so repeated string references
+    cost no queries; misses are not cached so new campaigns show up at once.
+    """
+    if val is None or val == '':
+        return None
     if is_int_like(val):
-        return int(val)
-    return val
+        key = ('id', int(val))
+    else:
+        key = ('uuid', str(val))
+    camp = CAMPAIGN_CACHE.get(key)
+    if camp is None and key[0] == 'uuid':
+        camp = CAMPAIGN_CACHE.get(('name', str(val)))
+    if camp is not None:
+        return camp
+    by_name = False
+    s = SessionLocal()
+    try:
+        if key[0] == 'id':
+            row = s.query(Campaign).filter(Campaign.id == key[1]).first()
+        else:
+            row = s.query(Campaign).filter(Campaign.uuid == key[1]).first()
+            if row is None:
+                row = s.query(Campaign).filter(Campaign.name == key[1]).first()
+                by_name = True
+        if row is None:
+            return None
+        camp = campaign_to_dict(row)
+    finally:
+        s.close()
+    _cache_campaign(camp, by_name=by_name)
+    return camp
+
+
+def resolve_campaign_id(val):
+    """Integer id for a numeric id, uuid or name; None when nothing matches."""
+    camp = resolve_campaign(val)
+    return camp['id'] if camp else None
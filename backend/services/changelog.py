@@ -0,0 +1,113 @@
+"""Per-campaign change log behind GET /api/campaigns/<cid>/sync.
+
+Every committed message, character save and membership change appends a
+`campaign_changes` row in the same transaction as the write itself. The row
+id is the campaign's revision: a client that last synced at revision N asks
+for `since=N` and gets only the entities touched after it.
+
+Ids are global, so a campaign's revisions increase but are not contiguous.
+On Postgres, writers take a per-campaign transaction advisory lock before
+appending so one campaign's rows commit in id order and a reader can never
+see revision N+1 before N; SQLite already serializes writers.
+
+Characters and memberships are state rather than events: recording one
+deletes its older rows, so the log holds at most one row per entity however
+often a sheet autosaves. Messages are append-only and are aged out by
+compact(), which leaves a `compacted` marker holding the highest revision
+removed; a client behind that marker gets a full snapshot instead.
+"""
+import time
+from sqlalchemy import func, text
+from ..db import SessionLocal
+from ..models import CampaignChange
+from ..utils.ids import is_int_like
+
+MESSAGE = 'message'
+CHARACTER = 'character'
+MEMBER = 'member'
+COMPACTED = 'compacted'
+
+# superseded kinds keep only their newest row per entity
+_STATE_KINDS = (CHARACTER, MEMBER)
+# first key of the two-key pg_advisory_xact_lock, so campaign ids can't
+# collide with other advisory lock users
+_LOCK_NAMESPACE = 0x6e706373
+
+
+def _lock_campaigns(s, campaign_ids):
+    if s.get_bind().dialect.name != 'postgresql':
+        return
+    # sorted, so two batches touching the same campaigns can't deadlock
+    for cid in sorted(set(campaign_ids)):
+        s.execute(text('SELECT pg_advisory_xact_lock(:ns, :cid)'), {'ns': _LOCK_NAMESPACE, 'cid': cid})
+
+
+def record_changes(s, campaign_id, kind, entity_ids):
+    """Append change rows to session `s` (the caller commits). Entities must
+    already have ids, i.e. flush new rows first."""
+    ids = [i for i in entity_ids if i is not None]
+    if not ids or not is_int_like(campaign_id):
+        return
+    campaign_id = int(campaign_id)
+    _lock_campaigns(s, [campaign_id])
+    if kind in _STATE_KINDS:
+        s.query(CampaignChange).filter(CampaignChange.campaign_id == campaign_id, CampaignChange.kind == kind,
+                                       CampaignChange.entity_id.in_(ids)).delete(synchronize_session=False)
+    now = int(time.time())
+    s.add_all([CampaignChange(campaign_id=campaign_id, kind=kind, entity_id=i, created_at=now) for i in ids])
+
+
+def record_change(s, campaign_id, kind, entity_id):
+    record_changes(s, campaign_id, kind, [entity_id])
+
+
+def campaign_revision(s, campaign_id):
+    """Newest revision of a campaign, 0 when nothing has been logged."""
+    return s.query(func.max(CampaignChange.id)).filter(CampaignChange.campaign_id == campaign_id).scalar() or 0
+
+
+def kinds_revision(s, campaign_id, kinds):
+    """Newest revision of a campaign touching any of `kinds`, 0 if none."""
+    return (s.query(func.max(CampaignChange.id))
+            .filter(CampaignChange.campaign_id == campaign_id, CampaignChange.kind.in_(kinds)).scalar() or 0)
+
+
+def compacted_floor(s, campaign_id):
+    """Highest revision removed by compaction (0 if never compacted)."""
+    row = s.query(func.max(CampaignChange.entity_id)).filter(CampaignChange.campaign_id == campaign_id,
+                                                             CampaignChange.kind == COMPACTED).scalar()
+    return row or 0
+
+
+def changes_between(s, campaign_id, since, head, limit):
+    """(kind, entity_id) of rows in (since, head], oldest first, at most limit."""
+    return (s.query(CampaignChange.kind, CampaignChange.entity_id)
+            .filter(CampaignChange.campaign_id == campaign_id, CampaignChange.id > since, CampaignChange.id <= head,
+                    CampaignChange.kind != COMPACTED)
+            .order_by(CampaignChange.id).limit(limit).all())
+
+
+def compact(max_age_seconds, campaign_ids=None):
+    """Delete message rows older than max_age_seconds, per campaign, and
+    move its `compacted` marker up. Returns {campaign_id: rows removed}."""
+    cutoff = int(time.time() - max_age_seconds)
+    s = SessionLocal()
+    try:
+        q = (s.query(CampaignChange.campaign_id, func.max(CampaignChange.id), func.count(CampaignChange.id))
+             .filter(CampaignChange.kind == MESSAGE, CampaignChange.created_at < cutoff))
+        if campaign_ids:
+            q = q.filter(CampaignChange.campaign_id.in_(campaign_ids))
+        out = {}
+        for cid, floor, n in q.group_by(CampaignChange.campaign_id).all():
+            _lock_campaigns(s, [cid])
+            s.query(CampaignChange).filter(CampaignChange.campaign_id == cid, CampaignChange.kind == MESSAGE,
+                                           CampaignChange.id <= floor).delete(synchronize_session=False)
+            floor = max(floor, compacted_floor(s, cid))
+            s.query(CampaignChange).filter(CampaignChange.campaign_id == cid,
+                                           CampaignChange.kind == COMPACTED).delete(synchronize_session=False)
+            s.add(CampaignChange(campaign_id=cid, kind=COMPACTED, entity_id=floor, created_at=int(time.time())))
+            s.commit()
+            out[cid] = n
+        return out
+    finally:
+        s.close()
@@ -1,37 +1,184 @@
 import json
+from sqlalchemy.orm import defer
 from ..db import SessionLocal
 from ..models import Character
+from ..config import CHARACTER_CACHE_TTL, CHARACTER_CACHE_SIZE
+from ..utils.cache import TTLCache
+from ..utils.jsonpatch import make_patch, apply_patch, compose_patches
+from .portraits import portrait_ref
+from . import changelog
 
-
-def pack_character_data(obj):
-    try:
-        return json.dumps(obj)
-    except Exception:
-        return '{}'
+# Sheet fields stored in their own (queryable) columns rather than in `data`
+PROMOTED_FIELDS = {'attributes': 'attributes', 'skillScores': 'skill_scores'}
+# Parsed sheets keyed by (character id, revision). Every save bumps the
+# revision, so an entry never goes stale; it only ages out.
+SHEET_CACHE = TTLCache(CHARACTER_CACHE_SIZE, CHARACTER_CACHE_TTL)
+# list reads skip the JSON columns and fetch them only for cache misses
+_SHEET_COLUMNS = ('data', 'attributes', 'skill_scores')
 
 
-def unpack_character_data(text):
+def unpack_character_data(value):
+    """The `data` column as a dict (tolerates legacy serialized text)."""
+    if isinstance(value, dict):
+        return value
     try:
-        return json.loads(text) if text else {}
+        value = json.loads(value) if value else {}
     except Exception:
         return {}
+    return value if isinstance(value, dict) else {}
+
+
+def set_character_sheet(ch, sheet):
+    """Store a client sheet on a Character: promoted fields go to their
+    columns, everything else to `data`."""
+    rest = dict(sheet or {})
+    for key, column in PROMOTED_FIELDS.items():
+        setattr(ch, column, rest.pop(key, None) or {})
+    ch.data = rest
+
+
+def character_sheet(ch):
+    """The client sheet of a Character (data plus promoted fields)."""
+    sheet = dict(unpack_character_data(getattr(ch, 'data', None)))
+    for key, column in PROMOTED_FIELDS.items():
+        value = getattr(ch, column, None)
+        # rows saved before the promotion still keep these inside data
+        if value is not None or key not in sheet:
+            sheet[key] = value if value is not None else {}
+    return sheet
 
 
 def db_get_characters_for_campaign(cid):
+    """Full payloads of a campaign's characters, oldest first."""
+    s = SessionLocal()
+    try:
+        return character_payloads(s, s.query(Character).filter(Character.campaign_id == cid).order_by(Character.id))
+    finally:
+        s.close()
+
+
+def characters_revision(cid):
+    """Revision that moves whenever a character of the campaign is created
+    or saved (see services.changelog)."""
+    s = SessionLocal()
+    try:
+        return changelog.kinds_revision(s, cid, (changelog.CHARACTER,))
+    finally:
+        s.close()
+
+
+def db_get_character(cid, char_id):
+    """Full payload of one character, or None."""
     s = SessionLocal()
     try:
-        return s.query(Character).filter(Character.campaign_id == cid).all()
+        found = character_payloads(s, s.query(Character).filter(Character.id == char_id, Character.campaign_id == cid))
+        return found[0] if found else None
     finally:
         s.close()
 
 
-def db_create_character(campaign_id, user_id, name, data_blob):
+def db_create_character(campaign_id, user_id, name, sheet):
     s = SessionLocal()
     try:
-        c = Character(campaign_id=campaign_id, user_id=user_id, name=name, data=data_blob)
+        c = Character(campaign_id=campaign_id, user_id=user_id, name=name)
+        set_character_sheet(c, sheet)
         s.add(c)
+        s.flush()
+        changelog.record_change(s, campaign_id, changelog.CHARACTER, c.id)
         s.commit()
         s.refresh(c)
-        return c
+        return character_payload(c)
     finally:
         s.close()
+
+
+# payload keys that aren't sheet fields
+PAYLOAD_META = ('id', 'uuid', 'campaign_id', 'user_id', 'name', 'maxHp', 'portrait', 'portrait_hash', 'revision')
+
+
+def sheet_from_payload(payload):
+    return {k: v for k, v in payload.items() if k not in PAYLOAD_META}
+
+
+def _payload(ch, sheet):
+    return {
+        'id': ch.id,
+        'uuid': getattr(ch, 'uuid', None),
+        'campaign_id': ch.campaign_id,
+        'user_id': ch.user_id,
+        'name': ch.name,
+        'maxHp': ch.maxHp,
+        'portrait': portrait_ref(ch),
+        'portrait_hash': getattr(ch, 'portrait_hash', None),
+        'revision': getattr(ch, 'revision', None),
+        **sheet,
+    }
+
+
+def character_payload(ch):
+    """Full client representation of a character row (sheet fields flattened).
+    Not cached: save paths call this on rows with uncommitted changes."""
+    return _payload(ch, character_sheet(ch))
+
+
+def character_payloads(s, query):
+    """Payloads for the committed characters matched by `query`.
+
+    The rows are loaded without their JSON columns; sheets come from
+    SHEET_CACHE, and only the misses are fetched (in one query) and parsed.
+    """
+    # works for any mapping of the characters table (the legacy app has its own)
+    model = query.column_descriptions[0]['entity']
+    rows = query.options(*[defer(getattr(model, c)) for c in _SHEET_COLUMNS]).all()
+    sheets, missing = {}, []
+    for r in rows:
+        sheet = SHEET_CACHE.get((r.id, r.revision))
+        if sheet is None:
+            missing.append(r.id)
+        else:
+            sheets[r.id] = sheet
+    if missing:
+        # refresh the whole row so the sheet matches the revision it's cached under
+        fresh = {r.id: r for r in s.query(model).filter(model.id.in_(missing)).populate_existing()}
+        for cid in missing:
+            r = fresh.get(cid)
+            if r is not None:
+                sheets[cid] = character_sheet(r)
+                SHEET_CACHE.set((r.id, r.revision), sheets[cid])
+    return [_payload(r, sheets[r.id]) for r in rows if r.id in sheets]
+
+
+def character_update_event(prev, cur):
+    """Payload for the `character_updated` socket event.
+
+    With a previous payload this is a JSON Patch from prev to cur, tagged
+    with base_revision/revision so a client that missed an update can tell
+    and refetch GET /api/campaigns/<cid>/characters/<id>. Without one (a new
+    character) the full character is sent.
+    """
+    event = {'campaign_id': cur.get('campaign_id'), 'user_id': cur.get('user_id'), 'character_id': cur.get('id'), 'revision': cur.get('revision')}
+    if prev is None:
+        event['character'] = cur
+        return event
+    event['base_revision'] = prev.get('revision')
+    event['patch'] = make_patch({k: v for k, v in prev.items() if k != 'revision'}, {k: v for k, v in cur.items() if k != 'revision'})
+    return event
+
+
+def merge_character_events(prev, cur):
+    """Coalesce two queued `character_updated` events for one character.
+
+    A full character absorbs later patches; consecutive patches are
+    composed so clients still see one base_revision -> revision step. If
+    the revisions don't line up (another worker emitted in between) the
+    newer event wins and the client resyncs on the mismatch as usual.
+    """
+    if 'character' in cur:
+        return cur
+    if 'character' in prev:
+        full = apply_patch(prev['character'], cur.get('patch') or [])
+        full['revision'] = cur.get('revision')
+        return {**{k: v for k, v in cur.items() if k not in ('patch', 'base_revision')}, 'character': full}
+    if prev.get('revision') is not None and prev.get('revision') == cur.get('base_revision'):
+        return {**cur, 'base_revision': prev.get('base_revision'), 'patch': compose_patches(prev.get('patch') or [], cur.get('patch') or [])}
+    return cur
@@ -0,0 +1,158 @@
+"""Per-campaign ring buffer of recent messages in Redis.
+
+Every client that joins a campaign asks for the newest page of history, so
+after a deploy the whole table reconnects and hits `messages` at once. The
+newest MESSAGE_CACHE_SIZE messages of each campaign are kept in a capped
+Redis list (oldest first) and the first page is served from there.
+
+A list only exists once it has been built from the database, and posting
+appends with RPUSHX, so a list that exists is always the complete tail of
+the campaign. Each post also bumps a per-campaign version; a rebuild that
+raced with a post notices the change and gives up rather than caching a
+tail that is missing the new message. A rebuild that reads the new row
+before its push lands leaves a duplicate, which reads drop by id. Any
+Redis error falls back to SQL.
+
+The version doubles as the message list's ETag revision (list_version), so
+a conditional first-page GET needs no SQL either. A missing version key is
+seeded from the clock in microseconds rather than 0. A key that expired or
+was evicted therefore restarts above every value it held, and an old ETag
+cannot match a newer list.
+"""
+import time
+from redis.exceptions import RedisError, WatchError
+from ..config import MESSAGE_CACHE_SIZE, MESSAGE_CACHE_TTL
+from ..utils.redis_client import get_redis, mark_redis_down
+from ..utils import fastjson
+
+
+def _list_key(cid):
+    return f"msgs:recent:{cid}"
+
+
+def _version_key(cid):
+    return f"msgs:ver:{cid}"
+
+
+def _fresh_version():
+    return int(time.time() * 1000000)
+
+
+def cache_enabled():
+    return MESSAGE_CACHE_SIZE > 0 and get_redis() is not None
+
+
+def push_message(cid, msg):
+    """Append a message (a dict or an already Encoded payload) to the
+    campaign's list if it is cached."""
+    r = get_redis() if MESSAGE_CACHE_SIZE > 0 else None
+    if r is None:
+        return
+    try:
+        pipe = r.pipeline(transaction=True)
+        pipe.set(_version_key(cid), _fresh_version(), nx=True)
+        pipe.incr(_version_key(cid))
+        pipe.rpushx(_list_key(cid), fastjson.dumps(msg))
+        pipe.ltrim(_list_key(cid), -MESSAGE_CACHE_SIZE, -1)
+        pipe.expire(_list_key(cid), MESSAGE_CACHE_TTL)
+        pipe.expire(_version_key(cid), MESSAGE_CACHE_TTL)
+        pipe.execute()
+    except RedisError:
+        mark_redis_down()
+
+
+def list_version(cid):
+    """The campaign's list version, which every post and invalidation
+    moves; None when the ring buffer is off or Redis is unavailable."""
+    r = get_redis() if MESSAGE_CACHE_SIZE > 0 else None
+    if r is None:
+        return None
+    try:
+        pipe = r.pipeline(transaction=True)
+        pipe.set(_version_key(cid), _fresh_version(), nx=True, ex=MESSAGE_CACHE_TTL)
+        pipe.get(_version_key(cid))
+        return int(pipe.execute()[1])
+    except RedisError:
+        mark_redis_down()
+        return None
+
+
+def recent_messages(cid, limit):
+    """The newest `limit` messages as dicts (ascending), or None on a miss."""
+    if limit > MESSAGE_CACHE_SIZE:
+        return None
+    r = get_redis() if MESSAGE_CACHE_SIZE > 0 else None
+    if r is None:
+        return None
+    window = limit
+    while True:
+        try:
+            raw = r.lrange(_list_key(cid), -window, -1)
+        except RedisError:
+            mark_redis_down()
+            return None
+        if not raw:
+            return None
+        msgs = _dedupe([fastjson.loads(x) for x in raw])
+        # duplicates shortened the page; read further back if there is more
+        if len(msgs) >= limit or len(raw) < window or window >= MESSAGE_CACHE_SIZE:
+            return msgs[-limit:]
+        window = min(MESSAGE_CACHE_SIZE, window + limit - len(msgs))
+
+
+def _dedupe(msgs):
+    # a post commits before it is pushed, so a rebuild running in between
+    # can already hold the row that the push then appends a second time
+    seen = set()
+    out = []
+    for m in msgs:
+        mid = m.get('id')
+        if mid is None or mid not in seen:
+            seen.add(mid)
+            out.append(m)
+    return out
+
+
+def rebuild(cid, load_tail):
+    """Replace the campaign's list with `load_tail()` (the newest
+    MESSAGE_CACHE_SIZE message dicts, ascending). Returns what was loaded,
+    or None when Redis is unavailable; the caller can serve it either way."""
+    r = get_redis() if MESSAGE_CACHE_SIZE > 0 else None
+    if r is None:
+        return None
+    try:
+        with r.pipeline(transaction=True) as pipe:
+            pipe.watch(_version_key(cid))
+            rows = load_tail()
+            pipe.multi()
+            pipe.delete(_list_key(cid))
+            if rows:
+                pipe.rpush(_list_key(cid), *[fastjson.dumps(m) for m in rows])
+                pipe.expire(_list_key(cid), MESSAGE_CACHE_TTL)
+            try:
+                pipe.execute()
+            except WatchError:
+                # a message was posted while we read the database; the next
+                # miss will rebuild
+                pass
+            return rows
+    except RedisError:
+        mark_redis_down()
+        return None
+
+
+def invalidate(cid):
+    """Drop the campaign's list; the next read rebuilds it from the database."""
+    r = get_redis()
+    if r is None:
+        return
+    try:
+        pipe = r.pipeline(transaction=True)
+        # a rebuild already reading the table gives up instead of caching it
+        pipe.set(_version_key(cid), _fresh_version(), nx=True)
+        pipe.incr(_version_key(cid))
+        pipe.delete(_list_key(cid))
+        pipe.expire(_version_key(cid), MESSAGE_CACHE_TTL)
+        pipe.execute()
+    except RedisError:
+        mark_redis_down()
@@ -0,0 +1,292 @@
+"""Write-behind pipeline for chat messages.
+
+In the default 'sync' mode every message is its own transaction, so a busy
+table's chat latency is the database's commit latency. The other modes hand
+rows to a single background flusher that commits them in batches, either
+when MESSAGE_BATCH_SIZE rows are waiting or MESSAGE_BATCH_INTERVAL_MS after
+the first one arrived:
+
+- 'group': the caller still waits until its row is committed, but shares
+  that commit with everyone else who posted in the same window
+- 'async': the caller returns (and the message is broadcast) as soon as the
+  row is queued; a crash can lose up to one batch
+
+Ids and timestamps are assigned up front so the message can be emitted
+before it reaches the database. On SQLite and other non-sequence backends
+the id comes from a counter kept at or above MAX(id): in-process by
+default, or a Redis INCR in MULTI_WORKER mode so workers never hand out the
+same id. The Redis key outlives deploys, and rows can arrive by other paths
+(a spell in 'sync' mode), so each process moves it past MAX(id) on first
+use. A row that still collides gets a fresh id and is retried. A row that
+cannot be written at all is dropped from the Redis ring buffer, which
+already served it. On Postgres ids are drawn from the table's sequence.
+"""
+import atexit
+import datetime
+import threading
+import time
+from collections import deque
+from sqlalchemy import func, text as _text
+from sqlalchemy.exc import IntegrityError, OperationalError
+from ..db import SessionLocal, engine
+from ..models import Message
+from ..utils.redis_client import get_redis
+from . import changelog
+from . import message_cache
+from ..config import MULTI_WORKER, MESSAGE_WRITE_MODE, MESSAGE_BATCH_SIZE, MESSAGE_BATCH_INTERVAL_MS, MESSAGE_QUEUE_MAX
+
+WRITE_MODES = ('sync', 'group', 'async')
+FLUSH_RETRIES = 3
+ID_COUNTER_KEY = 'msgs:next_id'
+
+
+class _Pending:
+    __slots__ = ('message', 'done', 'error')
+
+    def __init__(self, message):
+        self.message = message
+        self.done = threading.Event()
+        self.error = None
+
+
+class MessageWriter:
+    def __init__(self, mode=MESSAGE_WRITE_MODE, batch_size=MESSAGE_BATCH_SIZE,
+                 interval_ms=MESSAGE_BATCH_INTERVAL_MS, queue_max=MESSAGE_QUEUE_MAX):
+        self.mode = mode if mode in WRITE_MODES else 'sync'
+        self.batch_size = max(1, int(batch_size))
+        self.interval = max(0.0, interval_ms / 1000.0)
+        self.queue_max = max(self.batch_size, int(queue_max))
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._id_lock = threading.Lock()
+        self._next_id = None
+        self._shared_seeded = False
+        self._thread = None
+        self._closing = False
+        self.stats_counters = {'queued': 0, 'flushed': 0, 'batches': 0, 'failed_batches': 0, 'reassigned': 0, 'dropped': 0,
+                               'flush_seconds': 0.0}
+
+    @property
+    def enabled(self):
+        return self.mode != 'sync'
+
+    # -- id allocation -------------------------------------------------
+
+    def _allocate_id(self):
+        if engine.dialect.name == 'postgresql':
+            with engine.connect() as conn:
+                return conn.execute(_text("SELECT nextval(pg_get_serial_sequence('messages', 'id'))")).scalar()
+        if MULTI_WORKER:
+            return self._allocate_shared_id()
+        with self._id_lock:
+            if self._next_id is None:
+                self._next_id = self._max_id() + 1
+            mid = self._next_id
+            self._next_id += 1
+            return mid
+
+    def _allocate_shared_id(self):
+        r = get_redis()
+        if r is None:
+            raise RuntimeError('write-behind ids need Redis in multi-worker mode')
+        if not self._shared_seeded:
+            self._seed_shared(r)
+            self._shared_seeded = True
+        return r.incr(ID_COUNTER_KEY)
+
+    def _seed_shared(self, r):
+        # counter = max(counter, MAX(id)); workers racing here both bump it,
+        # which only leaves a gap in the ids
+        floor = self._max_id()
+        current = int(r.get(ID_COUNTER_KEY) or 0)
+        if current < floor:
+            r.incrby(ID_COUNTER_KEY, floor - current)
+
+    def _reseed(self):
+        """Move the id counter past MAX(id) after it handed out a taken id."""
+        if engine.dialect.name == 'postgresql':
+            return
+        if MULTI_WORKER:
+            r = get_redis()
+            if r is not None:
+                self._seed_shared(r)
+            return
+        with self._id_lock:
+            self._next_id = max(self._next_id or 0, self._max_id() + 1)
+
+    def _max_id(self):
+        s = SessionLocal()
+        try:
+            return s.query(func.max(Message.id)).scalar() or 0
+        finally:
+            s.close()
+
+    # -- producer side -------------------------------------------------
+
+    def submit(self, campaign_id, author, text):
+        """Queue a message and return it (a transient Message with id set).
+
+        In 'group' mode this blocks until the batch holding the row commits
+        and re-raises the flush error if it didn't.
+        """
+        m = Message(id=self._allocate_id(), campaign_id=campaign_id, author=author, text=text,
+                    timestamp=datetime.datetime.utcnow().isoformat())
+        item = _Pending(m)
+        with self._cond:
+            # backpressure: if the database has fallen behind, wait for room
+            while len(self._queue) >= self.queue_max and not self._closing:
+                self._cond.wait(self.interval or 0.05)
+            self._queue.append(item)
+            self.stats_counters['queued'] += 1
+            self._ensure_thread()
+            self._cond.notify_all()
+        if self.mode == 'group':
+            item.done.wait()
+            if item.error is not None:
+                raise item.error
+        return m
+
+    def pending_for(self, campaign_id):
+        """Messages for a campaign that are queued but not yet committed."""
+        with self._cond:
+            return [p.message for p in self._queue if p.message.campaign_id == campaign_id]
+
+    # -- flusher -------------------------------------------------------
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='message-writer', daemon=True)
+            self._thread.start()
+
+    def _take_batch(self):
+        with self._cond:
+            while not self._queue and not self._closing:
+                self._cond.wait()
+            if not self._queue:
+                return None
+            # give the batch a chance to fill before committing it
+            deadline = time.monotonic() + self.interval
+            while len(self._queue) < self.batch_size and not self._closing:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            n = min(self.batch_size, len(self._queue))
+            # leave rows on the queue until committed so reads can still see them
+            return [self._queue[i] for i in range(n)]
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            if batch is None:
+                return
+            self._flush(batch)
+
+    def _flush(self, batch):
+        started = time.perf_counter()
+        error = self._write([p.message for p in batch])
+        for attempt in range(FLUSH_RETRIES):
+            if not isinstance(error, OperationalError):
+                break
+            # database briefly unavailable/locked: keep the rows and retry
+            time.sleep(0.1 * (2 ** attempt))
+            error = self._write([p.message for p in batch])
+        if error is not None and len(batch) > 1:
+            # isolate the bad row(s) instead of losing the whole batch
+            self.stats_counters['failed_batches'] += 1
+            for p in batch:
+                p.error = self._write_one(p.message)
+        elif isinstance(error, IntegrityError):
+            batch[0].error = self._write_one(batch[0].message, error)
+        else:
+            for p in batch:
+                p.error = error
+        with self._cond:
+            for _ in batch:
+                self._queue.popleft()
+            self._cond.notify_all()
+        for p in batch:
+            if p.error is None:
+                self.stats_counters['flushed'] += 1
+            else:
+                self.stats_counters['dropped'] += 1
+                # 'async' already pushed it to the ring buffer; rebuild from the table
+                message_cache.invalidate(p.message.campaign_id)
+            p.done.set()
+        self.stats_counters['batches'] += 1
+        self.stats_counters['flush_seconds'] += time.perf_counter() - started
+
+    def _write_one(self, m, error=None):
+        """Write one row; on an id collision take a fresh id and retry once."""
+        if error is None:
+            error = self._write([m])
+        if not isinstance(error, IntegrityError):
+            return error
+        # the counter fell behind the table (or the row is bad: the retry
+        # fails again and the caller drops it)
+        self._reseed()
+        old_id, m.id = m.id, self._allocate_id()
+        error = self._write([m])
+        if error is None:
+            self.stats_counters['reassigned'] += 1
+            if self.mode == 'async':
+                # the ring buffer holds it under old_id; rebuild from the table
+                message_cache.invalidate(m.campaign_id)
+        else:
+            m.id = old_id
+        return error
+
+    def _write(self, messages):
+        s = SessionLocal()
+        try:
+            s.add_all([Message(id=m.id, campaign_id=m.campaign_id, author=m.author, text=m.text, timestamp=m.timestamp)
+                       for m in messages])
+            by_campaign = {}
+            for m in messages:
+                by_campaign.setdefault(m.campaign_id, []).append(m.id)
+            s.flush()
+            # fixed order so concurrent batches take campaign locks alike
+            for cid in sorted(by_campaign, key=str):
+                changelog.record_changes(s, cid, changelog.MESSAGE, by_campaign[cid])
+            s.commit()
+            return None
+        except Exception as e:
+            s.rollback()
+            return e
+        finally:
+            s.close()
+
+    def drain(self, timeout=10.0):
+        """Block until everything queued so far has been committed."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._queue and time.monotonic() < deadline:
+                self._ensure_thread()
+                self._cond.notify_all()
+                self._cond.wait(0.05)
+            return not self._queue
+
+    def close(self, timeout=10.0):
+        """Flush what is queued and stop the flusher (registered with atexit)."""
+        with self._cond:
+            self._closing = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        if self._thread is not None and self._thread.is_alive():
+            return
+        # flusher gone (or never started): write any stragglers inline
+        while self._queue:
+            self._flush(list(self._queue)[:self.batch_size])
+
+    def stats(self):
+        with self._cond:
+            depth = len(self._queue)
+        out = dict(self.stats_counters)
+        out.update(mode=self.mode, queue_depth=depth, batch_size=self.batch_size, interval_ms=int(self.interval * 1000))
+        return out
+
+
+writer = MessageWriter()
+if writer.enabled:
+    atexit.register(writer.close)
@@ -1,18 +1,61 @@
 from ..db import SessionLocal
 from ..models import Message
+from ..config import MESSAGE_PAGE_DEFAULT, MESSAGE_PAGE_MAX, MESSAGE_CACHE_SIZE
+from .message_writer import writer
+from . import message_cache
+from . import changelog
+from ..utils.fastjson import encode_once
+
+
+def message_to_dict(m):
+    # messages have no uuid column; the id is their only identity
+    return {'id': m.id, 'campaign_id': m.campaign_id, 'author': m.author, 'text': m.text, 'timestamp': m.timestamp}
 
 
 def db_create_message(campaign_id, author, text):
+    return post_message(campaign_id, author, text)[0]
+
+
+def post_message(campaign_id, author, text):
+    """Create a message; returns (message, payload) where payload is the
+    message dict encoded once (utils.fastjson) for the HTTP response, the
+    room broadcast and the ring buffer alike."""
+    m = _insert_message(campaign_id, author, text)
+    payload = encode_once(message_to_dict(m))
+    message_cache.push_message(campaign_id, payload)
+    return m, payload
+
+
+def messages_revision(campaign_id):
+    """ETag parts that change whenever the campaign's message list does.
+
+    With the ring buffer that is its Redis version, which every post bumps,
+    so polls cost no SQL. Without Redis: (revision, newest queued id), where
+    a committed post or compaction moves the first and a write-behind
+    message not yet committed the second."""
+    version = message_cache.list_version(campaign_id)
+    if version is not None:
+        return 'r', version
+    s = SessionLocal()
+    try:
+        rev = changelog.kinds_revision(s, campaign_id, (changelog.MESSAGE, changelog.COMPACTED))
+    finally:
+        s.close()
+    pending = writer.pending_for(campaign_id) if writer.enabled else []
+    return rev, max((m.id for m in pending), default=0)
+
+
+def _insert_message(campaign_id, author, text):
+    if writer.enabled:
+        # write-behind: id/timestamp assigned now, row committed by the flusher
+        return writer.submit(campaign_id, author, text)
     s = SessionLocal()
     try:
-        import uuid as _uuid
         ts = __import__('datetime').datetime.utcnow().isoformat()
         m = Message(campaign_id=campaign_id, author=author, text=text, timestamp=ts)
-        try:
-            m.uuid = str(_uuid.uuid4())
-        except Exception:
-            pass
         s.add(m)
+        s.flush()
+        changelog.record_change(s, campaign_id, changelog.MESSAGE, m.id)
         s.commit()
         s.refresh(m)
         return m
@@ -20,9 +63,105 @@ def db_create_message(campaign_id, author, text):
         s.close()
 
 
-def db_get_messages_for_campaign(cid):
+def clamp_page_limit(limit):
+    """Normalize a client supplied page size into 1..MESSAGE_PAGE_MAX."""
+    try:
+        limit = int(limit) if limit is not None else MESSAGE_PAGE_DEFAULT
+    except Exception:
+        limit = MESSAGE_PAGE_DEFAULT
+    if limit < 1:
+        limit = 1
+    return min(limit, MESSAGE_PAGE_MAX)
+
+
+def parse_cursor(val):
+    """Return a cursor id as int, or None when missing/invalid."""
+    try:
+        return int(val) if val not in (None, '') else None
+    except Exception:
+        return None
+
+
+def db_get_messages_for_campaign(cid, before_id=None, after_id=None, limit=None):
+    """Keyset-paginated message history, always returned in ascending id order.
+
+    - no cursor: the most recent `limit` messages
+    - before_id: the `limit` messages immediately older than before_id
+    - after_id: the `limit` messages immediately newer than after_id
+
+    Served by the (campaign_id, id) index so cost does not grow with history.
+    Rows still queued in the write-behind pipeline are merged in.
+    """
+    limit = clamp_page_limit(limit)
+    # snapshot the queue first: a row flushed mid-query then shows up twice
+    # (deduplicated below) rather than not at all
+    pending = writer.pending_for(cid) if writer.enabled else None
     s = SessionLocal()
     try:
-        return s.query(Message).filter(Message.campaign_id == cid).order_by(Message.id.asc()).all()
+        q = s.query(Message).filter(Message.campaign_id == cid)
+        if after_id is not None:
+            rows = q.filter(Message.id > after_id).order_by(Message.id.asc()).limit(limit).all()
+        else:
+            if before_id is not None:
+                q = q.filter(Message.id < before_id)
+            rows = q.order_by(Message.id.desc()).limit(limit).all()
+            rows.reverse()
     finally:
         s.close()
+    return merge_pending(rows, pending, before_id, after_id, limit)
+
+
+def merge_pending(rows, pending, before_id, after_id, limit):
+    if not pending:
+        return rows
+    seen = {m.id for m in rows}
+    extra = [m for m in pending if m.id not in seen
+             and (before_id is None or m.id < before_id)
+             and (after_id is None or m.id > after_id)]
+    if not extra:
+        return rows
+    merged = sorted(rows + extra, key=lambda m: m.id)
+    return merged[:limit] if after_id is not None else merged[-limit:]
+
+
+def get_messages_page(cid, before_id=None, after_id=None, limit=None):
+    """One page of history as dicts; the newest page comes from the Redis
+    ring buffer when it is available (see services.message_cache)."""
+    limit = clamp_page_limit(limit)
+    if before_id is None and after_id is None and message_cache.cache_enabled():
+        cached = message_cache.recent_messages(cid, limit)
+        if cached is not None:
+            return cached
+        tail = message_cache.rebuild(cid, lambda: load_cache_tail(cid))
+        if tail is not None:
+            return tail[-limit:]
+    return [message_to_dict(m) for m in db_get_messages_for_campaign(cid, before_id=before_id, after_id=after_id, limit=limit)]
+
+
+def load_cache_tail(cid):
+    s = SessionLocal()
+    try:
+        pending = writer.pending_for(cid) if writer.enabled else None
+        rows = s.query(Message).filter(Message.campaign_id == cid).order_by(Message.id.desc()).limit(MESSAGE_CACHE_SIZE).all()
+        rows.reverse()
+    finally:
+        s.close()
+    return [message_to_dict(m) for m in merge_pending(rows, pending, None, None, MESSAGE_CACHE_SIZE)]
+
+
+def rebuild_message_cache(campaign_ids=None):
+    """Rebuild the Redis ring buffers (all campaigns with messages by default).
+    Returns {campaign_id: cached message count}."""
+    if campaign_ids is None:
+        s = SessionLocal()
+        try:
+            campaign_ids = [cid for (cid,) in s.query(Message.campaign_id).distinct() if cid is not None]
+        finally:
+            s.close()
+    out = {}
+    for cid in campaign_ids:
+        tail = message_cache.rebuild(cid, lambda: load_cache_tail(cid))
+        if tail is None:
+            raise RuntimeError('Redis is not configured or unavailable')
+        out[cid] = len(tail)
+    return out
@@ -0,0 +1,150 @@
+"""Where time goes: request latency, SQL per request, socket traffic.
+
+init_request_metrics(app) times every request by route rule (so
+`/api/campaigns/<cid>/messages` is one series, not one per campaign) and
+instruments the shared engine so each request also records how many
+statements it ran and how long they took; a rule whose query count
+histogram sits high is an N+1. Statements run outside a request (the
+write-behind flusher, the presence sweeper) are labelled `background`.
+
+instrument_socketio(sio) counts every Socket.IO event frame handed to
+Engine.IO and its encoded size, by event name. That is per recipient, so a
+broadcast to a 6-player room counts 6 frames: the bytes that actually hit
+the wire.
+
+Subsystem stats already reported by /api/health are exported as gauges
+through REGISTRY.register_stats. Everything is served by GET /api/metrics
+(routes.metrics).
+"""
+import time
+from flask import g, request, has_request_context
+from sqlalchemy import event
+from ..utils.metrics import REGISTRY, LATENCY_BUCKETS, COUNT_BUCKETS
+
+BACKGROUND = 'background'
+# statements are fast; resolve the low end more finely than requests
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+REQUEST_SECONDS = REGISTRY.histogram('http_request_duration_seconds', 'Request latency by route rule.',
+                                     ('method', 'endpoint', 'status'), LATENCY_BUCKETS)
+REQUEST_QUERIES = REGISTRY.histogram('http_request_db_queries', 'SQL statements executed per request.',
+                                     ('endpoint',), COUNT_BUCKETS)
+REQUEST_DB_SECONDS = REGISTRY.histogram('http_request_db_seconds', 'Time spent in SQL per request.',
+                                        ('endpoint',), LATENCY_BUCKETS)
+QUERY_SECONDS = REGISTRY.histogram('db_query_duration_seconds', 'SQL statement latency by route rule.',
+                                   ('endpoint',), QUERY_BUCKETS)
+SOCKET_FRAMES = REGISTRY.counter('socketio_frames_total', 'Socket.IO event frames sent, per recipient.', ('event',))
+SOCKET_BYTES = REGISTRY.counter('socketio_frame_bytes_total', 'Encoded bytes of Socket.IO event frames sent.', ('event',))
+
+_instrumented = set()
+
+
+def _endpoint():
+    rule = request.url_rule
+    return rule.rule if rule is not None else 'unmatched'
+
+
+def _before_request():
+    g.metrics_started = time.perf_counter()
+    g.metrics_queries = 0
+    g.metrics_db_seconds = 0.0
+
+
+def _after_request(resp):
+    started = g.get('metrics_started')
+    if started is not None:
+        endpoint = _endpoint()
+        REQUEST_SECONDS.observe(time.perf_counter() - started, request.method, endpoint, str(resp.status_code))
+        REQUEST_QUERIES.observe(g.metrics_queries, endpoint)
+        REQUEST_DB_SECONDS.observe(g.metrics_db_seconds, endpoint)
+    return resp
+
+
+# the start time lives on the statement's execution context, so a statement
+# that raises (no after_cursor_execute) leaves nothing behind
+def _before_cursor_execute(_conn, _cursor, _statement, _params, context, _executemany):
+    if context is not None:
+        context._metrics_started = time.perf_counter()
+
+
+def _after_cursor_execute(_conn, _cursor, _statement, _params, context, _executemany):
+    started = getattr(context, '_metrics_started', None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    if has_request_context() and 'metrics_queries' in g:
+        g.metrics_queries += 1
+        g.metrics_db_seconds += elapsed
+        QUERY_SECONDS.observe(elapsed, _endpoint())
+    else:
+        QUERY_SECONDS.observe(elapsed, BACKGROUND)
+
+
+def instrument_engine(engine):
+    if id(engine) in _instrumented:
+        return
+    _instrumented.add(id(engine))
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+
+
+def init_request_metrics(app, engine=None):
+    """Time app's requests and count their SQL. Register this before other
+    after_request hooks (compression) so their time is included."""
+    if engine is None:
+        from ..db import engine
+    instrument_engine(engine)
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+
+
+def _event_name(data):
+    # encoded EVENT packets look like 2["name",...] or 2/namespace,["name",...]
+    if not isinstance(data, str) or not data.startswith('2'):
+        return None
+    start = data.find('["', 1, 128)
+    if start < 0:
+        return None
+    end = data.find('"', start + 2, start + 130)
+    return data[start + 2:end] if end > 0 else None
+
+
+def instrument_socketio(sio):
+    """Wrap sio's server so every outgoing event frame is counted. Call once
+    the server exists (after SocketIO(app) or socketio.init_app)."""
+    server = getattr(sio, 'server', None)
+    send = getattr(server, '_send_eio_packet', None)
+    if send is None or getattr(send, 'metrics_wrapped', False):
+        return
+
+    def _send_eio_packet(eio_sid, eio_pkt):
+        name = _event_name(eio_pkt.data)
+        if name is not None:
+            SOCKET_FRAMES.inc(name)
+            SOCKET_BYTES.inc(name, amount=len(eio_pkt.data))
+        return send(eio_sid, eio_pkt)
+
+    _send_eio_packet.metrics_wrapped = True
+    server._send_eio_packet = _send_eio_packet
+
+
+def register_service_stats():
+    """Gauges for the service-level stats /api/health reports; socket
+    layers register their own emit scheduler and presence hub."""
+    from .auth import AUTH_CACHE
+    from .passwords import hashing_stats
+    from .message_writer import writer
+    from .socket_auth import socket_auth_stats
+    from .characters import SHEET_CACHE
+    from .campaigns import CAMPAIGN_CACHE, MEMBERSHIP_CACHE
+    from ..utils.compression import compression_stats
+    from ..db import pool_status
+    REGISTRY.register_stats('password_hashing', hashing_stats)
+    REGISTRY.register_stats('message_writer', writer.stats)
+    REGISTRY.register_stats('socket_auth', socket_auth_stats)
+    REGISTRY.register_stats('auth_cache', AUTH_CACHE.stats)
+    REGISTRY.register_stats('character_cache', SHEET_CACHE.stats)
+    REGISTRY.register_stats('campaign_cache', CAMPAIGN_CACHE.stats)
+    REGISTRY.register_stats('membership_cache', MEMBERSHIP_CACHE.stats)
+    REGISTRY.register_stats('compression', compression_stats)
+    REGISTRY.register_stats('db_pool', pool_status)
@@ -0,0 +1,67 @@
+"""Password hashing that doesn't stall the eventlet hub.
+
+werkzeug's hashers spend tens to hundreds of milliseconds in hashlib. Under
+`gunicorn -k eventlet -w 1` that time would block every socket and request,
+so when the process is monkey-patched we hand the work to eventlet's native
+thread pool (hashlib releases the GIL while hashing). A semaphore bounds how
+many hashes run at once so a login storm queues instead of starving the pool.
+"""
+import threading
+import time
+from werkzeug.security import generate_password_hash, check_password_hash
+from ..config import PASSWORD_HASH_BACKEND, PASSWORD_HASH_CONCURRENCY
+
+_slots = threading.BoundedSemaphore(max(1, PASSWORD_HASH_CONCURRENCY))
+_stats_lock = threading.Lock()
+_stats = {'waiting': 0, 'running': 0, 'completed': 0, 'max_waiting': 0, 'wait_seconds': 0.0, 'hash_seconds': 0.0}
+
+
+def _use_tpool():
+    if PASSWORD_HASH_BACKEND == 'inline':
+        return False
+    try:
+        from eventlet import patcher
+        patched = patcher.is_monkey_patched('thread')
+    except Exception:
+        return False
+    return patched or PASSWORD_HASH_BACKEND == 'tpool'
+
+
+def _run(fn, *args):
+    queued = time.perf_counter()
+    with _stats_lock:
+        _stats['waiting'] += 1
+        _stats['max_waiting'] = max(_stats['max_waiting'], _stats['waiting'])
+    _slots.acquire()
+    started = time.perf_counter()
+    with _stats_lock:
+        _stats['waiting'] -= 1
+        _stats['running'] += 1
+        _stats['wait_seconds'] += started - queued
+    try:
+        if _use_tpool():
+            from eventlet import tpool
+            return tpool.execute(fn, *args)
+        return fn(*args)
+    finally:
+        _slots.release()
+        with _stats_lock:
+            _stats['running'] -= 1
+            _stats['completed'] += 1
+            _stats['hash_seconds'] += time.perf_counter() - started
+
+
+def hash_password(password):
+    return _run(generate_password_hash, password)
+
+
+def verify_password(pwhash, password):
+    return _run(check_password_hash, pwhash, password)
+
+
+def hashing_stats():
+    with _stats_lock:
+        out = dict(_stats)
+    out['concurrency'] = max(1, PASSWORD_HASH_CONCURRENCY)
+    out['backend'] = 'tpool' if _use_tpool() else 'inline'
+    return out
@@ -0,0 +1,98 @@
+"""Content-addressed storage for character portraits.
+
+The frontend uploads portraits as inline data URLs. Storing those in
+Character.portrait made every character list and `character_updated` event
+carry the full image. Instead the decoded bytes live once in `blobs`, keyed
+by their SHA-256, and payloads only carry a URL that embeds the hash.
+"""
+import base64
+import binascii
+import hashlib
+import re
+from urllib.parse import unquote_to_bytes
+from flask import has_request_context, request
+from ..config import PUBLIC_API_BASE, PROXY_FIX_HOPS
+from ..models import Blob
+
+_DATA_URL = re.compile(r'^data:(?P<mime>[\w.+-]+/[\w.+-]+)?(?P<params>(?:;[^,;]+)*?),(?P<payload>.*)$', re.S)
+_OWN_URL = re.compile(r'/api/portraits/(?P<hash>[0-9a-f]{64})$')
+
+
+def decode_data_url(value):
+    """Return (content_type, bytes) for a data: URL, or None if it isn't one."""
+    if not isinstance(value, str) or not value.startswith('data:'):
+        return None
+    m = _DATA_URL.match(value)
+    if not m:
+        return None
+    mime = m.group('mime') or 'application/octet-stream'
+    payload = m.group('payload')
+    if ';base64' in (m.group('params') or ''):
+        try:
+            raw = base64.b64decode(payload, validate=False)
+        except (binascii.Error, ValueError):
+            return None
+    else:
+        raw = unquote_to_bytes(payload)
+    return mime, raw
+
+
+def blob_hash(raw):
+    return hashlib.sha256(raw).hexdigest()
+
+
+def store_blob(session, content_type, raw):
+    """Insert the blob if this content is new; returns its hash. Caller commits."""
+    h = blob_hash(raw)
+    if session.get(Blob, h) is None:
+        session.add(Blob(hash=h, content_type=content_type, size=len(raw), data=raw))
+    return h
+
+
+def portrait_path(h):
+    return f"/api/portraits/{h}"
+
+
+def portrait_url(h):
+    """Absolute URL for a portrait hash so <img src> works from the static site
+    host. The origin comes from PUBLIC_API_BASE, or from the request once
+    ProxyFix (PROXY_FIX_HOPS) has vetted the forwarded headers; otherwise the
+    URL stays relative so no client-supplied host ends up in payloads."""
+    if PUBLIC_API_BASE:
+        return PUBLIC_API_BASE.rstrip('/') + portrait_path(h)
+    if PROXY_FIX_HOPS and has_request_context():
+        return request.host_url.rstrip('/') + portrait_path(h)
+    return portrait_path(h)
+
+
+def apply_portrait(session, ch, value):
+    """Update a Character's portrait from a client value.
+
+    - empty: keep whatever the character already has
+    - data: URL: stored in `blobs`, the character keeps only the hash
+    - one of our own /api/portraits/<hash> URLs (a client echoing back what
+      we served): keep that hash
+    - anything else (e.g. an external image URL): stored as plain text
+    """
+    if not value:
+        return
+    decoded = decode_data_url(value)
+    if decoded is not None:
+        ch.portrait_hash = store_blob(session, decoded[0], decoded[1])
+        ch.portrait = None
+        return
+    m = _OWN_URL.search(value) if isinstance(value, str) else None
+    if m:
+        ch.portrait_hash = m.group('hash')
+        ch.portrait = None
+        return
+    ch.portrait = value
+    ch.portrait_hash = None
+
+
+def portrait_ref(ch):
+    """Small value for the `portrait` field of character payloads."""
+    h = getattr(ch, 'portrait_hash', None)
+    if h:
+        return portrait_url(h)
+    return getattr(ch, 'portrait', None)
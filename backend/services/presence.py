@@ -0,0 +1,231 @@
+"""Who is connected to which campaign room, and who is typing.
+
+The registry maps socket sid -> user and the campaign rooms that socket has
+joined. Clients send a `heartbeat` every PRESENCE_HEARTBEAT_S; a socket that
+has heartbeated before and then been silent for PRESENCE_TTL_S (a frozen
+tab) stops being listed until it heartbeats again. Clients that never
+heartbeat (older bundles) are listed until they disconnect; Engine.IO's
+ping/pong catches their half-open connections.
+
+With REDIS_URL set every room is mirrored to a Redis hash `presence:<cid>`
+(sid -> user + last-seen time) so each worker can list the sockets held by
+the others. Entries left behind by a worker that died age out under the same
+last-seen rule. Any Redis error falls back to this worker's own view.
+"""
+import json
+import time
+import threading
+from redis.exceptions import RedisError
+from ..config import PRESENCE_TTL_S, TYPING_THROTTLE_S, TYPING_TIMEOUT_S
+from ..utils.redis_client import get_redis, mark_redis_down
+
+
+def _room_key(cid):
+    return f"presence:{cid}"
+
+
+def _typing_payload(cid, user, flag):
+    return {'campaign_id': cid, 'user_id': user['id'], 'username': user.get('username'), 'typing': flag}
+
+
+class PresenceRegistry:
+    def __init__(self, ttl=PRESENCE_TTL_S):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._sockets = {}  # sid -> {'user', 'rooms', 'seen', 'beats', 'stale'}
+        self._rooms = {}    # cid -> set of sids
+        self._typing = {}   # (sid, cid) -> {'since', 'sent'}
+
+    # ----- membership -----
+    def join(self, sid, user, cid):
+        now = time.time()
+        with self._lock:
+            entry = self._sockets.get(sid)
+            if entry is None:
+                entry = self._sockets[sid] = {'user': {'id': user['id'], 'username': user.get('username')},
+                                              'rooms': set(), 'seen': now, 'beats': False, 'stale': False}
+            entry['rooms'].add(cid)
+            entry['seen'], entry['stale'] = now, False
+            self._rooms.setdefault(cid, set()).add(sid)
+            member = entry['user']
+        self._mirror_set(cid, {sid: (member, now)})
+
+    def leave(self, sid, cid):
+        """Remove sid from one room; returns typing-stop payloads to send."""
+        with self._lock:
+            entry = self._sockets.get(sid)
+            if entry is None or cid not in entry['rooms']:
+                return []
+            stops = self._remove(sid, entry, cid)
+            if not entry['rooms']:
+                del self._sockets[sid]
+        self._mirror_del(cid, [sid])
+        return stops
+
+    def drop(self, sid):
+        """Forget a disconnected socket; returns (room ids, typing stops)."""
+        with self._lock:
+            entry = self._sockets.pop(sid, None)
+            if entry is None:
+                return [], []
+            cids = list(entry['rooms'])
+            stops = [s for cid in cids for s in self._remove(sid, entry, cid)]
+        for cid in cids:
+            self._mirror_del(cid, [sid])
+        return cids, stops
+
+    def _remove(self, sid, entry, cid):
+        entry['rooms'].discard(cid)
+        sids = self._rooms.get(cid)
+        if sids is not None:
+            sids.discard(sid)
+            if not sids:
+                del self._rooms[cid]
+        if self._typing.pop((sid, cid), None) is not None:
+            return [_typing_payload(cid, entry['user'], False)]
+        return []
+
+    def rooms_of(self, sid):
+        with self._lock:
+            entry = self._sockets.get(sid)
+            return set(entry['rooms']) if entry else set()
+
+    # ----- liveness -----
+    def heartbeat(self, sid):
+        """Record a client heartbeat; returns the rooms whose listing changed
+        because the socket had been considered gone."""
+        now = time.time()
+        with self._lock:
+            entry = self._sockets.get(sid)
+            if entry is None:
+                return []
+            entry['seen'], entry['beats'] = now, True
+            if not entry['stale']:
+                return []
+            entry['stale'] = False
+            rooms, member = list(entry['rooms']), entry['user']
+        for cid in rooms:
+            self._mirror_set(cid, {sid: (member, now)})
+        return rooms
+
+    def expire(self):
+        """Mark heartbeating sockets silent for longer than the TTL as gone;
+        returns the rooms whose listing changed."""
+        cutoff = time.time() - self.ttl
+        changed = set()
+        with self._lock:
+            for entry in self._sockets.values():
+                if entry['beats'] and not entry['stale'] and entry['seen'] < cutoff:
+                    entry['stale'] = True
+                    changed.update(entry['rooms'])
+        return changed
+
+    def refresh_mirror(self):
+        """Write every live local socket's last-seen time to Redis. Sockets
+        that never heartbeat are vouched for as seen now while connected."""
+        if get_redis() is None:
+            return
+        now = time.time()
+        by_room = {}
+        with self._lock:
+            for sid, entry in self._sockets.items():
+                if entry['stale']:
+                    continue
+                seen = entry['seen'] if entry['beats'] else now
+                for cid in entry['rooms']:
+                    by_room.setdefault(cid, {})[sid] = (entry['user'], seen)
+        for cid, fields in by_room.items():
+            self._mirror_set(cid, fields)
+
+    # ----- typing -----
+    def set_typing(self, sid, cid, flag):
+        """Update typing state; returns the payload to broadcast or None when
+        nothing should go out (unchanged, or throttled)."""
+        now = time.time()
+        with self._lock:
+            entry = self._sockets.get(sid)
+            if entry is None or cid not in entry['rooms']:
+                return None
+            key = (sid, cid)
+            state = self._typing.get(key)
+            if not flag:
+                return _typing_payload(cid, entry['user'], False) if self._typing.pop(key, None) else None
+            send = state is None or now - state['sent'] >= TYPING_THROTTLE_S
+            self._typing[key] = {'since': now, 'sent': now if send else state['sent']}
+            return _typing_payload(cid, entry['user'], True) if send else None
+
+    def expire_typing(self):
+        """Clear typing flags that were not refreshed in time; returns the
+        typing-stop payloads to broadcast."""
+        cutoff = time.time() - TYPING_TIMEOUT_S
+        stops = []
+        with self._lock:
+            for (sid, cid), state in list(self._typing.items()):
+                if state['since'] < cutoff:
+                    del self._typing[(sid, cid)]
+                    entry = self._sockets.get(sid)
+                    if entry:
+                        stops.append(_typing_payload(cid, entry['user'], False))
+        return stops
+
+    # ----- listing -----
+    def users(self, cid):
+        """Users currently present in a campaign room (one entry per user,
+        however many sockets they have), across workers when mirrored."""
+        cutoff = time.time() - self.ttl
+        members = {}
+        with self._lock:
+            for sid in self._rooms.get(cid, ()):
+                entry = self._sockets[sid]
+                if not entry['stale']:
+                    members[entry['user']['id']] = entry['user']
+        r = get_redis()
+        if r is not None:
+            try:
+                dead = []
+                for field, raw in r.hgetall(_room_key(cid)).items():
+                    item = json.loads(raw)
+                    if item.get('seen', 0) < cutoff:
+                        dead.append(field)
+                    else:
+                        members.setdefault(item['id'], {'id': item['id'], 'username': item.get('username')})
+                if dead:
+                    r.hdel(_room_key(cid), *dead)
+            except (RedisError, ValueError):
+                mark_redis_down()
+        return sorted(members.values(), key=lambda u: (str(u.get('username') or ''), u['id']))
+
+    def stats(self):
+        with self._lock:
+            return {
+                'sockets': len(self._sockets),
+                'stale': sum(1 for e in self._sockets.values() if e['stale']),
+                'rooms': len(self._rooms),
+                'typing': len(self._typing),
+            }
+
+    # ----- Redis mirror -----
+    def _mirror_set(self, cid, fields):
+        r = get_redis()
+        if r is None:
+            return
+        mapping = {sid: json.dumps({**user, 'seen': seen}) for sid, (user, seen) in fields.items()}
+        try:
+            pipe = r.pipeline(transaction=False)
+            pipe.hset(_room_key(cid), mapping=mapping)
+            pipe.expire(_room_key(cid), int(self.ttl * 2))
+            pipe.execute()
+        except RedisError:
+            mark_redis_down()
+
+    def _mirror_del(self, cid, sids):
+        r = get_redis()
+        if r is None:
+            return
+        try:
+            r.hdel(_room_key(cid), *sids)
+        except RedisError:
+            mark_redis_down()
+
+
+registry = PresenceRegistry()
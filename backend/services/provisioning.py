@@ -0,0 +1,95 @@
+"""Bulk user creation for load rehearsals.
+
+Registering through /api/auth/register costs a password hash, a lookup and
+a commit per user. bulk_register() hashes each distinct password once and
+inserts users, plus their membership of one campaign if asked,
+BULK_REGISTER_BATCH rows per transaction. Emails that already exist are
+left untouched and reported with their id only: no token and no
+membership, since this call never checked their password. Clients log
+those in as usual, so re-running a provisioning job is safe.
+"""
+import uuid as _uuid
+from sqlalchemy.exc import IntegrityError
+from ..db import SessionLocal
+from ..models import User, Membership
+from ..config import BULK_REGISTER_BATCH
+from . import changelog
+from .auth import make_token, invalidate_user_cache
+from .campaigns import invalidate_memberships
+from .passwords import hash_password
+
+CREATED, EXISTS, INVALID, DUPLICATE = 'created', 'exists', 'invalid', 'duplicate'
+
+
+def _insert_batch(batch, hashes, campaign_id):
+    """One transaction: users not yet present, then their memberships.
+    Returns {email: (user id, created)}."""
+    emails = [e['email'] for e in batch]
+    s = SessionLocal()
+    try:
+        existing = dict(s.query(User.email, User.id).filter(User.email.in_(emails)).all())
+        new = [User(email=e['email'], username=e['username'], password_hash=hashes[e['password']], uuid=str(_uuid.uuid4()))
+               for e in batch if e['email'] not in existing]
+        s.add_all(new)
+        s.flush()
+        ids = {**{email: (uid, False) for email, uid in existing.items()}, **{u.email: (u.id, True) for u in new}}
+        if campaign_id is not None and new:
+            # only accounts created here; existing ones join by logging in
+            user_ids = [u.id for u in new]
+            members = {uid for (uid,) in s.query(Membership.user_id).filter(
+                Membership.campaign_id == campaign_id, Membership.user_id.in_(user_ids))}
+            joining = [uid for uid in user_ids if uid not in members]
+            s.add_all([Membership(campaign_id=campaign_id, user_id=uid, role='player', uuid=str(_uuid.uuid4()))
+                       for uid in joining])
+            s.flush()
+            changelog.record_changes(s, campaign_id, changelog.MEMBER, joining)
+        s.commit()
+        return ids
+    finally:
+        s.close()
+
+
+def bulk_register(entries, campaign_id=None, with_tokens=True, batch_size=BULK_REGISTER_BATCH):
+    """Create users from dicts with string email, username and password.
+    Returns one result per entry, in order: email, status (created, exists,
+    invalid or duplicate) and, for the first two, id. Created users also
+    get a token unless with_tokens is false."""
+    results = []
+    valid = []
+    seen = set()
+    for e in entries:
+        e = e if isinstance(e, dict) else {}
+        email, username, password = e.get('email'), e.get('username'), e.get('password')
+        if not all(isinstance(v, str) and v for v in (email, username, password)):
+            results.append({'email': email if isinstance(email, str) else None, 'status': INVALID})
+        elif email in seen:
+            results.append({'email': email, 'status': DUPLICATE})
+        else:
+            seen.add(email)
+            results.append({'email': email, 'username': username})
+            valid.append({'email': email, 'username': username, 'password': password})
+    # rehearsal accounts usually share one password: hash it once
+    hashes = {pw: hash_password(pw) for pw in {e['password'] for e in valid}}
+    ids = {}
+    for i in range(0, len(valid), max(1, batch_size)):
+        batch = valid[i:i + max(1, batch_size)]
+        try:
+            ids.update(_insert_batch(batch, hashes, campaign_id))
+        except IntegrityError:
+            # raced a concurrent registration or join; the retry sees its rows
+            ids.update(_insert_batch(batch, hashes, campaign_id))
+    for r in results:
+        if 'username' not in r:
+            continue
+        uid, created = ids[r['email']]
+        r['id'] = uid
+        r['status'] = CREATED if created else EXISTS
+        if not created:
+            continue
+        # ids can be reused after a delete; never serve a stale cached identity
+        invalidate_user_cache(uid)
+        if campaign_id is not None:
+            invalidate_memberships(uid)
+        if with_tokens:
+            r['token'] = make_token({'id': uid, 'email': r['email'], 'username': r['username']})
+    return results
@@ -0,0 +1,57 @@
+"""Authorization for Socket.IO connections and campaign room joins.
+
+The token is verified once in the `connect` handler and the resolved user
+kept on the socket's session; joins are then checked against the cached
+per-user membership set (services.campaigns.user_campaign_ids), so a
+reconnect storm costs no per-join queries once the caches are warm.
+"""
+import threading
+from .campaigns import resolve_campaign_id, can_access_campaign, MEMBERSHIP_CACHE
+
+_stats_lock = threading.Lock()
+_stats = {
+    'connects_authenticated': 0,
+    'connects_anonymous': 0,
+    'connects_rejected': 0,
+    'joins_accepted': 0,
+    'joins_rejected': 0,
+}
+
+
+def count(name):
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def token_from_handshake(auth, req):
+    """socket.io-client sends `auth: {token}`; also accept ?token= on the URL."""
+    if isinstance(auth, dict) and auth.get('token'):
+        return auth['token']
+    try:
+        return req.args.get('token')
+    except Exception:
+        return None
+
+
+def authorize_join(user, campaign):
+    """Return (campaign_id, None) when `user` may join `campaign` (id, uuid
+    or name), else (None, reason)."""
+    if not user:
+        count('joins_rejected')
+        return None, 'unauthorized'
+    cid = resolve_campaign_id(campaign)
+    if cid is None:
+        count('joins_rejected')
+        return None, 'campaign not found'
+    if not can_access_campaign(user['id'], cid):
+        count('joins_rejected')
+        return None, 'forbidden'
+    count('joins_accepted')
+    return cid, None
+
+
+def socket_auth_stats():
+    with _stats_lock:
+        out = dict(_stats)
+    out['membership_cache'] = MEMBERSHIP_CACHE.stats()
+    return out
@@ -0,0 +1,90 @@
+"""Incremental campaign sync: everything that changed since revision N.
+
+A reconnecting client sends the `revision` of its last sync and gets back
+only the messages, characters and members touched after it (read from the
+change log, see services.changelog) plus the new revision to send next
+time. It gets a full snapshot instead (`full: true`) when it has no
+revision yet, when its revision is from before the last compaction or not
+from this database at all, or when more than SYNC_MAX_CHANGES entities
+changed and the snapshot is the smaller answer anyway.
+
+Items are current state, not history, so clients upsert them by id; a
+message can show up in a snapshot and again in the next delta when it was
+still in the write-behind queue at snapshot time.
+"""
+from ..db import SessionLocal
+from ..models import Message, Character, Membership, User
+from ..config import SYNC_MAX_CHANGES, MESSAGE_PAGE_DEFAULT
+from . import changelog
+from .characters import character_payloads
+from .messages import message_to_dict, get_messages_page
+
+
+def member_to_dict(membership, username):
+    return {'user_id': membership.user_id, 'username': username, 'role': membership.role}
+
+
+def _members(s, campaign_id, user_ids=None):
+    q = (s.query(Membership, User.username).outerjoin(User, User.id == Membership.user_id)
+         .filter(Membership.campaign_id == campaign_id))
+    if user_ids is not None:
+        q = q.filter(Membership.user_id.in_(user_ids))
+    return [member_to_dict(m, name) for m, name in q.order_by(Membership.id).all()]
+
+
+def _snapshot(s, campaign_id, head):
+    chars = character_payloads(s, s.query(Character).filter(Character.campaign_id == campaign_id).order_by(Character.id))
+    return {
+        'campaign_id': campaign_id,
+        'revision': head,
+        'full': True,
+        'messages': get_messages_page(campaign_id, None, None, MESSAGE_PAGE_DEFAULT),
+        'characters': chars,
+        'members': _members(s, campaign_id),
+        'removed': {'characters': [], 'members': []},
+    }
+
+
+def _ids(rows, kind):
+    seen = {}
+    for k, entity_id in rows:
+        if k == kind:
+            seen[entity_id] = None
+    return list(seen)
+
+
+def sync_campaign(campaign_id, since):
+    """Sync payload for a campaign relative to revision `since` (None for a
+    first sync)."""
+    s = SessionLocal()
+    try:
+        # fix the head first; rows committed after it are left for next time
+        head = changelog.campaign_revision(s, campaign_id)
+        if since is None or since <= 0 or since > head or since < changelog.compacted_floor(s, campaign_id):
+            return _snapshot(s, campaign_id, head)
+        rows = changelog.changes_between(s, campaign_id, since, head, SYNC_MAX_CHANGES + 1)
+        if len(rows) > SYNC_MAX_CHANGES:
+            return _snapshot(s, campaign_id, head)
+
+        msg_ids, char_ids, member_ids = _ids(rows, changelog.MESSAGE), _ids(rows, changelog.CHARACTER), _ids(rows, changelog.MEMBER)
+        messages = s.query(Message).filter(Message.id.in_(msg_ids)).order_by(Message.id).all() if msg_ids else []
+        chars = (character_payloads(s, s.query(Character).filter(Character.id.in_(char_ids), Character.campaign_id == campaign_id)
+                                    .order_by(Character.id)) if char_ids else [])
+        members = _members(s, campaign_id, member_ids) if member_ids else []
+        found_chars = {c['id'] for c in chars}
+        found_members = {m['user_id'] for m in members}
+        return {
+            'campaign_id': campaign_id,
+            'since': since,
+            'revision': head,
+            'full': False,
+            'messages': [message_to_dict(m) for m in messages],
+            'characters': chars,
+            'members': members,
+            'removed': {
+                'characters': [i for i in char_ids if i not in found_chars],
+                'members': [i for i in member_ids if i not in found_members],
+            },
+        }
+    finally:
+        s.close()
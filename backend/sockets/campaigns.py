@@ -1,29 +1,92 @@
+from flask import request, session
 from ..extensions import socketio
-from flask_socketio import join_room, leave_room, emit
+from ..services.auth import user_from_token
+from ..services.campaigns import resolve_campaign_id
+from ..services.socket_auth import authorize_join, count, token_from_handshake
+from .coalesce import campaign_scheduler, join_campaign_room, leave_campaign_room, supports_batch
+from .presence import PresenceHub
+from ..utils.metrics import REGISTRY
+from flask_socketio import emit
+
+
+# character_updated bursts are coalesced per room; chat goes out immediately
+emit_scheduler = campaign_scheduler(socketio)
 
 
 def campaign_room_name(cid):
     return f"campaign_{cid}"
 
 
+presence = PresenceHub(socketio, emit_scheduler, campaign_room_name)
+REGISTRY.register_stats('emit_coalescing', emit_scheduler.stats)
+REGISTRY.register_stats('presence', presence.stats)
+
+
+@socketio.on('connect')
+def on_connect(auth=None):
+    session['batch'] = supports_batch(auth)
+    token = token_from_handshake(auth, request)
+    if not token:
+        # allowed to connect (e.g. before login) but can't join any room
+        count('connects_anonymous')
+        return
+    user = user_from_token(token)
+    if not user:
+        count('connects_rejected')
+        raise ConnectionRefusedError('unauthorized')
+    session['user'] = user
+    count('connects_authenticated')
+
+
 @socketio.on('join')
 def on_join(data):
-    cid = data.get('campaign_id')
-    if cid is None:
+    data = data or {}
+    raw = data.get('campaign_id', data.get('campaign'))
+    if raw is None:
         return
-    room = campaign_room_name(cid)
-    join_room(room)
+    user = session.get('user')
+    if not user and data.get('token'):
+        # late authentication for sockets opened before login
+        user = user_from_token(data.get('token'))
+        if user:
+            session['user'] = user
+    cid, error = authorize_join(user, raw)
+    if error:
+        return {'ok': False, 'error': error}
+    join_campaign_room(campaign_room_name(cid), session.get('batch', False))
+    return {'ok': True, 'campaign_id': cid, 'presence': presence.joined(request.sid, user, cid)}
 
 
 @socketio.on('leave')
 def on_leave(data):
-    cid = data.get('campaign_id')
-    if cid is None:
+    raw = (data or {}).get('campaign_id', (data or {}).get('campaign'))
+    if raw is None:
         return
-    room = campaign_room_name(cid)
-    leave_room(room)
+    cid = resolve_campaign_id(raw)
+    if cid is not None:
+        leave_campaign_room(campaign_room_name(cid))
+        presence.left(request.sid, cid)
+
+
+@socketio.on('disconnect')
+def on_disconnect(*_args):
+    presence.disconnected(request.sid)
+
+
+@socketio.on('heartbeat')
+def on_heartbeat(*_args):
+    presence.heartbeat(request.sid)
+
+
+@socketio.on('typing')
+def on_typing(data):
+    # data: { campaign_id, typing: bool }; ignored unless this socket joined the room
+    data = data or {}
+    cid = resolve_campaign_id(data.get('campaign_id', data.get('campaign')))
+    if cid is not None:
+        presence.typing(request.sid, cid, data.get('typing', True))
 
 
-def emit_to_campaign(event, payload, campaign_id):
+def emit_to_campaign(event, payload, campaign_id, coalesce=True):
     room = campaign_room_name(campaign_id)
-    socketio.emit(event, payload, to=room)
+    emit_scheduler.emit(event, payload, room, coalesce=coalesce)
@@ -0,0 +1,131 @@
+"""Per-room emit coalescing for high-frequency campaign events.
+
+Dragging an HP slider autosaves many times a second, and every save used to
+fan a `character_updated` frame out to the whole room. Events registered
+here are held for EMIT_COALESCE_MS per room; within that window a newer
+event with the same (event, key) replaces or merges into the queued one.
+When the window closes the room gets a single frame: the event itself if
+only one is queued, otherwise one `batch` event carrying
+`[{event, data}, ...]` in first-queued order.
+
+Only clients that announce `batch: true` in the Socket.IO handshake auth
+understand that frame. join_campaign_room() puts every socket in the room
+and in one of two sub-rooms, batch_room() or single_room(), by that flag;
+a batch goes to the first and the same events one by one to the second,
+so older bundles still get every update.
+
+Events that are not registered (chat in particular) are emitted at once,
+unbatched and in order, as before.
+"""
+import threading
+from collections import OrderedDict
+from flask_socketio import join_room, leave_room
+from ..config import EMIT_COALESCE_MS
+
+BATCH_EVENT = 'batch'
+
+
+def supports_batch(auth):
+    """Whether the handshake auth of a connecting socket accepts `batch` frames."""
+    return isinstance(auth, dict) and auth.get('batch') is True
+
+
+def batch_room(room):
+    return f'{room}:batch'
+
+
+def single_room(room):
+    return f'{room}:single'
+
+
+def join_campaign_room(room, batch):
+    """Join room plus the sub-room matching the socket's batch support."""
+    join_room(room)
+    join_room(batch_room(room) if batch else single_room(room))
+
+
+def leave_campaign_room(room):
+    for name in (room, batch_room(room), single_room(room)):
+        leave_room(name)
+
+
+def _last_write_wins(_prev, cur):
+    return cur
+
+
+class EmitScheduler:
+    def __init__(self, sio, window_ms=EMIT_COALESCE_MS):
+        self.sio = sio
+        self.window = max(0, window_ms) / 1000.0
+        self._rules = {}
+        self._pending = {}  # room -> OrderedDict[(event, key)] = payload
+        self._lock = threading.Lock()
+        self.stats_counters = {'queued': 0, 'coalesced': 0, 'frames': 0, 'batches': 0, 'immediate': 0}
+
+    def register(self, event, key=None, merge=None):
+        """Coalesce `event`; key(payload) picks what supersedes what and
+        merge(prev, cur) combines two queued payloads (default: keep cur)."""
+        self._rules[event] = (key or (lambda _p: None), merge or _last_write_wins)
+
+    def emit(self, event, payload, room, coalesce=True):
+        rule = self._rules.get(event) if coalesce else None
+        if rule is None or self.window <= 0:
+            self.stats_counters['immediate'] += 1
+            self.sio.emit(event, payload, to=room)
+            return
+        key_fn, merge = rule
+        k = (event, key_fn(payload))
+        with self._lock:
+            queued = self._pending.get(room)
+            schedule = queued is None
+            if schedule:
+                queued = self._pending[room] = OrderedDict()
+            if k in queued:
+                queued[k] = merge(queued[k], payload)
+                self.stats_counters['coalesced'] += 1
+            else:
+                queued[k] = payload
+            self.stats_counters['queued'] += 1
+        if schedule:
+            self.sio.start_background_task(self._flush_later, room)
+
+    def _flush_later(self, room):
+        self.sio.sleep(self.window)
+        self.flush(room)
+
+    def flush(self, room):
+        with self._lock:
+            queued = self._pending.pop(room, None)
+        if not queued:
+            return
+        self.stats_counters['frames'] += 1
+        if len(queued) == 1:
+            (event, _key), payload = next(iter(queued.items()))
+            self.sio.emit(event, payload, to=room)
+            return
+        self.stats_counters['batches'] += 1
+        self.sio.emit(BATCH_EVENT, [{'event': event, 'data': payload} for (event, _key), payload in queued.items()],
+                      to=batch_room(room))
+        for (event, _key), payload in queued.items():
+            self.sio.emit(event, payload, to=single_room(room))
+
+    def flush_all(self):
+        with self._lock:
+            rooms = list(self._pending)
+        for room in rooms:
+            self.flush(room)
+
+    def stats(self):
+        with self._lock:
+            waiting = sum(len(q) for q in self._pending.values())
+        return {**self.stats_counters, 'waiting': waiting, 'window_ms': int(self.window * 1000)}
+
+
+def campaign_scheduler(sio):
+    """Scheduler with the campaign room rules: character updates coalesce
+    per character, typing flags per user; chat is deliberately not registered."""
+    from ..services.characters import merge_character_events
+    sched = EmitScheduler(sio)
+    sched.register('character_updated', key=lambda p: p.get('character_id'), merge=merge_character_events)
+    sched.register('typing', key=lambda p: p.get('user_id'))
+    return sched
@@ -0,0 +1,99 @@
+"""Push `presence` and `typing` events to campaign rooms.
+
+Join/leave/disconnect/heartbeat handlers report to a PresenceHub, which
+keeps services.presence.registry up to date and pushes a room's member list
+(`presence`: {campaign_id, users}) at most once per PRESENCE_THROTTLE_MS, so
+a reconnect storm after a deploy costs one frame per room rather than one
+per socket. `typing` events go out on change (repeats are throttled by the
+registry) through the emit scheduler. A background sweeper clears stale
+typing flags, ages out silent sockets and refreshes the Redis mirror.
+"""
+import threading
+from ..config import PRESENCE_HEARTBEAT_S, PRESENCE_THROTTLE_MS
+from ..services.presence import registry as default_registry
+
+# typing flags time out in seconds, so a 1s sweep is precise enough
+SWEEP_INTERVAL = 1.0
+
+
+class PresenceHub:
+    def __init__(self, sio, scheduler, room_name, registry=None, throttle_ms=PRESENCE_THROTTLE_MS):
+        self.sio = sio
+        self.scheduler = scheduler
+        self.room_name = room_name
+        self.registry = registry or default_registry
+        self.throttle = max(0, throttle_ms) / 1000.0
+        self._lock = threading.Lock()
+        self._dirty = set()
+        self._sweeper = False
+        self.counters = {'presence_pushes': 0, 'typing_pushes': 0}
+
+    def joined(self, sid, user, cid):
+        """Register a socket in a room; returns the current member list."""
+        self.registry.join(sid, user, cid)
+        self._ensure_sweeper()
+        self._mark(cid)
+        return self.registry.users(cid)
+
+    def left(self, sid, cid):
+        self._send_typing(self.registry.leave(sid, cid))
+        self._mark(cid)
+
+    def disconnected(self, sid):
+        cids, stops = self.registry.drop(sid)
+        self._send_typing(stops)
+        for cid in cids:
+            self._mark(cid)
+
+    def heartbeat(self, sid):
+        for cid in self.registry.heartbeat(sid):
+            self._mark(cid)
+
+    def typing(self, sid, cid, flag):
+        payload = self.registry.set_typing(sid, cid, bool(flag))
+        if payload:
+            self._send_typing([payload])
+
+    def stats(self):
+        return {**self.registry.stats(), **self.counters}
+
+    def _send_typing(self, payloads):
+        for p in payloads:
+            self.counters['typing_pushes'] += 1
+            self.scheduler.emit('typing', p, self.room_name(p['campaign_id']))
+
+    def _mark(self, cid):
+        with self._lock:
+            if cid in self._dirty:
+                return
+            self._dirty.add(cid)
+        self.sio.start_background_task(self._push_later, cid)
+
+    def _push_later(self, cid):
+        self.sio.sleep(self.throttle)
+        with self._lock:
+            self._dirty.discard(cid)
+        self.counters['presence_pushes'] += 1
+        self.sio.emit('presence', {'campaign_id': cid, 'users': self.registry.users(cid)}, to=self.room_name(cid))
+
+    def _ensure_sweeper(self):
+        with self._lock:
+            if self._sweeper:
+                return
+            self._sweeper = True
+        self.sio.start_background_task(self._sweep_loop)
+
+    def _sweep_loop(self):
+        ticks_per_refresh = max(1, int(PRESENCE_HEARTBEAT_S / SWEEP_INTERVAL))
+        tick = 0
+        while True:
+            self.sio.sleep(SWEEP_INTERVAL)
+            tick += 1
+            try:
+                self._send_typing(self.registry.expire_typing())
+                if tick % ticks_per_refresh == 0:
+                    for cid in self.registry.expire():
+                        self._mark(cid)
+                    self.registry.refresh_mirror()
+            except Exception as e:
+                print(f"presence sweep failed: {e}")
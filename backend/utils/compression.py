@@ -0,0 +1,76 @@
+"""gzip/brotli compression of API responses.
+
+An after_request hook compresses JSON and text bodies of at least
+COMPRESS_MIN_BYTES when the client accepts it, preferring brotli when the
+`brotli` module is installed and the client ranks it at least as high as
+gzip. Streamed and file responses (send_file, portraits, the SPA) are left
+alone, as are bodies that would not get smaller.
+"""
+import gzip
+import threading
+from flask import request
+from ..config import COMPRESS_MIN_BYTES, COMPRESS_LEVEL
+
+try:
+    import brotli
+except ImportError:  # optional; gzip only
+    brotli = None
+
+# speed over ratio: responses are compressed per request
+BROTLI_QUALITY = 5
+COMPRESSIBLE = ('application/json', 'application/javascript', 'image/svg+xml')
+
+_stats_lock = threading.Lock()
+_stats = {'compressed': 0, 'bytes_in': 0, 'bytes_out': 0}
+
+
+def _encodings():
+    return ['br', 'gzip'] if brotli is not None else ['gzip']
+
+
+def _compressible(mimetype):
+    return bool(mimetype) and (mimetype.startswith('text/') or mimetype in COMPRESSIBLE)
+
+
+def compress_response(resp):
+    if not _compressible(resp.mimetype):
+        return resp
+    resp.vary.add('Accept-Encoding')
+    if (request.method == 'HEAD' or resp.status_code < 200 or resp.status_code in (204, 206, 304)
+            or resp.direct_passthrough or resp.is_streamed or 'Content-Encoding' in resp.headers
+            or resp.cache_control.no_transform):
+        return resp
+    data = resp.get_data()
+    if len(data) < COMPRESS_MIN_BYTES:
+        return resp
+    encoding = request.accept_encodings.best_match(_encodings())
+    if encoding is None:
+        return resp
+    if encoding == 'br':
+        body = brotli.compress(data, quality=BROTLI_QUALITY)
+    else:
+        body = gzip.compress(data, compresslevel=COMPRESS_LEVEL, mtime=0)
+    if len(body) >= len(data):
+        return resp
+    resp.set_data(body)
+    resp.headers['Content-Encoding'] = encoding
+    # a strong validator names exact bytes, which are now different
+    etag, weak = resp.get_etag()
+    if etag and not weak:
+        resp.set_etag(etag, weak=True)
+    with _stats_lock:
+        _stats['compressed'] += 1
+        _stats['bytes_in'] += len(data)
+        _stats['bytes_out'] += len(body)
+    return resp
+
+
+def compression_stats():
+    with _stats_lock:
+        return {**_stats, 'brotli': brotli is not None}
+
+
+def init_compression(app):
+    """Register compress_response on app; COMPRESS_LEVEL=0 disables it."""
+    if COMPRESS_LEVEL > 0:
+        app.after_request(compress_response)
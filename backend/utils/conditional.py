@@ -0,0 +1,35 @@
+"""Weak ETags from revision counters, and 304s for unchanged polls.
+
+List endpoints build their validator from the revisions that cover their
+content (see services.changelog) instead of hashing the body, so a
+matching If-None-Match is answered before the list is loaded or
+serialized. Validators are weak: the same revision may be sent gzipped or
+not, and key order is not part of the contract. Cache-Control: no-cache
+makes browsers revalidate every time; fetch() sends If-None-Match and
+turns a 304 back into the cached body on its own.
+"""
+import zlib
+from flask import request, make_response
+
+REVALIDATE = 'private, no-cache'
+
+
+def revision_etag(*parts):
+    """Validator for the current request from `parts`; the query string is
+    folded in since it selects a different page of the same list."""
+    if request.query_string:
+        parts = parts + (format(zlib.crc32(request.query_string), 'x'),)
+    return '.'.join(str(p) for p in parts)
+
+
+def not_modified(etag):
+    """A 304 response when If-None-Match matches etag, else None."""
+    if not request.if_none_match.contains_weak(etag):
+        return None
+    return with_etag(make_response('', 304), etag)
+
+
+def with_etag(resp, etag):
+    resp.set_etag(etag, weak=True)
+    resp.headers['Cache-Control'] = REVALIDATE
+    return resp
@@ -0,0 +1,133 @@
+"""JSON encoding shared by Flask responses and Socket.IO packets.
+
+orjson is used when it is installed (JSON_BACKEND=auto) and the stdlib
+`json` module otherwise. The module itself has the `dumps`/`loads` pair
+python-socketio expects, so it is passed as `SocketIO(json=fastjson)`;
+FastJSONProvider plugs the same functions into `jsonify`.
+
+Output is compact and keys keep insertion order (Flask's default provider
+sorts them). Dates still go through Flask's default hook, so they come out
+as HTTP dates exactly as before.
+
+A payload that is sent more than once (a chat message returned to the
+poster, broadcast to the room and pushed to the Redis ring buffer) can be
+wrapped with encode_once(): the text is produced a single time and spliced
+verbatim wherever the Encoded value sits within the top few levels of the
+list or dict being dumped, which is where Socket.IO puts event arguments
+both in the packet and in the message-queue envelope.
+"""
+import json as _json
+from flask.json.provider import DefaultJSONProvider, _default as _flask_default
+from ..config import JSON_BACKEND
+
+try:
+    import orjson
+except ImportError:  # optional; the stdlib encoder is used instead
+    orjson = None
+
+if JSON_BACKEND == 'stdlib':
+    orjson = None
+
+BACKEND = 'orjson' if orjson is not None else 'stdlib'
+_OPTIONS = (orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME) if orjson is not None else 0
+# how deep dumps() looks for Encoded values: event args sit two levels down
+# in the message-queue envelope and three in a coalesced `batch` frame
+_SPLICE_DEPTH = 3
+
+
+class Encoded:
+    """A value serialized up front; see encode_once()."""
+    __slots__ = ('text',)
+
+    def __init__(self, text):
+        self.text = text
+
+    def __repr__(self):
+        return f"Encoded({self.text[:60]!r})"
+
+
+def _default(o):
+    if isinstance(o, Encoded):
+        # nested deeper than dumps() splices; decode so it is encoded inline
+        return _json.loads(o.text)
+    return _flask_default(o)
+
+
+def _encode(obj):
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, default=_default, option=_OPTIONS).decode()
+        except orjson.JSONEncodeError:
+            # e.g. integers past 64 bits; let the stdlib encoder decide
+            pass
+    return _json.dumps(obj, default=_default, separators=(',', ':'), ensure_ascii=False)
+
+
+def encode_once(obj):
+    """Serialize obj now and return an Encoded that dumps() reuses as-is."""
+    return obj if isinstance(obj, Encoded) else Encoded(_encode(obj))
+
+
+def dumps(obj, **kwargs):
+    """json.dumps() replacement. Formatting kwargs (indent, sort_keys) fall
+    back to the stdlib; python-socketio's `separators` is already the
+    compact default and is ignored."""
+    if isinstance(obj, Encoded):
+        return obj.text
+    if isinstance(obj, list) and _has_encoded(obj):
+        return '[' + ','.join(dumps(v) for v in obj) + ']'
+    if isinstance(obj, dict) and _has_encoded(obj):
+        return '{' + ','.join(_encode(str(k)) + ':' + dumps(v) for k, v in obj.items()) + '}'
+    kwargs.pop('separators', None)
+    if kwargs:
+        kwargs.setdefault('default', _default)
+        return _json.dumps(obj, **kwargs)
+    return _encode(obj)
+
+
+def _has_encoded(obj, depth=_SPLICE_DEPTH):
+    if isinstance(obj, Encoded):
+        return True
+    if depth == 0:
+        return False
+    if isinstance(obj, dict):
+        obj = obj.values()
+    elif not isinstance(obj, list):
+        return False
+    return any(_has_encoded(v, depth - 1) for v in obj)
+
+
+def dumps_bytes(obj):
+    """dumps() as UTF-8 bytes, without the str round trip when orjson is used."""
+    if orjson is not None and not _has_encoded(obj):
+        try:
+            return orjson.dumps(obj, default=_default, option=_OPTIONS)
+        except orjson.JSONEncodeError:
+            pass
+    return dumps(obj).encode()
+
+
+def loads(s, **kwargs):
+    if kwargs or orjson is None:
+        return _json.loads(s, **kwargs)
+    return orjson.loads(s)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by this module. Pretty-printed debug
+    responses and explicit formatting kwargs keep the stdlib path."""
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            kwargs.setdefault('default', _default)
+            return super().dumps(obj, **kwargs)
+        return dumps(obj)
+
+    def loads(self, s, **kwargs):
+        return loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        if self.compact is False or (self.compact is None and self._app.debug):
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps_bytes(obj) + b'\n', mimetype=self.mimetype)
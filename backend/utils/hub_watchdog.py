@@ -0,0 +1,96 @@
+"""Find calls that block the eventlet hub.
+
+Production runs one eventlet worker, so anything that holds the hub (a
+blocking socket, CPU-bound hashing outside tpool, a slow SQLite commit)
+stalls every request and socket at once. HubWatchdog measures that:
+
+- a green thread sleeps HUB_LAG_INTERVAL_MS at a time and records how late
+  it wakes up in the `hub_lag_seconds` histogram;
+- a real OS thread notices when the green thread is overdue by more than
+  HUB_LAG_THRESHOLD_MS and grabs the hub thread's stack right then, while
+  the offending greenlet is still on it;
+- when the hub comes back the stall is logged with that stack.
+
+The green thread only runs when Socket.IO uses eventlet; in threading mode
+there is no hub to block.
+"""
+import sys
+import time
+import traceback
+from ..config import HUB_LAG_THRESHOLD_MS, HUB_LAG_INTERVAL_MS
+from .metrics import REGISTRY
+from .profiler import os_threading
+
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+HUB_LAG = REGISTRY.histogram('hub_lag_seconds', 'How late the hub woke a sleeping green thread.', (), LAG_BUCKETS)
+# frames kept in a logged stack, innermost last
+STACK_LIMIT = 30
+
+
+class HubWatchdog:
+    def __init__(self, sio, threshold_ms=HUB_LAG_THRESHOLD_MS, interval_ms=HUB_LAG_INTERVAL_MS):
+        self.sio = sio
+        self.threshold = threshold_ms / 1000.0
+        self.interval = max(1, interval_ms) / 1000.0
+        self._threading, self._time = os_threading()
+        self._hub_thread = None
+        self._due = None       # monotonic time the green thread should wake by
+        self._stack = None     # hub stack captured during the current stall
+        self._started = False
+        self.counters = {'ticks': 0, 'stalls': 0, 'max_lag_ms': 0.0, 'last_stall_ms': 0.0}
+
+    def start(self):
+        if self._started:
+            return
+        self._started = True
+        self.sio.start_background_task(self._tick_loop)
+        self._threading.Thread(target=self._monitor_loop, name='hub-watchdog', daemon=True).start()
+
+    def _tick_loop(self):
+        self._hub_thread = self._threading.get_ident()
+        while True:
+            started = time.monotonic()
+            self._due = started + self.interval
+            self.sio.sleep(self.interval)
+            lag = max(0.0, time.monotonic() - started - self.interval)
+            self._due = None
+            HUB_LAG.observe(lag)
+            self.counters['ticks'] += 1
+            if lag * 1000.0 > self.counters['max_lag_ms']:
+                self.counters['max_lag_ms'] = lag * 1000.0
+            if self.threshold > 0 and lag >= self.threshold:
+                self._report(lag)
+
+    def _report(self, lag):
+        stack, self._stack = self._stack, None
+        self.counters['stalls'] += 1
+        self.counters['last_stall_ms'] = lag * 1000.0
+        where = ''.join(stack) if stack else '  (stack not captured)\n'
+        print(f"hub blocked for {lag * 1000.0:.0f} ms; blocking greenlet was at:\n{where}", end='')
+
+    def _monitor_loop(self):
+        # check a few times per threshold so the stack is taken early in a stall
+        poll = max(0.005, min(self.interval, self.threshold / 4 if self.threshold > 0 else self.interval))
+        while True:
+            self._time.sleep(poll)
+            due = self._due
+            if due is None or self._stack is not None or self.threshold <= 0:
+                continue
+            if time.monotonic() - due >= self.threshold:
+                frame = sys._current_frames().get(self._hub_thread)
+                if frame is not None:
+                    self._stack = traceback.format_stack(frame, limit=STACK_LIMIT)
+
+    def stats(self):
+        return {**self.counters, 'threshold_ms': self.threshold * 1000.0, 'interval_ms': self.interval * 1000.0}
+
+
+def start_hub_watchdog(sio):
+    """Start a HubWatchdog for sio when it runs on eventlet and
+    HUB_LAG_THRESHOLD_MS is set; returns it (or None)."""
+    if HUB_LAG_THRESHOLD_MS <= 0 or getattr(sio, 'async_mode', None) != 'eventlet':
+        return None
+    watchdog = HubWatchdog(sio)
+    watchdog.start()
+    REGISTRY.register_stats('hub', watchdog.stats)
+    return watchdog
@@ -0,0 +1,76 @@
+"""Minimal RFC 6902 JSON Patch helpers (add / remove / replace only).
+
+Objects are diffed key by key; lists and scalars that differ are replaced
+wholesale, which keeps patches simple to apply client-side while still
+turning "one HP changed" into a single small op.
+"""
+import copy
+
+
+def _escape(key):
+    return str(key).replace('~', '~0').replace('/', '~1')
+
+
+def make_patch(old, new, path=''):
+    if isinstance(old, dict) and isinstance(new, dict):
+        ops = []
+        for key in old:
+            if key not in new:
+                ops.append({'op': 'remove', 'path': f"{path}/{_escape(key)}"})
+        for key, value in new.items():
+            child = f"{path}/{_escape(key)}"
+            if key not in old:
+                ops.append({'op': 'add', 'path': child, 'value': value})
+            elif old[key] != value:
+                ops.extend(make_patch(old[key], value, child))
+        return ops
+    if old == new and type(old) is type(new):
+        return []
+    return [{'op': 'replace', 'path': path, 'value': new}]
+
+
+def _unescape(token):
+    return token.replace('~1', '/').replace('~0', '~')
+
+
+def _split(path):
+    return [_unescape(t) for t in path.split('/')[1:]] if path else []
+
+
+def apply_patch(doc, ops):
+    """Apply ops produced by make_patch (object keys only) to a copy of doc."""
+    doc = copy.deepcopy(doc)
+    for op in ops:
+        parts = _split(op['path'])
+        if not parts:
+            doc = copy.deepcopy(op.get('value'))
+            continue
+        target = doc
+        for key in parts[:-1]:
+            target = target[key]
+        if op['op'] == 'remove':
+            target.pop(parts[-1], None)
+        else:
+            target[parts[-1]] = copy.deepcopy(op['value'])
+    return doc
+
+
+def _covers(outer, inner):
+    return inner == outer or inner.startswith(outer + '/') or outer == ''
+
+
+def compose_patches(first, second):
+    """One patch equivalent to applying `first` then `second`.
+
+    Earlier ops whose target a later 'replace' overwrites are dropped, so a
+    slider dragged through twenty values collapses to a single op.
+    """
+    ops = list(first) + list(second)
+    out = []
+    for i, op in enumerate(ops):
+        later = ops[i + 1:]
+        if any(l['op'] == 'replace' and _covers(l['path'], op['path']) and (l['path'] != op['path'] or op['op'] == 'replace')
+               for l in later):
+            continue
+        out.append(op)
+    return out
@@ -0,0 +1,144 @@
+"""Minimal Prometheus-style metrics: labelled counters and histograms plus
+stats callbacks, rendered in the text exposition format.
+
+Instruments live in one process-wide registry and are cheap enough to
+update on every request, query and socket frame (a lock, a dict lookup
+and a bisect). Each worker exposes its own numbers; Prometheus adds the
+`instance` label when scraping, so sum across it for service totals.
+"""
+import bisect
+import math
+import threading
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=None):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(v):
+    if isinstance(v, float):
+        if math.isinf(v):
+            return '+Inf' if v > 0 else '-Inf'
+        return repr(v)
+    return str(v)
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, doc, labels=()):
+        self.name, self.doc, self.labelnames = name, doc, tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labelvalues, amount=1):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f'{self.name}{_labels(self.labelnames, k)} {_number(v)}' for k, v in items]
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, doc, labels=(), buckets=LATENCY_BUCKETS):
+        self.name, self.doc, self.labelnames = name, doc, tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}  # labelvalues -> [per-bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labelvalues):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            row = self._values.get(labelvalues)
+            if row is None:
+                row = self._values[labelvalues] = [0] * (len(self.buckets) + 1) + [0.0]
+            row[i] += 1
+            row[-1] += value
+
+    def samples(self):
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._values.items())
+        out = []
+        for k, row in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (math.inf,), row[:-1]):
+                cumulative += n
+                le = f'le="{_number(float(bound))}"'
+                out.append(f'{self.name}_bucket{_labels(self.labelnames, k, le)} {cumulative}')
+            out.append(f'{self.name}_sum{_labels(self.labelnames, k)} {_number(row[-1])}')
+            out.append(f'{self.name}_count{_labels(self.labelnames, k)} {cumulative}')
+        return out
+
+
+class Registry:
+    def __init__(self, prefix=''):
+        self.prefix = prefix
+        self._metrics = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def _add(self, metric):
+        with self._lock:
+            # module reloads (tests, the legacy app importing twice) reuse the
+            # instrument instead of resetting it
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, doc, labels=()):
+        return self._add(Counter(self.prefix + name, doc, labels))
+
+    def histogram(self, name, doc, labels=(), buckets=LATENCY_BUCKETS):
+        return self._add(Histogram(self.prefix + name, doc, labels, buckets))
+
+    def register_stats(self, section, fn):
+        """Expose the numeric values of fn() (a flat or nested dict, as the
+        health endpoint reports them) as `<prefix><section>_<key>` gauges
+        read at scrape time. Registering a section again replaces it."""
+        with self._lock:
+            self._stats[section] = fn
+
+    def render(self):
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+            stats = list(self._stats.items())
+        for m in metrics:
+            samples = m.samples()
+            if samples:
+                lines += [f'# HELP {m.name} {m.doc}', f'# TYPE {m.name} {m.kind}'] + samples
+        for section, fn in stats:
+            try:
+                values = fn()
+            except Exception as e:
+                print(f"metrics: {section} stats failed: {e}")
+                continue
+            for key, v in _flatten(values, self.prefix + section):
+                lines += [f'# TYPE {key} gauge', f'{key} {_number(v)}']
+        return '\n'.join(lines) + '\n'
+
+
+def _flatten(values, name):
+    if isinstance(values, bool):
+        yield name, int(values)
+    elif isinstance(values, (int, float)):
+        yield name, values
+    elif isinstance(values, dict):
+        for k, v in values.items():
+            key = ''.join(c if c.isalnum() or c == '_' else '_' for c in str(k))
+            yield from _flatten(v, f'{name}_{key}')
+
+
+REGISTRY = Registry(prefix='npc_')
@@ -0,0 +1,201 @@
+"""Opt-in sampling profiler for slow requests.
+
+RequestProfiler wraps Flask's wsgi_app. While any request is in flight, a
+real OS thread (not a green one, so it keeps running while a request
+blocks the eventlet hub) samples the interpreter's current stacks every
+PROFILE_INTERVAL_MS and charges each stack to the request whose wsgi frame
+it runs under. When the request ends, its samples are kept if it took at
+least PROFILE_SLOW_MS, or if it was one of the PROFILE_SAMPLE_RATE
+fraction picked up front; everything else is dropped.
+
+Kept profiles are written by the sampler thread, off the request path, as
+collapsed stacks (`root;caller;callee count` per line), the input format
+of flamegraph.pl and speedscope. At most PROFILE_MAX_FILES are kept in
+PROFILE_DIR, oldest deleted first. routes.profiles lists and serves them.
+"""
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+from collections import Counter, deque
+from ..config import PROFILE_SAMPLE_RATE, PROFILE_SLOW_MS, PROFILE_INTERVAL_MS, PROFILE_DIR, PROFILE_MAX_FILES
+
+SUFFIX = '.collapsed'
+# longest stack kept per sample; deeper frames nearest the root are dropped
+MAX_DEPTH = 200
+
+
+def os_threading():
+    """threading/time as they were before eventlet monkey-patching."""
+    try:
+        from eventlet import patcher
+        return patcher.original('threading'), patcher.original('time')
+    except ImportError:
+        import threading
+        return threading, time
+
+
+def _slug(path):
+    return re.sub(r'[^A-Za-z0-9]+', '_', path).strip('_')[:60] or 'root'
+
+
+def profile_dir():
+    return PROFILE_DIR or os.path.join(tempfile.gettempdir(), 'npc-profiles')
+
+
+class _Capture:
+    __slots__ = ('frame', 'method', 'path', 'sampled', 'samples', 'started', 'ms')
+
+    def __init__(self, frame, method, path, sampled):
+        self.frame = frame
+        self.method = method
+        self.path = path
+        self.sampled = sampled
+        self.samples = Counter()
+        self.started = time.time()
+        self.ms = 0.0
+
+
+class RequestProfiler:
+    def __init__(self, app, sample_rate=PROFILE_SAMPLE_RATE, slow_ms=PROFILE_SLOW_MS,
+                 interval_ms=PROFILE_INTERVAL_MS, directory=None, max_files=PROFILE_MAX_FILES):
+        self.app = app
+        self.sample_rate = max(0.0, min(1.0, sample_rate))
+        self.slow_ms = slow_ms
+        self.interval = max(1, interval_ms) / 1000.0
+        self.directory = directory or profile_dir()
+        self.max_files = max(1, max_files)
+        self._active = {}      # id(wsgi frame) -> _Capture
+        self._finished = deque()
+        self._labels = {}      # code object -> frame label
+        self._threading, self._time = os_threading()
+        self._thread = None
+        self._thread_lock = self._threading.Lock()
+        self.counters = {'requests': 0, 'kept': 0, 'empty': 0, 'written': 0, 'write_errors': 0}
+
+    def __call__(self, environ, start_response):
+        self._ensure_thread()
+        frame = sys._getframe()
+        cap = _Capture(frame, environ.get('REQUEST_METHOD', ''), environ.get('PATH_INFO', ''),
+                       self.sample_rate > 0 and random.random() < self.sample_rate)
+        self._active[id(frame)] = cap
+        started = time.perf_counter()
+        try:
+            return self.app(environ, start_response)
+        finally:
+            del self._active[id(frame)]
+            cap.ms = (time.perf_counter() - started) * 1000.0
+            cap.frame = None
+            self.counters['requests'] += 1
+            if cap.sampled or (self.slow_ms > 0 and cap.ms >= self.slow_ms):
+                if cap.samples:
+                    self.counters['kept'] += 1
+                    self._finished.append(cap)
+                else:
+                    # too short for a single sample
+                    self.counters['empty'] += 1
+
+    # ----- sampler thread -----
+    def _ensure_thread(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._thread_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = self._threading.Thread(target=self._run, name='request-profiler', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        me = self._threading.get_ident()
+        while True:
+            self._time.sleep(self.interval)
+            try:
+                active = self._active.copy()
+                if active:
+                    self._sample(active, me)
+                while self._finished:
+                    self._write(self._finished.popleft())
+            except Exception as e:
+                print(f"request profiler: {e}")
+
+    def _label(self, code):
+        label = self._labels.get(code)
+        if label is None:
+            label = self._labels[code] = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+        return label
+
+    def _sample(self, active, me):
+        for ident, frame in sys._current_frames().items():
+            if ident == me:
+                continue
+            stack = []
+            f = frame
+            while f is not None:
+                cap = active.get(id(f))
+                if cap is not None:
+                    if len(stack) > MAX_DEPTH:
+                        stack = stack[:MAX_DEPTH]
+                    cap.samples[';'.join(reversed(stack))] += 1
+                    break
+                stack.append(self._label(f.f_code))
+                f = f.f_back
+
+    def _write(self, cap):
+        reason = 'slow' if self.slow_ms > 0 and cap.ms >= self.slow_ms else 'sampled'
+        stamp = time.strftime('%Y%m%dT%H%M%S', time.gmtime(cap.started)) + f'{cap.started % 1:.3f}'[1:]
+        name = f'{stamp}-{int(cap.ms)}ms-{reason}-{cap.method}-{_slug(cap.path)}{SUFFIX}'
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(os.path.join(self.directory, name), 'w') as out:
+                for stack, n in cap.samples.most_common():
+                    out.write(f'{stack or cap.path} {n}\n')
+            self.counters['written'] += 1
+            self._trim()
+        except OSError as e:
+            self.counters['write_errors'] += 1
+            print(f"request profiler: could not write {name}: {e}")
+
+    def _trim(self):
+        names = sorted(n for n in os.listdir(self.directory) if n.endswith(SUFFIX))
+        for old in names[:-self.max_files]:
+            try:
+                os.remove(os.path.join(self.directory, old))
+            except OSError:
+                pass
+
+    def stats(self):
+        return {**self.counters, 'active': len(self._active), 'pending_writes': len(self._finished),
+                'sample_rate': self.sample_rate, 'slow_ms': self.slow_ms}
+
+
+def list_profiles(directory=None):
+    """Profiles on disk, newest first: name, bytes and what the name encodes."""
+    directory = directory or profile_dir()
+    try:
+        names = sorted((n for n in os.listdir(directory) if n.endswith(SUFFIX)), reverse=True)
+    except OSError:
+        return []
+    out = []
+    for n in names:
+        parts = n[:-len(SUFFIX)].split('-', 4)
+        try:
+            size = os.path.getsize(os.path.join(directory, n))
+        except OSError:
+            continue
+        item = {'name': n, 'bytes': size}
+        if len(parts) == 5:
+            item.update(time=parts[0], ms=int(parts[1].rstrip('ms') or 0), reason=parts[2], method=parts[3], path=parts[4])
+        out.append(item)
+    return out
+
+
+def init_profiler(app):
+    """Wrap app.wsgi_app with RequestProfiler when PROFILE_SAMPLE_RATE or
+    PROFILE_SLOW_MS is set. Install it before any outer middleware (static
+    assets, Socket.IO) so only requests that reach Flask are profiled."""
+    if PROFILE_SAMPLE_RATE <= 0 and PROFILE_SLOW_MS <= 0:
+        return None
+    profiler = RequestProfiler(app.wsgi_app)
+    app.wsgi_app = profiler
+    return profiler
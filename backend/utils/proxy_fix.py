@@ -0,0 +1,19 @@
+"""Honour X-Forwarded-* headers only from a known number of proxies.
+
+Without a proxy in front those headers come straight from the client, so
+nothing reads them directly. With PROXY_FIX_HOPS set, werkzeug's ProxyFix
+takes the values the nearest proxies appended and rewrites the WSGI environ,
+and request.host_url / request.remote_addr reflect the public request.
+"""
+from werkzeug.middleware.proxy_fix import ProxyFix
+from ..config import PROXY_FIX_HOPS
+
+
+def init_proxy_fix(app):
+    """Wrap app.wsgi_app in ProxyFix when PROXY_FIX_HOPS > 0."""
+    if PROXY_FIX_HOPS <= 0:
+        return None
+    fix = ProxyFix(app.wsgi_app, x_for=PROXY_FIX_HOPS, x_proto=PROXY_FIX_HOPS,
+                   x_host=PROXY_FIX_HOPS, x_port=PROXY_FIX_HOPS)
+    app.wsgi_app = fix
+    return fix
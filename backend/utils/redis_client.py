@@ -0,0 +1,25 @@
+import time
+import redis
+from ..config import REDIS_URL, REDIS_SOCKET_TIMEOUT
+
+_client = None
+_down_until = 0.0
+# after a failed call, skip Redis for this long instead of paying the timeout per request
+RETRY_AFTER = 5.0
+
+
+def get_redis():
+    """Shared Redis client for caching, or None when Redis isn't configured
+    or recently failed. Callers must treat Redis as optional."""
+    global _client
+    if not REDIS_URL or time.monotonic() < _down_until:
+        return None
+    if _client is None:
+        _client = redis.from_url(REDIS_URL, socket_timeout=REDIS_SOCKET_TIMEOUT,
+                                 socket_connect_timeout=REDIS_SOCKET_TIMEOUT, health_check_interval=30)
+    return _client
+
+
+def mark_redis_down():
+    global _down_until
+    _down_until = time.monotonic() + RETRY_AFTER
@@ -0,0 +1,178 @@
+"""Serve the built SPA (frontend/dist) in front of Flask.
+
+StaticAssets is WSGI middleware: it scans the build directory once at
+startup into a path -> file table, so an asset request costs a dict lookup
+and a sendfile (the server's `wsgi.file_wrapper`) instead of a trip through
+Flask routing, request hooks and send_from_directory. Anything not in the
+table (API calls, socket.io, client-side routes) goes to the app unchanged.
+
+Variants written at build time by tools/precompress_static.py (`x.js.br`,
+`x.js.gz`, see precompress()) are served to clients that accept them; a
+variant older than its source is ignored. Vite writes content-hashed
+bundles under `assets/`, so those are cached for a year as immutable;
+index.html and the other unhashed files get STATIC_MAX_AGE so a deploy is
+picked up quickly, with an ETag for cheap revalidation.
+
+The table is built once: restart (i.e. deploy) after rebuilding the SPA.
+"""
+import gzip
+import mimetypes
+import os
+from functools import lru_cache
+from werkzeug.http import http_date, parse_accept_header, parse_etags
+from werkzeug.wsgi import wrap_file
+from ..config import STATIC_ASSET_MODE, STATIC_MAX_AGE
+
+try:
+    import brotli
+except ImportError:  # optional; gzip variants only
+    brotli = None
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+# index.html (and deep links the app answers with it)
+INDEX_CACHE_CONTROL = f'public, max-age={STATIC_MAX_AGE}'
+HASHED_DIR = 'assets'
+# extensions worth precompressing (images and fonts are compressed already)
+COMPRESSIBLE = ('.html', '.js', '.mjs', '.css', '.json', '.map', '.svg', '.txt', '.xml', '.wasm')
+PRECOMPRESS_MIN_BYTES = 256
+_VARIANTS = (('br', '.br'), ('gzip', '.gz'))
+_BLOCK_SIZE = 64 * 1024
+
+
+def _content_type(path):
+    ctype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    if ctype.startswith('text/') or ctype in ('application/javascript', 'application/json', 'image/svg+xml'):
+        ctype += '; charset=utf-8'
+    return ctype
+
+
+@lru_cache(maxsize=64)
+def _negotiate(accept_encoding, available):
+    if not accept_encoding or not available:
+        return None
+    return parse_accept_header(accept_encoding).best_match(available)
+
+
+class _Asset:
+    __slots__ = ('path', 'size', 'headers', 'etag', 'variants')
+
+    def __init__(self, path, rel, max_age):
+        st = os.stat(path)
+        self.path = path
+        self.size = st.st_size
+        self.etag = f'{int(st.st_mtime):x}-{st.st_size:x}'
+        immutable = rel.split('/', 1)[0] == HASHED_DIR
+        self.headers = [
+            ('Content-Type', _content_type(path)),
+            ('Cache-Control', IMMUTABLE if immutable else f'public, max-age={max_age}'),
+            ('Last-Modified', http_date(st.st_mtime)),
+            ('ETag', f'W/"{self.etag}"'),
+        ]
+        self.variants = {}
+        for encoding, suffix in _VARIANTS:
+            try:
+                vst = os.stat(path + suffix)
+            except OSError:
+                continue
+            if vst.st_mtime >= st.st_mtime:
+                self.variants[encoding] = (path + suffix, vst.st_size)
+        if self.variants:
+            self.headers.append(('Vary', 'Accept-Encoding'))
+
+
+class StaticAssets:
+    def __init__(self, app, root, max_age=STATIC_MAX_AGE):
+        self.app = app
+        self.root = os.path.realpath(root)
+        self.max_age = max_age
+        self.files = self._scan()
+        self.served = 0
+
+    def _scan(self):
+        files = {}
+        for dirpath, _dirs, names in os.walk(self.root):
+            for name in names:
+                if name.endswith(('.gz', '.br')):
+                    continue
+                path = os.path.join(dirpath, name)
+                rel = os.path.relpath(path, self.root).replace(os.sep, '/')
+                files['/' + rel] = _Asset(path, rel, self.max_age)
+        if '/index.html' in files:
+            files['/'] = files['/index.html']
+        return files
+
+    def __call__(self, environ, start_response):
+        if environ['REQUEST_METHOD'] in ('GET', 'HEAD'):
+            asset = self.files.get(environ.get('PATH_INFO') or '/')
+            if asset is not None:
+                return self._serve(asset, environ, start_response)
+        return self.app(environ, start_response)
+
+    def _serve(self, asset, environ, start_response):
+        self.served += 1
+        inm = environ.get('HTTP_IF_NONE_MATCH')
+        if inm and parse_etags(inm).contains_weak(asset.etag):
+            start_response('304 Not Modified', [h for h in asset.headers if h[0] != 'Content-Type'])
+            return []
+        encoding = _negotiate(environ.get('HTTP_ACCEPT_ENCODING'), tuple(asset.variants))
+        path, size = asset.variants[encoding] if encoding else (asset.path, asset.size)
+        try:
+            f = open(path, 'rb')
+        except OSError:
+            # removed since startup; let the app answer
+            return self.app(environ, start_response)
+        headers = asset.headers + [('Content-Length', str(size))]
+        if encoding:
+            headers.append(('Content-Encoding', encoding))
+        start_response('200 OK', headers)
+        if environ['REQUEST_METHOD'] == 'HEAD':
+            f.close()
+            return []
+        return wrap_file(environ, f, _BLOCK_SIZE)
+
+    def stats(self):
+        return {'files': len(self.files), 'precompressed': sum(1 for a in self.files.values() if a.variants),
+                'served': self.served}
+
+
+def init_static_assets(app):
+    """Put StaticAssets in front of app.wsgi_app when app has a built
+    static folder (STATIC_ASSET_MODE=flask leaves serving to Flask)."""
+    folder = app.static_folder
+    if STATIC_ASSET_MODE != 'wsgi' or not folder or not os.path.isdir(folder):
+        return None
+    assets = StaticAssets(app.wsgi_app, folder)
+    app.wsgi_app = assets
+    return assets
+
+
+def precompress(root, force=False):
+    """Write .gz (and .br when brotli is installed) next to every
+    compressible file under root; returns {path: [encodings written]}.
+    Up-to-date variants are kept unless force is set."""
+    written = {}
+    for dirpath, _dirs, names in os.walk(root):
+        for name in names:
+            if not name.endswith(COMPRESSIBLE):
+                continue
+            path = os.path.join(dirpath, name)
+            st = os.stat(path)
+            if st.st_size < PRECOMPRESS_MIN_BYTES:
+                continue
+            with open(path, 'rb') as f:
+                data = f.read()
+            for encoding, suffix in _VARIANTS:
+                if encoding == 'br' and brotli is None:
+                    continue
+                target = path + suffix
+                if not force and os.path.exists(target) and os.stat(target).st_mtime >= st.st_mtime:
+                    continue
+                body = brotli.compress(data, quality=11) if encoding == 'br' else gzip.compress(data, compresslevel=9, mtime=0)
+                if len(body) >= len(data):
+                    if os.path.exists(target):
+                        os.remove(target)
+                    continue
+                with open(target, 'wb') as f:
+                    f.write(body)
+                written.setdefault(path, []).append(encoding)
+    return written
@@ -1,6 +1,9 @@
 import { io } from 'socket.io-client'
 
 let socket = null
+let heartbeatTimer = null
+// keep in step with the backend's PRESENCE_HEARTBEAT_S
+const HEARTBEAT_MS = 15000
 
 export function connectSocket(){
   if (socket) return socket
@@ -9,14 +12,26 @@ export function connectSocket(){
   // Attach auth token so the server can validate socket connections if it wishes.
   let token = null
   try{ token = typeof window !== 'undefined' ? localStorage.getItem('token') : null }catch(e){}
-  const opts = { transports: ['websocket'] }
-  if (token) opts.auth = { token }
+  // batch: this client understands the server's coalesced `batch` frames (below)
+  const opts = { transports: ['websocket'], auth: { batch: true } }
+  if (token) opts.auth.token = token
   socket = io(url || window.location.origin, opts)
   // debug logging to aid in diagnosing connection issues
   socket.on('connect_error', (err) => {
     try{ console.warn('Socket connect_error', err && err.message ? err.message : err) }catch(e){}
   })
   socket.on('connect', () => { try{ console.debug('Socket connected', socket.id) }catch(e){} })
+  // presence: the server drops sockets that stop heartbeating from room member lists
+  if (!heartbeatTimer) heartbeatTimer = setInterval(() => { if (socket && socket.connected) socket.emit('heartbeat') }, HEARTBEAT_MS)
+  // the server coalesces bursts into one `batch` frame: [{event, data}, ...];
+  // replay each item to whatever listeners are registered for its event
+  socket.on('batch', (items) => {
+    for (const item of (items || [])){
+      for (const fn of socket.listeners(item.event)){
+        try{ fn(item.data) }catch(e){}
+      }
+    }
+  })
   return socket
 }
 
@@ -28,7 +43,32 @@ export function onCharacterUpdated(cb){
   return () => s.off('character_updated')
 }
 
+// payload: { campaign_id, users: [{ id, username }] }; the join ack carries the
+// same list as `presence` for the initial render
+export function onPresence(cb){
+  const s = connectSocket()
+  const handler = (payload) => { try{ cb && cb(payload) }catch(e){} }
+  s.on('presence', handler)
+  return () => s.off('presence', handler)
+}
+
+// payload: { campaign_id, user_id, username, typing }
+export function onTyping(cb){
+  const s = connectSocket()
+  const handler = (payload) => { try{ cb && cb(payload) }catch(e){} }
+  s.on('typing', handler)
+  return () => s.off('typing', handler)
+}
+
+// call on keystrokes; the server throttles repeats and clears the flag by itself
+// a few seconds after the last one
+export function sendTyping(campaignId, typing = true){
+  const s = connectSocket()
+  s.emit('typing', { campaign: campaignId, campaign_id: campaignId, typing })
+}
+
 export function disconnectSocket(){
+  if (heartbeatTimer){ clearInterval(heartbeatTimer); heartbeatTimer = null }
   if (!socket) return
   socket.disconnect()
   socket = null
@@ -12,7 +12,8 @@ const initial = [
 
 export default function ChatLog(){
   const token = getToken()
-  const payload = token ? parseJwt(token) : null
+  // parse once per token: the socket effect below depends on it
+  const payload = React.useMemo(() => token ? parseJwt(token) : null, [token])
   const speaks = payload?.speaks || []
 
   const [msgs, setMsgs] = useState(initial)
@@ -20,6 +21,11 @@ export default function ChatLog(){
   const listRef = React.useRef(null)
   const [bottomPad, setBottomPad] = React.useState(0)
   const socketRef = React.useRef(null)
+  const sockModRef = React.useRef(null)
+  // pushed by the server on join/leave/disconnect; replaces polling for who is here
+  const [online, setOnline] = useState([])
+  const [typers, setTypers] = useState({})
+  const typingSentRef = React.useRef({flag: false, at: 0})
 
   function formatTime(ts){
     if (!ts) return ''
@@ -75,12 +81,16 @@ export default function ChatLog(){
             }))])
           }
 
-          // join socket room using campaignId
-          if (socketRef.current && campaignId) {
+          // join socket room for the campaign; the ack carries the member list
+          if (socketRef.current && campaign) {
             try{
               socketRef.current.emit('leave', {campaign: socketRef.current.__joinedCampaign})
-              socketRef.current.emit('join', {campaign: campaignId})
-              socketRef.current.__joinedCampaign = campaignId
+              setOnline([])
+              setTypers({})
+              socketRef.current.emit('join', {campaign}, (ack)=>{
+                if (ack && ack.ok) setOnline(ack.presence || [])
+              })
+              socketRef.current.__joinedCampaign = campaign
             }catch(e){/* ignore socket errors */}
           }
         }catch(err){
@@ -93,12 +103,25 @@ export default function ChatLog(){
     }
 
     // connect socket on mount
+    let offPresence = null
+    let offTyping = null
     if (typeof window !== 'undefined') {
       (async ()=>{
         try{
           const sockMod = await import('../../api/socket')
           const sock = sockMod.connectSocket()
           socketRef.current = sock
+          sockModRef.current = sockMod
+          offPresence = sockMod.onPresence((p)=> setOnline((p && p.users) || []))
+          offTyping = sockMod.onTyping((p)=>{
+            if (!p) return
+            setTypers(prev => {
+              const next = {...prev}
+              if (p.typing) next[p.user_id] = p.username || 'Someone'
+              else delete next[p.user_id]
+              return next
+            })
+          })
           // on receiving campaign messages, append if not duplicate
           if (typeof sock.on === 'function') {
             sock.on('campaign_message', (msg)=>{
@@ -118,6 +141,8 @@ export default function ChatLog(){
         window.removeEventListener('npcchatter:roll', onRoll)
         window.removeEventListener('npcchatter:campaign-changed', onCampaignChange)
       }
+      if (offPresence) offPresence()
+      if (offTyping) offTyping()
       // disconnect socket
       try{
         if (socketRef.current) {
@@ -156,8 +181,22 @@ export default function ChatLog(){
     }
   }, [])
 
+  // tell the room we are typing: on change of state, and again every few
+  // seconds while it lasts so the server does not time the flag out
+  function notifyTyping(value){
+    const activeId = typeof window !== 'undefined' ? localStorage.getItem('activeCampaignId') : null
+    if (!activeId || !sockModRef.current) return
+    const flag = value.trim().length > 0
+    const now = Date.now()
+    const last = typingSentRef.current
+    if (flag === last.flag && (!flag || now - last.at < 2000)) return
+    typingSentRef.current = {flag, at: now}
+    try{ sockModRef.current.sendTyping(activeId, flag) }catch(e){}
+  }
+
   function send(){
     if (!text.trim()) return
+    notifyTyping('')
     const avatar = payload?.picture || null
     const body = text.trim()
     setText('')
@@ -187,6 +226,11 @@ export default function ChatLog(){
   return (
     <div className="card bg-base-200 px-2 py-3 flex flex-col h-full min-h-0">
       <div className="font-semibold mb-2">Chat</div>
+      {online.length > 0 && (
+        <div className="text-xs text-muted mb-1 truncate" title={online.map(u => u.username).join(', ')}>
+          Online: {online.map(u => u.username || `#${u.id}`).join(', ')}
+        </div>
+      )}
 
       <div ref={listRef} className="flex-1 space-y-0.5 overflow-auto min-h-0" style={{paddingBottom: bottomPad}}>
         {msgs.map(m => (
@@ -263,10 +307,17 @@ export default function ChatLog(){
         ))}
       </div>
 
+      {(() => {
+        const names = Object.entries(typers).filter(([id]) => String(id) !== String(payload?.sub)).map(([, name]) => name)
+        return names.length > 0 ? (
+          <div className="text-xs text-muted italic mt-1">{names.join(', ')} {names.length === 1 ? 'is' : 'are'} typing…</div>
+        ) : null
+      })()}
+
       <div className="mt-2 flex items-center space-x-2">
         <input
           value={text}
-          onChange={e=>setText(e.target.value)}
+          onChange={e=>{ setText(e.target.value); notifyTyping(e.target.value) }}
           onKeyDown={(e)=>{
             if (e.key === 'Enter' && !e.shiftKey) {
               e.preventDefault()
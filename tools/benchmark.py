@@ -0,0 +1,435 @@
+#!/usr/bin/env python3
+"""Benchmark the REST + Socket.IO surface offline and diff against a baseline.
+
+Starts the same local stack as tools/multiworker_harness.py (a Redis
+stand-in, a temporary SQLite database and one or more eventlet workers
+running `backend.app:app`, the production entry point) and drives it with
+N campaigns x M players, one thread per player:
+
+- setup: register, login, create or join the campaign over HTTP, then
+  connect a websocket and `join` the room (timed until the ack);
+- workload: each player posts --rounds chat messages and autosaves its
+  character sheet once per round, fetching the message history every
+  --history-every rounds;
+- fan-out: for every posted message, how long until each room member's
+  socket received the `campaign_message` event (time from the POST).
+
+Reported per operation: count, errors, mean, p50/p95/p99 (ms), plus the
+workload throughput and the workers' hub lag from /api/metrics. --out
+writes the result as JSON; --baseline compares a run against such a file
+and flags latencies (and throughput) more than --tolerance percent worse.
+Timings include the client threads, so compare runs made on the same
+machine with the same options.
+
+Usage:
+  python tools/benchmark.py --campaigns 4 --players 5 --out bench.json
+  python tools/benchmark.py --campaigns 4 --players 5 --baseline bench.json
+"""
+import os
+import sys
+import json
+import time
+import math
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+import http.client
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from redis_standin import RedisStandin  # noqa: E402
+from multiworker_harness import SocketClient, worker_command, wait_healthy, _free_port  # noqa: E402
+
+PASSWORD = 'Password123!'
+METRICS_TOKEN = 'bench-metrics'
+PERCENTILES = (50, 95, 99)
+# operations compared against a baseline, in report order
+OPS = ('register', 'login', 'create_campaign', 'join', 'socket_join', 'message_post', 'character_save', 'history', 'fanout')
+
+
+class HttpClient:
+    """JSON over one keep-alive connection, as a browser tab would use."""
+
+    def __init__(self, base, timeout=30):
+        parts = urlsplit(base)
+        self.host, self.port, self.timeout = parts.hostname, parts.port, timeout
+        self.conn = None
+        self.token = None
+
+    def request(self, method, path, data=None):
+        body = json.dumps(data) if data is not None else None
+        headers = {'Content-Type': 'application/json'}
+        if self.token:
+            headers['Authorization'] = f'Bearer {self.token}'
+        for attempt in (0, 1):
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                self.conn.request(method, path, body=body, headers=headers)
+                resp = self.conn.getresponse()
+                raw = resp.read()
+                break
+            except (http.client.HTTPException, OSError):
+                # the server closed an idle keep-alive connection; retry once
+                self.conn.close()
+                self.conn = None
+                if attempt:
+                    raise
+        try:
+            payload = json.loads(raw.decode('utf8') or 'null')
+        except ValueError:
+            payload = raw.decode('utf8', 'replace')[:300]
+        return resp.status, payload
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+
+
+class Recorder:
+    def __init__(self):
+        self.samples = {}
+        self.errors = {}
+        self._lock = threading.Lock()
+
+    def add(self, op, seconds):
+        with self._lock:
+            self.samples.setdefault(op, []).append(seconds)
+
+    def error(self, op, detail):
+        with self._lock:
+            first = op not in self.errors
+            self.errors[op] = self.errors.get(op, 0) + 1
+        if first:
+            print(f'{op} failed: {detail}')
+
+    def call(self, op, client, method, path, data=None, expect=(200, 201)):
+        started = time.perf_counter()
+        try:
+            status, payload = client.request(method, path, data)
+        except Exception as e:
+            self.error(op, e)
+            return None
+        self.add(op, time.perf_counter() - started)
+        if status not in expect:
+            self.error(op, f'{status} {payload}')
+            return None
+        return payload
+
+
+def percentile(sorted_values, pct):
+    # nearest rank
+    if not sorted_values:
+        return None
+    k = max(0, math.ceil(pct / 100.0 * len(sorted_values)) - 1)
+    return sorted_values[k]
+
+
+def summarize(values, errors=0):
+    values = sorted(values)
+    out = {'count': len(values), 'errors': errors}
+    if values:
+        out['mean_ms'] = round(sum(values) / len(values) * 1000.0, 3)
+        for pct in PERCENTILES:
+            out[f'p{pct}_ms'] = round(percentile(values, pct) * 1000.0, 3)
+    return out
+
+
+class Player:
+    def __init__(self, campaign, index, base):
+        self.campaign = campaign
+        self.index = index
+        self.base = base
+        self.name = f'bench-c{campaign}-p{index}'
+        self.http = HttpClient(base)
+        self.socket = None
+        self.cid = None
+        self.posted = {}   # message text -> perf_counter when the POST started
+
+    @property
+    def owner(self):
+        return self.index == 0
+
+
+def setup_player(p, rec):
+    res = rec.call('register', p.http, 'POST', '/api/auth/register',
+                   {'email': f'{p.name}@example.com', 'username': p.name, 'password': PASSWORD})
+    if res is None:
+        return False
+    res = rec.call('login', p.http, 'POST', '/api/auth/login', {'email': f'{p.name}@example.com', 'password': PASSWORD})
+    if res is None:
+        return False
+    p.http.token = res['token']
+    return True
+
+
+def join_player(p, rec):
+    if not p.owner and rec.call('join', p.http, 'POST', f'/api/campaigns/{p.cid}/join') is None:
+        return False
+    try:
+        p.socket = SocketClient(p.base, p.http.token)
+        started = time.perf_counter()
+        ack = p.socket.call('join', {'campaign': p.cid, 'campaign_id': p.cid})
+        rec.add('socket_join', time.perf_counter() - started)
+    except Exception as e:
+        rec.error('socket_join', e)
+        return False
+    if not (ack or {}).get('ok'):
+        rec.error('socket_join', ack)
+        return False
+    return True
+
+
+def run_player(p, rec, args):
+    inventory = [{'name': f'item {i}', 'qty': i} for i in range(args.inventory)]
+    for r in range(args.rounds):
+        text = f'{p.name} round {r}'
+        p.posted[text] = time.perf_counter()
+        rec.call('message_post', p.http, 'POST', f'/api/campaigns/{p.cid}/messages', {'text': text})
+        # every save changes the sheet so none is skipped as a no-op
+        sheet = {'name': p.name, 'maxHp': 10 + r, 'portrait': '', 'attributes': {'str': 10, 'dex': r},
+                 'skills': {'stealth': True}, 'skillScores': {'stealth': r}, 'inventory': inventory, 'campaign_id': p.cid}
+        rec.call('character_save', p.http, 'PUT', '/api/users/me/character', sheet)
+        if args.history_every and (r + 1) % args.history_every == 0:
+            rec.call('history', p.http, 'GET', f'/api/campaigns/{p.cid}/messages')
+        if args.think_ms:
+            time.sleep(args.think_ms / 1000.0)
+
+
+def collect_fanout(campaigns, rec, wait):
+    """Record delivery time of every message to every member of its room;
+    returns how many deliveries never arrived."""
+    expected = {}
+    for players in campaigns:
+        texts = {t: at for p in players for t, at in p.posted.items()}
+        for p in players:
+            if p.socket is not None:
+                expected[p] = texts
+    deadline = time.monotonic() + wait
+    while time.monotonic() < deadline:
+        if all(len(p.socket.received('campaign_message')) >= len(texts) for p, texts in expected.items()):
+            break
+        time.sleep(0.1)
+    missing = 0
+    for p, texts in expected.items():
+        seen = {}
+        for msg, at in p.socket.received_at('campaign_message'):
+            seen.setdefault((msg or {}).get('text'), at)
+        for text, posted in texts.items():
+            if text in seen:
+                rec.add('fanout', seen[text] - posted)
+            else:
+                missing += 1
+    return missing
+
+
+def scrape_metrics(bases):
+    """Hub lag and stalls per worker (see utils.hub_watchdog)."""
+    out = []
+    for base in bases:
+        parts = urlsplit(base)
+        conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=5)
+        try:
+            conn.request('GET', '/api/metrics', headers={'Authorization': f'Bearer {METRICS_TOKEN}'})
+            text = conn.getresponse().read().decode('utf8')
+        except Exception:
+            out.append({})
+            continue
+        finally:
+            conn.close()
+        values = {}
+        for line in text.splitlines():
+            if line.startswith('npc_hub_') and not line.startswith('npc_hub_lag_seconds_bucket'):
+                key, _, value = line.rpartition(' ')
+                values[key[len('npc_'):]] = float(value)
+        out.append(values)
+    return out
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def compare(result, baseline, tolerance):
+    """Print result against baseline; returns the list of regressions."""
+    regressions = []
+    print(f"\nagainst baseline {baseline['meta'].get('git') or '?'} ({baseline['meta'].get('started')}):")
+    differs = [k for k in ('campaigns', 'players', 'rounds', 'history_every', 'inventory', 'think_ms', 'workers', 'server', 'write_mode')
+               if baseline['meta'].get(k) != result['meta'][k]]
+    if differs:
+        print(f"  note: baseline was run with different {', '.join(differs)}")
+    for op in OPS:
+        cur, base = result['ops'].get(op), baseline['ops'].get(op)
+        if not cur or not base or 'p50_ms' not in cur or 'p50_ms' not in base:
+            continue
+        cells = []
+        for pct in PERCENTILES:
+            key = f'p{pct}_ms'
+            change = (cur[key] - base[key]) / base[key] * 100.0 if base[key] else 0.0
+            flag = change > tolerance
+            if flag:
+                regressions.append(f'{op} {key}')
+            cells.append(f'{key[:-3]} {base[key]:.1f}->{cur[key]:.1f} ({change:+.0f}%){" !" if flag else ""}')
+        print(f'  {op:<16}' + '  '.join(cells))
+    cur, base = result['throughput_ops_s'], baseline.get('throughput_ops_s')
+    if base:
+        change = (cur - base) / base * 100.0
+        flag = change < -tolerance
+        if flag:
+            regressions.append('throughput')
+        print(f'  {"throughput":<16}{base:.1f}->{cur:.1f} ops/s ({change:+.0f}%){" !" if flag else ""}')
+    print(f"{len(regressions)} regression(s) beyond {tolerance:.0f}%" + (f": {', '.join(regressions)}" if regressions else ''))
+    return regressions
+
+
+def report(result):
+    meta = result['meta']
+    print(f"\n{meta['campaigns']} campaigns x {meta['players']} players, {meta['rounds']} rounds, "
+          f"{meta['workers']} worker(s), write mode {meta['write_mode']}")
+    print(f"{'operation':<16}{'count':>7}{'errors':>8}{'mean':>9}{'p50':>9}{'p95':>9}{'p99':>9}  (ms)")
+    for op in OPS:
+        s = result['ops'].get(op)
+        if not s:
+            continue
+        cols = ''.join(f"{s[k]:>9.1f}" if k in s else f"{'-':>9}" for k in ('mean_ms', 'p50_ms', 'p95_ms', 'p99_ms'))
+        print(f"{op:<16}{s['count']:>7}{s['errors']:>8}{cols}")
+    print(f"workload: {result['workload_ops']} requests in {result['workload_seconds']:.2f}s "
+          f"= {result['throughput_ops_s']:.1f} ops/s; fan-out deliveries missing: {result['fanout_missing']}")
+    for i, hub in enumerate(result['hub']):
+        if hub:
+            print(f"worker {i}: hub stalls {int(hub.get('hub_stalls', 0))}, max lag {hub.get('hub_max_lag_ms', 0):.0f} ms")
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    p.add_argument('--campaigns', type=int, default=4)
+    p.add_argument('--players', type=int, default=5, help='players per campaign')
+    p.add_argument('--rounds', type=int, default=10, help='messages and saves per player')
+    p.add_argument('--history-every', type=int, default=5, help='fetch history every N rounds (0: never)')
+    p.add_argument('--inventory', type=int, default=20, help='inventory items in each saved sheet')
+    p.add_argument('--think-ms', type=float, default=0, help='pause between rounds')
+    p.add_argument('--workers', type=int, default=1)
+    p.add_argument('--server', default='socketio', choices=('socketio', 'gunicorn'))
+    p.add_argument('--write-mode', default='sync', choices=('sync', 'group', 'async'))
+    p.add_argument('--out', help='write the result as JSON here')
+    p.add_argument('--baseline', help='JSON result of an earlier run to compare against')
+    p.add_argument('--tolerance', type=float, default=25.0, help='percent worse than baseline that counts as a regression')
+    p.add_argument('--fail-on-regression', action='store_true', help='exit 1 when the baseline comparison finds regressions')
+    p.add_argument('--verbose', action='store_true', help='show worker output')
+    args = p.parse_args()
+
+    redis_srv = RedisStandin().start()
+    tmp = tempfile.mkdtemp(prefix='npc-bench-')
+    env = dict(os.environ,
+               DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'bench.db')}",
+               REDIS_URL=redis_srv.url,
+               MULTI_WORKER='true' if args.workers > 1 else 'false',
+               APP_ENV='production',
+               JWT_SECRET='bench-secret',
+               METRICS_TOKEN=METRICS_TOKEN,
+               SQLITE_TUNING='true',
+               MESSAGE_WRITE_MODE=args.write_mode,
+               PYTHONPATH=ROOT)
+    out = None if args.verbose else subprocess.DEVNULL
+    subprocess.run([sys.executable, '-c', 'import backend.app'], cwd=ROOT, env=env, check=True, stdout=out, stderr=out)
+
+    procs, bases = [], []
+    campaigns = []
+    try:
+        for _ in range(args.workers):
+            port = _free_port()
+            procs.append(subprocess.Popen(worker_command(args.server, port), cwd=ROOT, env=env, stdout=out, stderr=out))
+            bases.append(f'http://127.0.0.1:{port}')
+        for base, proc in zip(bases, procs):
+            wait_healthy(base, proc)
+        print(f'{args.workers} worker(s) up, redis stand-in at {redis_srv.url}')
+
+        # players spread round-robin over the workers
+        n = 0
+        for c in range(args.campaigns):
+            players = []
+            for i in range(args.players):
+                players.append(Player(c, i, bases[n % len(bases)]))
+                n += 1
+            campaigns.append(players)
+        everyone = [pl for players in campaigns for pl in players]
+        rec = Recorder()
+        started_at = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+
+        with ThreadPoolExecutor(max_workers=len(everyone)) as pool:
+            ok = list(pool.map(lambda pl: setup_player(pl, rec), everyone))
+            if not all(ok):
+                raise RuntimeError('registration or login failed; see above')
+
+            def create(players):
+                owner = players[0]
+                res = rec.call('create_campaign', owner.http, 'POST', '/api/campaigns', {'name': f'Bench {owner.campaign}'})
+                for pl in players:
+                    pl.cid = res['id'] if res else None
+                return res is not None
+            if not all(pool.map(create, campaigns)):
+                raise RuntimeError('campaign creation failed; see above')
+            if not all(pool.map(lambda pl: join_player(pl, rec), everyone)):
+                raise RuntimeError('joining failed; see above')
+            time.sleep(0.5)
+            print(f'{len(everyone)} players joined {len(campaigns)} campaigns; running workload')
+
+            before = sum(len(rec.samples.get(op, [])) for op in ('message_post', 'character_save', 'history'))
+            t0 = time.perf_counter()
+            list(pool.map(lambda pl: run_player(pl, rec, args), everyone))
+            elapsed = time.perf_counter() - t0
+            ops = sum(len(rec.samples.get(op, [])) for op in ('message_post', 'character_save', 'history')) - before
+
+        missing = collect_fanout(campaigns, rec, wait=10)
+        result = {
+            'meta': {'started': started_at, 'git': git_revision(), 'python': platform.python_version(),
+                     'campaigns': args.campaigns, 'players': args.players, 'rounds': args.rounds,
+                     'history_every': args.history_every, 'inventory': args.inventory, 'think_ms': args.think_ms,
+                     'workers': args.workers, 'server': args.server, 'write_mode': args.write_mode},
+            'ops': {op: summarize(rec.samples.get(op, []), rec.errors.get(op, 0))
+                    for op in OPS if op in rec.samples or op in rec.errors},
+            'workload_ops': ops,
+            'workload_seconds': round(elapsed, 3),
+            'throughput_ops_s': round(ops / elapsed, 2) if elapsed else 0.0,
+            'fanout_missing': missing,
+            'hub': scrape_metrics(bases),
+        }
+        report(result)
+        if args.out:
+            with open(args.out, 'w') as f:
+                json.dump(result, f, indent=2)
+            print(f'wrote {args.out}')
+        failed = bool(rec.errors) or missing > 0
+        if args.baseline:
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+            if compare(result, baseline, args.tolerance) and args.fail_on_regression:
+                failed = True
+        return 1 if failed else 0
+    finally:
+        for players in campaigns:
+            for pl in players:
+                if pl.socket is not None:
+                    pl.socket.close()
+                pl.http.close()
+        for proc in procs:
+            proc.terminate()
+        for proc in procs:
+            try:
+                proc.wait(10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+        redis_srv.shutdown()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+"""Age message rows out of the campaign change log.
+
+Character and membership rows are already kept to one per entity; message
+rows grow with chat and are removed here once older than the retention
+window. Clients whose sync revision predates the removed rows get a full
+snapshot on their next GET /api/campaigns/<cid>/sync.
+
+Run against the same DATABASE_URL as the app, e.g. from a daily cron.
+
+Usage: python tools/compact_changelog.py [--days 30] [--campaign 1 --campaign 2]
+"""
+import os
+import sys
+import argparse
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+
+def main():
+    from backend.config import CHANGELOG_RETENTION_DAYS
+    p = argparse.ArgumentParser()
+    p.add_argument('--days', type=float, default=CHANGELOG_RETENTION_DAYS, help='keep message rows newer than this (default: CHANGELOG_RETENTION_DAYS)')
+    p.add_argument('--campaign', type=int, action='append', help='campaign id (repeatable); default: all campaigns')
+    args = p.parse_args()
+
+    from backend.services.changelog import compact
+    counts = compact(args.days * 86400, args.campaign)
+    for cid, n in sorted(counts.items()):
+        print(f'campaign {cid}: {n} message rows removed')
+    print(f'compacted {len(counts)} campaign(s)')
+
+
+if __name__ == '__main__':
+    main()
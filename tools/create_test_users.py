@@ -1,100 +1,246 @@
 #!/usr/bin/env python3
 """Create test users and have them join the Test Campaign.
 
+Each user is registered (or logged in when the email already exists) and
+then joins the shared Test Campaign. Users are provisioned by --concurrency
+threads, each holding one keep-alive connection, optionally capped at
+--rate users per second.
+
+With --bulk (and --admin-token, the server's ADMIN_TOKEN) users are
+instead sent --batch at a time to POST /api/admin/users/bulk, which hashes
+the shared password once and inserts them in batched transactions. The
+bulk endpoint only hands out tokens for accounts it created, so users that
+already existed are then logged in and joined one by one.
+
+Every finished user is appended to the --progress JSONL file (email,
+username, id, token, campaign, status); users already recorded there as
+done are skipped, so an interrupted run picks up where it stopped.
+
 Usage: python tools/create_test_users.py --count 3 --api https://npcchatter-backend.onrender.com
+       python tools/create_test_users.py --count 5000 --api http://127.0.0.1:5000 --concurrency 16 --rate 50
+       python tools/create_test_users.py --count 5000 --api http://127.0.0.1:5000 --bulk --admin-token "$ADMIN_TOKEN"
 """
 import sys
-import argparse
-import urllib.request
-import urllib.error
 import json
+import time
+import argparse
+import threading
+import http.client
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
 
-def _do_post(url, data=None, headers=None, timeout=10):
-    body = json.dumps(data).encode('utf8') if data is not None else None
-    req = urllib.request.Request(url, data=body, method='POST')
-    req.add_header('Content-Type', 'application/json')
-    if headers:
-        for k,v in headers.items(): req.add_header(k, v)
-    try:
-        with urllib.request.urlopen(req, timeout=timeout) as resp:
-            text = resp.read().decode('utf8')
-            return resp.status, text
-    except urllib.error.HTTPError as e:
+PASSWORD = 'Password123!'
+DONE = ('created', 'exists')
+
+
+class Api:
+    """JSON requests over one keep-alive connection per thread."""
+
+    def __init__(self, base, timeout=10):
+        parts = urlsplit(base)
+        self.scheme, self.host, self.port = parts.scheme, parts.hostname, parts.port
+        self.prefix = parts.path.rstrip('/')
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            cls = http.client.HTTPSConnection if self.scheme == 'https' else http.client.HTTPConnection
+            conn = self._local.conn = cls(self.host, self.port, timeout=self.timeout)
+        return conn
+
+    def post(self, path, data=None, token=None):
+        body = json.dumps(data) if data is not None else None
+        headers = {'Content-Type': 'application/json'}
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+        for attempt in (0, 1):
+            conn = self._conn()
+            try:
+                conn.request('POST', self.prefix + path, body=body, headers=headers)
+                resp = conn.getresponse()
+                text = resp.read().decode('utf8', 'replace')
+                break
+            except (http.client.HTTPException, OSError) as e:
+                # stale keep-alive connection: reconnect once
+                conn.close()
+                self._local.conn = None
+                if attempt:
+                    return None, str(e)
         try:
-            return e.code, e.read().decode('utf8')
-        except Exception:
-            return e.code, str(e)
-    except Exception as e:
-        return None, str(e)
+            return resp.status, json.loads(text)
+        except ValueError:
+            return resp.status, text
+
+
+class RateLimit:
+    """At most `rate` acquisitions per second across all threads (0: no limit)."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self.next_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            at = max(now, self.next_at)
+            self.next_at = at + self.interval
+        if at > now:
+            time.sleep(at - now)
+
+
+class Progress:
+    """Append-only JSONL record of provisioned users, shared by all threads."""
+
+    def __init__(self, path):
+        self.path = path
+        self.done = {}
+        self._lock = threading.Lock()
+        if path:
+            try:
+                with open(path) as f:
+                    for line in f:
+                        try:
+                            rec = json.loads(line)
+                        except ValueError:
+                            continue  # a line cut short by an interrupted run
+                        if rec.get('status') in DONE and rec.get('campaign') is not None:
+                            self.done[rec['email']] = rec
+            except FileNotFoundError:
+                pass
+        self._file = open(path, 'a') if path else None
 
-def register(api_base, email, username, password='Password123!'):
-    url = api_base.rstrip('/') + '/api/auth/register'
-    return _do_post(url, {'email': email, 'username': username, 'password': password})
+    def record(self, rec):
+        with self._lock:
+            if rec.get('status') in DONE and rec.get('campaign') is not None:
+                self.done[rec['email']] = rec
+            if self._file:
+                self._file.write(json.dumps(rec) + '\n')
+                self._file.flush()
 
-def join_test(api_base, token):
-    url = api_base.rstrip('/') + '/api/campaigns/test/join'
-    headers = {'Authorization': f'Bearer {token}'}
-    return _do_post(url, None, headers)
+    def close(self):
+        if self._file:
+            self._file.close()
+
+
+def _message(payload):
+    return payload.get('message', '') if isinstance(payload, dict) else str(payload)
+
+
+def login_and_join(api, rec, password=PASSWORD):
+    """Log an existing user in and join the Test Campaign."""
+    status, res = api.post('/api/auth/login', {'email': rec['email'], 'password': password})
+    if status != 200 or not isinstance(res, dict) or not res.get('token'):
+        return dict(rec, status='failed', step='login', code=status, error=_message(res)[:300])
+    rec = dict(rec, status='exists', id=(res.get('user') or {}).get('id'), token=res['token'])
+    return join(api, rec)
+
+
+def join(api, rec):
+    """Join the Test Campaign with rec's token."""
+    status, camp = api.post('/api/campaigns/test/join', token=rec['token'])
+    if status != 200 or not isinstance(camp, dict):
+        return dict(rec, status='failed', step='join', code=status, error=_message(camp)[:300])
+    rec['campaign'] = camp.get('id')
+    return rec
+
+
+def provision(api, email, username, password=PASSWORD):
+    """Register (or log in) one user and join the Test Campaign."""
+    rec = {'email': email, 'username': username}
+    status, res = api.post('/api/auth/register', {'email': email, 'username': username, 'password': password})
+    if status == 400 and 'email' in _message(res).lower():
+        return login_and_join(api, rec, password)
+    if status not in (200, 201) or not isinstance(res, dict) or not res.get('token'):
+        return dict(rec, status='failed', step='register', code=status, error=_message(res)[:300])
+    rec = dict(rec, status='created', id=(res.get('user') or {}).get('id'), token=res['token'])
+    return join(api, rec)
+
+
+def provision_bulk(api, users, admin_token, password=PASSWORD):
+    """Create users (a list of (email, username)) in one bulk request. Only
+    created users come back with a token and campaign."""
+    status, res = api.post('/api/admin/users/bulk', {
+        'users': [{'email': e, 'username': u, 'password': password} for e, u in users],
+        'join_test_campaign': True,
+    }, token=admin_token)
+    if status != 200 or not isinstance(res, dict):
+        return [{'email': e, 'username': u, 'status': 'failed', 'step': 'bulk', 'code': status, 'error': _message(res)[:300]}
+                for e, u in users]
+    return [dict(r, campaign=res.get('campaign_id')) if r['status'] == 'created' else r for r in res['users']]
 
-def login(api_base, email, password='Password123!'):
-    url = api_base.rstrip('/') + '/api/auth/login'
-    return _do_post(url, {'email': email, 'password': password})
 
 def main():
     p = argparse.ArgumentParser()
     p.add_argument('--count', type=int, default=3)
+    p.add_argument('--start', type=int, default=1, help='number of the first user (testuser<start>)')
+    p.add_argument('--prefix', type=str, default='testuser')
     p.add_argument('--api', type=str, default='https://npcchatter-backend.onrender.com')
+    p.add_argument('--concurrency', type=int, default=8, help='parallel connections')
+    p.add_argument('--rate', type=float, default=0, help='max users (or bulk requests) per second; 0 for no limit')
+    p.add_argument('--progress', type=str, default='test_users.jsonl', help="JSONL progress file ('' to disable)")
+    p.add_argument('--bulk', action='store_true', help='use POST /api/admin/users/bulk')
+    p.add_argument('--admin-token', type=str, default='', help='server ADMIN_TOKEN, required with --bulk')
+    p.add_argument('--batch', type=int, default=500, help='users per bulk request')
+    p.add_argument('--timeout', type=float, default=30)
     args = p.parse_args()
+    if args.bulk and not args.admin_token:
+        p.error('--bulk requires --admin-token')
 
-    created = []
-    for i in range(args.count):
-        email = f'testuser{i+1}+auto@example.com'
-        username = f'testuser{i+1}'
-        print(f'Registering {email} ...', end=' ', flush=True)
-        status, text = register(args.api, email, username)
-        if status in (200,201):
-            try:
-                token = json.loads(text).get('token')
-            except Exception:
-                token = None
-            if token:
-                print('ok, token received:', token[:40] + '...')
-                created.append((email, username, token))
-            else:
-                print('registered but no token in response:', text[:200])
-        else:
-            # If email already exists, try to login and use that token
-            try:
-                js = json.loads(text)
-            except Exception:
-                js = {}
-            if status == 400 and js.get('message','').lower().find('email') != -1:
-                print('email exists, trying login...', end=' ', flush=True)
-                st2, txt2 = login(args.api, email)
-                if st2 in (200,):
-                    try:
-                        token = json.loads(txt2).get('token')
-                    except Exception:
-                        token = None
-                    if token:
-                        print('login ok, token:', token[:40] + '...')
-                        created.append((email, username, token))
-                        continue
-                print('login failed', st2, txt2[:300])
+    api = Api(args.api, timeout=args.timeout)
+    limit = RateLimit(args.rate)
+    progress = Progress(args.progress)
+    users = [(f'{args.prefix}{i}+auto@example.com', f'{args.prefix}{i}') for i in range(args.start, args.start + args.count)]
+    todo = [(e, u) for e, u in users if e not in progress.done]
+    if len(todo) < len(users):
+        print(f'{len(users) - len(todo)} users already done in {args.progress}, skipping them')
+
+    counts = {}
+    counts_lock = threading.Lock()
+    started = time.monotonic()
+
+    def finish(rec):
+        progress.record(rec)
+        with counts_lock:
+            counts[rec['status']] = counts.get(rec['status'], 0) + 1
+            n = sum(counts.values())
+        if rec['status'] == 'failed':
+            print(f"{rec['username']}: {rec['step']} failed {rec.get('code')} {rec.get('error', '')}")
+        elif n % 100 == 0 or len(todo) <= 20:
+            print(f"{n}/{len(todo)} {rec['username']} {rec['status']}, campaign {rec.get('campaign')}")
+
+    def one(user):
+        limit.wait()
+        try:
+            finish(provision(api, *user))
+        except Exception as e:
+            finish({'email': user[0], 'username': user[1], 'status': 'failed', 'step': 'request', 'error': str(e)})
+
+    def batch(chunk):
+        limit.wait()
+        for rec in provision_bulk(api, chunk, args.admin_token):
+            if rec['status'] == 'exists':
+                rec = login_and_join(api, rec)
+            finish(rec)
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, args.concurrency)) as pool:
+            if args.bulk:
+                chunks = [todo[i:i + args.batch] for i in range(0, len(todo), max(1, args.batch))]
+                list(pool.map(batch, chunks))
             else:
-                print('failed', status, text[:300])
+                list(pool.map(one, todo))
+    finally:
+        progress.close()
+    elapsed = time.monotonic() - started
+    summary = ', '.join(f'{n} {status}' for status, n in sorted(counts.items())) or 'nothing to do'
+    print(f'{summary} in {elapsed:.1f}s' + (f' ({len(todo) / elapsed:.1f} users/s)' if todo and elapsed else ''))
+    return 1 if counts.get('failed') else 0
 
-    for email, username, token in created:
-        print(f'Joining test campaign as {username} ...', end=' ', flush=True)
-        status, text = join_test(args.api, token)
-        if status == 200:
-            try:
-                js = json.loads(text)
-                print('joined', js.get('name') or js.get('id'))
-            except Exception:
-                print('joined (non-JSON response)')
-        else:
-            print('failed', status, text[:300])
 
 if __name__ == '__main__':
-    main()
+    sys.exit(main())
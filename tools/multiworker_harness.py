@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""Prove Socket.IO fan-out works across several backend workers.
+
+Starts a Redis stand-in (tools/redis_standin.py) and launches N separate
+single-worker backend processes in MULTI_WORKER mode on a shared SQLite
+database: eventlet `socketio.run` by default, or the production
+`gunicorn -k eventlet -w 1 backend.app:app` with --server gunicorn. It then
+connects one websocket client to each worker, posts a chat message through
+every worker and checks that every client saw every message, no matter
+which worker it is connected to, that the room's presence list names
+the users connected to every worker, and that each worker's /api/metrics
+counted the frames it delivered.
+
+Usage: python tools/multiworker_harness.py --workers 3
+"""
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import tempfile
+import threading
+import subprocess
+import urllib.request
+import urllib.error
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from redis_standin import RedisStandin  # noqa: E402
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _request(method, url, data=None, token=None, timeout=10):
+    body = json.dumps(data).encode('utf8') if data is not None else None
+    req = urllib.request.Request(url, data=body, method=method)
+    req.add_header('Content-Type', 'application/json')
+    if token:
+        req.add_header('Authorization', f'Bearer {token}')
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            return resp.status, json.loads(resp.read().decode('utf8') or 'null')
+    except urllib.error.HTTPError as e:
+        return e.code, e.read().decode('utf8')[:300]
+
+
+class SocketClient:
+    """Bare Engine.IO v4 / Socket.IO v5 websocket client (enough for events)."""
+
+    def __init__(self, base, token):
+        import simple_websocket
+        ws_url = base.replace('http://', 'ws://') + '/socket.io/?EIO=4&transport=websocket'
+        self.ws = simple_websocket.Client.connect(ws_url)
+        self.events = []       # (name, payload, perf_counter at arrival)
+        self._acks = {}        # ack id -> [Event, args]
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.connected = threading.Event()
+        self.ws.receive(timeout=5)  # engine.io open packet
+        self.ws.send('40' + json.dumps({'token': token}))
+        threading.Thread(target=self._read, daemon=True).start()
+        if not self.connected.wait(5):
+            raise RuntimeError(f'socket.io connect to {base} timed out')
+
+    def _read(self):
+        while True:
+            try:
+                pkt = self.ws.receive()
+            except Exception:
+                return
+            if pkt is None:
+                return
+            if pkt == '2':
+                self.ws.send('3')
+            elif pkt.startswith('40'):
+                self.connected.set()
+            elif pkt.startswith('42'):
+                name, *args = json.loads(pkt[2:])
+                with self._lock:
+                    self.events.append((name, args[0] if args else None, time.perf_counter()))
+            elif pkt.startswith('43'):
+                body = pkt[2:]
+                start = body.index('[')
+                with self._lock:
+                    waiter = self._acks.pop(int(body[:start]), None)
+                if waiter is not None:
+                    waiter[1] = json.loads(body[start:])
+                    waiter[0].set()
+
+    def emit(self, name, payload):
+        self.ws.send('42' + json.dumps([name, payload]))
+
+    def call(self, name, payload, timeout=5):
+        """Emit with an ack id and wait for the handler's return value."""
+        waiter = [threading.Event(), None]
+        with self._lock:
+            ack_id = self._next_id
+            self._next_id += 1
+            self._acks[ack_id] = waiter
+        self.ws.send(f'42{ack_id}' + json.dumps([name, payload]))
+        if not waiter[0].wait(timeout):
+            with self._lock:
+                self._acks.pop(ack_id, None)
+            raise RuntimeError(f'no ack for {name} within {timeout}s')
+        return waiter[1][0] if waiter[1] else None
+
+    def received(self, name):
+        with self._lock:
+            return [p for n, p, _t in self.events if n == name]
+
+    def received_at(self, name):
+        """(payload, arrival perf_counter) pairs for event name."""
+        with self._lock:
+            return [(p, t) for n, p, t in self.events if n == name]
+
+    def close(self):
+        try:
+            self.ws.close()
+        except Exception:
+            pass
+
+
+# eventlet-served worker for gunicorn releases without the eventlet worker class
+_SOCKETIO_RUNNER = (
+    'import eventlet, sys; eventlet.monkey_patch(); '
+    'from backend.app import app, socketio; '
+    'socketio.run(app, host="127.0.0.1", port=int(sys.argv[1]), log_output=False)'
+)
+
+
+def worker_command(server, port):
+    if server == 'gunicorn':
+        return [sys.executable, '-m', 'gunicorn', '-k', 'eventlet', '-w', '1', '-b', f'127.0.0.1:{port}', 'backend.app:app']
+    return [sys.executable, '-c', _SOCKETIO_RUNNER, str(port)]
+
+
+def wait_healthy(base, proc, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f'worker {base} exited with {proc.returncode}')
+        try:
+            with urllib.request.urlopen(base + '/api/health', timeout=2) as resp:
+                if resp.status == 200:
+                    return
+        except Exception:
+            time.sleep(0.2)
+    raise RuntimeError(f'worker {base} did not become healthy')
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument('--workers', type=int, default=2)
+    p.add_argument('--server', default='socketio', choices=('socketio', 'gunicorn'))
+    p.add_argument('--write-mode', default='sync', choices=('sync', 'group', 'async'))
+    p.add_argument('--verbose', action='store_true', help='show worker output')
+    args = p.parse_args()
+
+    redis_srv = RedisStandin().start()
+    tmp = tempfile.mkdtemp(prefix='npc-harness-')
+    env = dict(os.environ,
+               DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'harness.db')}",
+               REDIS_URL=redis_srv.url,
+               MULTI_WORKER='true',
+               APP_ENV='production',
+               JWT_SECRET='harness-secret',
+               METRICS_TOKEN='harness-metrics',
+               SQLITE_TUNING='true',
+               MESSAGE_WRITE_MODE=args.write_mode,
+               PYTHONPATH=ROOT)
+    out = None if args.verbose else subprocess.DEVNULL
+    # create the schema once so workers don't race on create_all
+    subprocess.run([sys.executable, '-c', 'import backend.app'], cwd=ROOT, env=env, check=True, stdout=out, stderr=out)
+
+    procs, bases, clients = [], [], []
+    try:
+        for _ in range(args.workers):
+            port = _free_port()
+            procs.append(subprocess.Popen(worker_command(args.server, port), cwd=ROOT, env=env, stdout=out, stderr=out))
+            bases.append(f'http://127.0.0.1:{port}')
+        for base, proc in zip(bases, procs):
+            wait_healthy(base, proc)
+        print(f'{args.workers} workers up, redis stand-in at {redis_srv.url}')
+
+        # one user per worker, all members of one campaign
+        tokens = []
+        for i, base in enumerate(bases):
+            st, res = _request('POST', base + '/api/auth/register',
+                               {'email': f'harness{i}@example.com', 'username': f'harness{i}', 'password': 'Password123!'})
+            if st != 201:
+                raise RuntimeError(f'register via {base} failed: {st} {res}')
+            tokens.append(res['token'])
+        st, camp = _request('POST', bases[0] + '/api/campaigns', {'name': 'Harness Campaign'}, tokens[0])
+        if st != 201:
+            raise RuntimeError(f'create campaign failed: {st} {camp}')
+        cid = camp['id']
+        for base, tok in list(zip(bases, tokens))[1:]:
+            st, res = _request('POST', f'{base}/api/campaigns/{cid}/join', token=tok)
+            if st != 200:
+                raise RuntimeError(f'join via {base} failed: {st} {res}')
+
+        for base, tok in zip(bases, tokens):
+            c = SocketClient(base, tok)
+            c.emit('join', {'campaign': cid, 'campaign_id': cid})
+            clients.append(c)
+        time.sleep(0.5)
+
+        sent = []
+        for i, (base, tok) in enumerate(zip(bases, tokens)):
+            text = f'hello from worker {i}'
+            st, res = _request('POST', f'{base}/api/campaigns/{cid}/messages', {'text': text}, tok)
+            if st != 201:
+                raise RuntimeError(f'post via {base} failed: {st} {res}')
+            sent.append(text)
+
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            if all(len(c.received('campaign_message')) >= len(sent) for c in clients):
+                break
+            time.sleep(0.1)
+
+        ok = True
+        for i, c in enumerate(clients):
+            got = {m.get('text') for m in c.received('campaign_message')}
+            missing = [t for t in sent if t not in got]
+            ok = ok and not missing
+            print(f'client on worker {i}: received {len(got)}/{len(sent)}' + (f', missing {missing}' if missing else ''))
+
+        # every worker's presence push lists the users held by all workers (Redis mirror)
+        names = {f'harness{i}' for i in range(len(bases))}
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            if all(c.received('presence') and {u['username'] for u in c.received('presence')[-1]['users']} == names for c in clients):
+                break
+            time.sleep(0.1)
+        for i, c in enumerate(clients):
+            seen = {u['username'] for u in c.received('presence')[-1]['users']} if c.received('presence') else set()
+            ok = ok and seen == names
+            print(f'presence on worker {i}: {len(seen)}/{len(names)} users')
+
+        # each worker counted the chat frames it delivered to its own client
+        for i, base in enumerate(bases):
+            req = urllib.request.Request(base + '/api/metrics', headers={'Authorization': 'Bearer harness-metrics'})
+            with urllib.request.urlopen(req, timeout=5) as resp:
+                text = resp.read().decode('utf8')
+            frames = sum(float(line.rsplit(' ', 1)[1]) for line in text.splitlines()
+                         if line.startswith('npc_socketio_frames_total{event="campaign_message"}'))
+            ok = ok and frames >= len(sent)
+            print(f'metrics on worker {i}: {int(frames)} campaign_message frames sent')
+
+        st, history = _request('GET', f'{bases[-1]}/api/campaigns/{cid}/messages', token=tokens[-1])
+        texts = [m['text'] for m in history] if st == 200 else []
+        history_ok = all(t in texts for t in sent)
+        print(f'history via worker {len(bases) - 1}: {len(texts)} messages' + ('' if history_ok else f' (status {st}, incomplete)'))
+        ok = ok and history_ok
+        print('PASS' if ok else 'FAIL')
+        return 0 if ok else 1
+    finally:
+        for c in clients:
+            c.close()
+        for proc in procs:
+            proc.terminate()
+        for proc in procs:
+            try:
+                proc.wait(10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+        redis_srv.shutdown()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
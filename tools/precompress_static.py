@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+"""Write .gz (and .br, when the brotli module is installed) variants of the
+built SPA for the backend to serve; see backend/utils/static_assets.py.
+
+Run after `npm run build` and before starting the backend; the file table
+is read once at startup.
+
+Usage: python tools/precompress_static.py [frontend/dist] [--force]
+"""
+import os
+import sys
+import argparse
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument('root', nargs='?', default=os.path.join(ROOT, 'frontend', 'dist'), help='build directory (default: frontend/dist)')
+    p.add_argument('--force', action='store_true', help='rewrite variants that are already up to date')
+    args = p.parse_args()
+
+    if not os.path.isdir(args.root):
+        print('no build directory at', args.root)
+        sys.exit(1)
+    from backend.utils.static_assets import precompress, brotli
+    written = precompress(args.root, force=args.force)
+    for path, encodings in sorted(written.items()):
+        print(f'{os.path.relpath(path, args.root)}: {", ".join(encodings)}')
+    print(f'precompressed {len(written)} file(s){"" if brotli else " (gzip only: brotli not installed)"}')
+
+
+if __name__ == '__main__':
+    main()
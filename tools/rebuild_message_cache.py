@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+"""Rebuild the Redis recent-message ring buffers from the database.
+
+Run against the same DATABASE_URL / REDIS_URL as the app, e.g. before
+switching traffic to a fresh Redis or after restoring the database.
+
+Usage: python tools/rebuild_message_cache.py [--campaign 1 --campaign 2]
+"""
+import os
+import sys
+import argparse
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument('--campaign', type=int, action='append', help='campaign id (repeatable); default: all campaigns with messages')
+    args = p.parse_args()
+
+    from backend.services.messages import rebuild_message_cache
+    try:
+        counts = rebuild_message_cache(args.campaign)
+    except RuntimeError as e:
+        print('rebuild failed:', e)
+        sys.exit(1)
+    for cid, n in sorted(counts.items()):
+        print(f'campaign {cid}: {n} messages cached')
+    print(f'rebuilt {len(counts)} campaign(s)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+"""A tiny in-process Redis stand-in for local multi-worker testing.
+
+Speaks enough RESP2/RESP3 for what the backend uses: pub/sub for the Socket.IO
+message queue, plus strings, counters, capped lists and MULTI/EXEC/WATCH
+for the message cache, and hashes for the presence mirror. Single process, no persistence, no eviction; for
+test harnesses only, never for production.
+
+Usage: python tools/redis_standin.py --port 6390
+"""
+import argparse
+import socketserver
+import threading
+import time
+
+_lock = threading.RLock()
+_data = {}
+_expiry = {}
+_versions = {}
+_subscribers = {}  # channel -> set of handlers
+
+
+class _Error(Exception):
+    pass
+
+
+_NO_REPLY = object()
+# EXEC's reply when a WATCHed key changed
+_NULL_ARRAY = object()
+
+
+class _Push(list):
+    """Out-of-band pub/sub frame: RESP3 push type, a plain array in RESP2."""
+
+
+def _enc(value, proto=2):
+    if value is None or value is _NULL_ARRAY:
+        if proto == 3:
+            return b'_\r\n'
+        return b'*-1\r\n' if value is _NULL_ARRAY else b'$-1\r\n'
+    if isinstance(value, _Error):
+        return b'-' + str(value).encode() + b'\r\n'
+    if isinstance(value, bool):
+        return b':%d\r\n' % int(value)
+    if isinstance(value, int):
+        return b':%d\r\n' % value
+    if isinstance(value, str) and value in ('OK', 'QUEUED', 'PONG'):
+        return b'+' + value.encode() + b'\r\n'
+    if isinstance(value, dict):
+        if proto == 3:
+            return b'%%%d\r\n' % len(value) + b''.join(_enc(k, proto) + _enc(v, proto) for k, v in value.items())
+        value = [x for kv in value.items() for x in kv]
+    if isinstance(value, (list, tuple)):
+        head = b'>' if isinstance(value, _Push) and proto == 3 else b'*'
+        return head + b'%d\r\n' % len(value) + b''.join(_enc(v, proto) for v in value)
+    if isinstance(value, str):
+        value = value.encode()
+    return b'$%d\r\n' % len(value) + value + b'\r\n'
+
+
+def _touch(key):
+    _versions[key] = _versions.get(key, 0) + 1
+
+
+def _live(key):
+    exp = _expiry.get(key)
+    if exp is not None and exp < time.monotonic():
+        _data.pop(key, None)
+        _expiry.pop(key, None)
+        _touch(key)
+    return _data.get(key)
+
+
+def _int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise _Error('ERR value is not an integer or out of range')
+
+
+def _run(cmd, args):
+    """Execute one data command under the global lock."""
+    with _lock:
+        if cmd == 'GET':
+            v = _live(args[0])
+            if isinstance(v, list):
+                raise _Error('WRONGTYPE Operation against a key holding the wrong kind of value')
+            return v
+        if cmd == 'SET':
+            key, val = args[0], args[1]
+            opts = [a.decode().upper() for a in args[2:]]
+            if 'NX' in opts and _live(key) is not None:
+                return None
+            _data[key] = val
+            _expiry.pop(key, None)
+            for flag, scale in (('EX', 1.0), ('PX', 0.001)):
+                if flag in opts:
+                    _expiry[key] = time.monotonic() + _int(opts[opts.index(flag) + 1]) * scale
+            _touch(key)
+            return 'OK'
+        if cmd == 'DEL':
+            n = 0
+            for key in args:
+                if _live(key) is not None:
+                    del _data[key]
+                    _expiry.pop(key, None)
+                    _touch(key)
+                    n += 1
+            return n
+        if cmd == 'EXISTS':
+            return sum(1 for key in args if _live(key) is not None)
+        if cmd in ('INCR', 'INCRBY'):
+            key = args[0]
+            n = _int(_live(key) or 0) + (_int(args[1]) if cmd == 'INCRBY' else 1)
+            _data[key] = str(n).encode()
+            _touch(key)
+            return n
+        if cmd in ('EXPIRE', 'PEXPIRE'):
+            if _live(args[0]) is None:
+                return 0
+            _expiry[args[0]] = time.monotonic() + _int(args[1]) * (1.0 if cmd == 'EXPIRE' else 0.001)
+            return 1
+        if cmd in ('RPUSH', 'RPUSHX', 'LPUSH'):
+            key = args[0]
+            cur = _live(key)
+            if cur is None:
+                if cmd == 'RPUSHX':
+                    return 0
+                cur = _data[key] = []
+            if cmd == 'LPUSH':
+                for v in args[1:]:
+                    cur.insert(0, v)
+            else:
+                cur.extend(args[1:])
+            _touch(key)
+            return len(cur)
+        if cmd in ('LRANGE', 'LTRIM'):
+            cur = _live(args[0]) or []
+            n = len(cur)
+            start, stop = _int(args[1]), _int(args[2])
+            start = max(0, start + n if start < 0 else start)
+            stop = (stop + n if stop < 0 else stop) + 1
+            if cmd == 'LRANGE':
+                return cur[start:stop]
+            if args[0] in _data:
+                _data[args[0]] = cur[start:stop]
+                if not _data[args[0]]:
+                    del _data[args[0]]
+                _touch(args[0])
+            return 'OK'
+        if cmd == 'LLEN':
+            return len(_live(args[0]) or [])
+        if cmd == 'HSET':
+            cur = _live(args[0])
+            if cur is None:
+                cur = _data[args[0]] = {}
+            pairs = list(zip(args[1::2], args[2::2]))
+            added = sum(1 for f, _ in pairs if f not in cur)
+            cur.update(pairs)
+            _touch(args[0])
+            return added
+        if cmd == 'HGETALL':
+            return dict(_live(args[0]) or {})
+        if cmd == 'HDEL':
+            cur = _live(args[0]) or {}
+            n = sum(1 for f in args[1:] if cur.pop(f, None) is not None)
+            if args[0] in _data and not cur:
+                del _data[args[0]]
+                _expiry.pop(args[0], None)
+            if n:
+                _touch(args[0])
+            return n
+        if cmd in ('FLUSHALL', 'FLUSHDB'):
+            for key in list(_data):
+                _touch(key)
+            _data.clear()
+            _expiry.clear()
+            return 'OK'
+        if cmd == 'PUBLISH':
+            channel, message = args[0], args[1]
+            targets = list(_subscribers.get(channel, ()))
+        else:
+            raise _Error(f"ERR unknown command '{cmd}'")
+    # deliver outside the data lock
+    for h in targets:
+        h.push(_Push([b'message', channel, message]))
+    return len(targets)
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def setup(self):
+        super().setup()
+        self._wlock = threading.Lock()
+        self.channels = set()
+        self.multi = None
+        self.watched = {}
+        self.proto = 2
+
+    def push(self, value):
+        try:
+            with self._wlock:
+                self.wfile.write(_enc(value, self.proto))
+                self.wfile.flush()
+        except OSError:
+            pass
+
+    def _read_command(self):
+        try:
+            line = self.rfile.readline()
+        except ConnectionError:
+            return None  # client went away (e.g. a worker was terminated)
+        if not line:
+            return None
+        if not line.startswith(b'*'):
+            return line.strip().split()
+        parts = []
+        for _ in range(int(line[1:])):
+            size = int(self.rfile.readline()[1:])
+            parts.append(self.rfile.read(size + 2)[:-2])
+        return parts
+
+    def handle(self):
+        try:
+            while True:
+                parts = self._read_command()
+                if parts is None:
+                    return
+                if not parts:
+                    continue
+                cmd, args = parts[0].decode().upper(), parts[1:]
+                try:
+                    reply = self._dispatch(cmd, args)
+                except _Error as e:
+                    reply = e
+                if reply is not _NO_REPLY:
+                    self.push(reply)
+        finally:
+            with _lock:
+                for ch in self.channels:
+                    _subscribers.get(ch, set()).discard(self)
+
+    def _dispatch(self, cmd, args):
+        if cmd in ('SUBSCRIBE', 'UNSUBSCRIBE'):
+            chans = args or (list(self.channels) if cmd == 'UNSUBSCRIBE' else [])
+            for ch in chans:
+                with _lock:
+                    if cmd == 'SUBSCRIBE':
+                        _subscribers.setdefault(ch, set()).add(self)
+                        self.channels.add(ch)
+                    else:
+                        _subscribers.get(ch, set()).discard(self)
+                        self.channels.discard(ch)
+                self.push(_Push([cmd.lower().encode(), ch, len(self.channels)]))
+            if cmd == 'UNSUBSCRIBE' and not chans:
+                self.push(_Push([b'unsubscribe', None, 0]))
+            return _NO_REPLY
+        if cmd == 'HELLO':
+            if args:
+                if args[0] not in (b'2', b'3'):
+                    raise _Error('NOPROTO unsupported protocol version')
+                self.proto = int(args[0])
+            return {'server': 'redis', 'version': '7.0.0', 'proto': self.proto, 'id': id(self) & 0xffff,
+                    'mode': 'standalone', 'role': 'master', 'modules': []}
+        if cmd == 'PING':
+            if self.channels:
+                return _Push([b'pong', args[0] if args else b''])
+            return args[0] if args else 'PONG'
+        if cmd in ('SELECT', 'CLIENT', 'READONLY'):
+            return 'OK'
+        if cmd == 'ECHO':
+            return args[0]
+        if cmd == 'MULTI':
+            self.multi = []
+            return 'OK'
+        if cmd == 'DISCARD':
+            self.multi = None
+            self.watched = {}
+            return 'OK'
+        if cmd == 'WATCH':
+            with _lock:
+                for key in args:
+                    self.watched[key] = _versions.get(key, 0)
+            return 'OK'
+        if cmd == 'UNWATCH':
+            self.watched = {}
+            return 'OK'
+        if cmd == 'EXEC':
+            queued, self.multi = self.multi or [], None
+            watched, self.watched = self.watched, {}
+            with _lock:
+                if any(_versions.get(k, 0) != v for k, v in watched.items()):
+                    return _NULL_ARRAY
+                out = []
+                for c, a in queued:
+                    try:
+                        out.append(_run(c, a))
+                    except _Error as e:
+                        out.append(e)
+                return out
+        if self.multi is not None:
+            self.multi.append((cmd, args))
+            return 'QUEUED'
+        return _run(cmd, args)
+
+
+class RedisStandin(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host='127.0.0.1', port=0):
+        super().__init__((host, port), _Handler)
+
+    @property
+    def url(self):
+        host, port = self.server_address
+        return f'redis://{host}:{port}/0'
+
+    def start(self):
+        t = threading.Thread(target=self.serve_forever, name='redis-standin', daemon=True)
+        t.start()
+        return self
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument('--host', default='127.0.0.1')
+    p.add_argument('--port', type=int, default=6390)
+    args = p.parse_args()
+    server = RedisStandin(args.host, args.port)
+    print(f'redis stand-in listening on {server.url}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()